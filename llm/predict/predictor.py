@@ -164,6 +164,20 @@ class PredictorArgument:
         metadata={"help": "Draft model quantization type. Reserved for future"},
     )
     return_full_hidden_states: int = field(default=False, metadata={"help": "whether return full hidden_states"})
+    prefill_chunk_size: int = field(
+        default=0,
+        metadata={
+            "help": "Prompts longer than it are prefilled in chunks of this size in successive steps, interleaved "
+            "with the decoding of the other prompts. 0 means no chunking. Only for block inference with append attention."
+        },
+    )
+    prefill_step_token_num: int = field(
+        default=0,
+        metadata={
+            "help": "The maximum number of prompt chunk tokens prefilled in a step when `prefill_chunk_size` > 0, the "
+            "prompts whose next chunk exceeds it wait for a later step. 0 means no limit."
+        },
+    )
 
     def __post_init__(self):
         if self.speculate_method is not None:
@@ -173,6 +187,12 @@ class PredictorArgument:
         assert (
             self.src_length + self.max_length <= self.total_max_length
         ), "src_length + max_length should smaller than total_max_length."
+        if self.prefill_chunk_size > 0:
+            assert self.append_attn, "chunked prefill requires append attention, please set `append_attn`."
+            assert self.speculate_method is None, "chunked prefill is not supported with speculate decoding."
+            assert (
+                self.prefill_chunk_size % self.block_size == 0
+            ), "`prefill_chunk_size` should be a multiple of `block_size`."
 
 
 @dataclass
@@ -957,6 +977,29 @@ class BlockInferencePredictorMixin(BasePredictor):
         self.seq_lens = self.pad_batch_data(input_ids)
         self.model_inputs["input_ids"] = self.input_ids
 
+        # the (batch id, offset, length) of the prompt chunks of each step, and the step of the last chunk of each
+        # prompt, for the prompts which are prefilled in chunks
+        self.prefill_input_ids = input_ids
+        self.prefill_chunk_steps = []
+        self.prefill_step = 0
+        self.prefill_last_steps = [0] * self.config.batch_size
+        prefill_lens = list(self.seq_lens)
+        stop_flags = [False] * self.config.batch_size
+        chunk_size = self.config.prefill_chunk_size
+        if chunk_size > 0:
+            for i, length in enumerate(self.seq_lens):
+                if length > chunk_size:
+                    # stopped until the first chunk of the prompt is scheduled
+                    prefill_lens[i], stop_flags[i] = 0, True
+            self.prefill_chunk_steps = llm_utils.schedule_prefill_chunks(
+                self.seq_lens, chunk_size, self.config.prefill_step_token_num
+            )
+            for step, chunks in enumerate(self.prefill_chunk_steps):
+                for i, _, chunk_len in chunks:
+                    self.prefill_last_steps[i] = step
+                    if step == 0:
+                        prefill_lens[i], stop_flags[i] = chunk_len, False
+
         self.model_inputs["block_tables"][:][:] = -1
         free_list = list(range(self.max_block_nums))
         for i in range(self.config.batch_size):
@@ -967,19 +1010,15 @@ class BlockInferencePredictorMixin(BasePredictor):
                 self.model_inputs["block_tables"][i, j] = used_block_id
 
         self.model_inputs["seq_lens_this_time"] = paddle.to_tensor(
-            np.array(self.seq_lens).astype("int32").reshape(-1, 1)
-        )
-        self.model_inputs["seq_lens_encoder"] = paddle.to_tensor(
-            np.array(self.seq_lens).astype("int32").reshape(-1, 1)
+            np.array(prefill_lens).astype("int32").reshape(-1, 1)
         )
+        self.model_inputs["seq_lens_encoder"] = paddle.to_tensor(np.array(prefill_lens).astype("int32").reshape(-1, 1))
         self.model_inputs["seq_lens_decoder"] = paddle.full(
             shape=[self.config.batch_size, 1], fill_value=0, dtype="int32"
         )
         self.model_inputs["step_idx"] = paddle.full(shape=[self.config.batch_size, 1], fill_value=0, dtype="int64")
         self.model_inputs["not_need_stop"] = paddle.full(shape=[1], fill_value=True, dtype="bool")
-        self.model_inputs["stop_flags"] = paddle.full(
-            shape=[self.config.batch_size, 1], fill_value=False, dtype="bool"
-        )
+        self.model_inputs["stop_flags"] = paddle.to_tensor(np.array(stop_flags).reshape(-1, 1))
         self.model_inputs["stop_nums"] = paddle.full(shape=[1], fill_value=self.config.batch_size, dtype="int64")
         self.model_inputs["pre_ids"] = paddle.full(
             shape=[self.config.batch_size, self.config.max_length], fill_value=-1, dtype="int64"
@@ -1013,6 +1052,36 @@ class BlockInferencePredictorMixin(BasePredictor):
             for k, v in self.model_inputs.items():
                 v.name = k
 
+    def _update_prefill_chunks(self):
+        """Feed the prompt chunks scheduled for the next step and keep the prompts which wait for a later chunk
+        stopped. The tokens of the steps before the last chunk of a prompt are dropped by `read_res`."""
+        self.prefill_step += 1
+        if self.prefill_step >= len(self.prefill_chunk_steps):
+            return
+        scheduled = set()
+        for i, offset, chunk_len in self.prefill_chunk_steps[self.prefill_step]:
+            self.input_ids[i, :chunk_len] = self.prefill_input_ids[i][offset : offset + chunk_len]
+            self.model_inputs["seq_lens_this_time"][i] = chunk_len
+            self.model_inputs["seq_lens_encoder"][i] = chunk_len
+            self.model_inputs["seq_lens_decoder"][i] = offset
+            self.model_inputs["step_idx"][i] = 0
+            self.model_inputs["pre_ids"][i] = -1
+            self.model_inputs["stop_flags"][i] = False
+            scheduled.add(i)
+        for i, last_step in enumerate(self.prefill_last_steps):
+            if last_step > self.prefill_step and i not in scheduled:
+                # a stopped sequence without tokens this step outputs -1
+                self.model_inputs["seq_lens_this_time"][i] = 0
+                self.model_inputs["seq_lens_encoder"][i] = 0
+                self.model_inputs["stop_flags"][i] = True
+        self.model_inputs["not_need_stop"][0] = True
+
+    def _get_read_res_args(self, tensor_queue, result_queue, done_event):
+        args = [self.model_name_or_path, tensor_queue, result_queue, done_event]
+        if self.proposer is None and self.config.prefill_chunk_size > 0:
+            args.append(self.prefill_last_steps)
+        return args
+
 
 class DygraphBlockInferencePredictor(BlockInferencePredictorMixin):
     def __init__(self, config: PredictorArgument, tokenizer: PretrainedTokenizer = None, **kwargs):
@@ -1079,7 +1148,7 @@ class DygraphBlockInferencePredictor(BlockInferencePredictorMixin):
             output_tensor_shape = [MAX_BSZ * MAX_DRAFT_TOKENS + MAX_BSZ + 2, 1]
 
         read_res_process = mp.Process(
-            target=read_res_func, args=[self.model_name_or_path, tensor_queue, result_queue, done_event]
+            target=read_res_func, args=self._get_read_res_args(tensor_queue, result_queue, done_event)
         )
         if self.tensor_parallel_rank == 0:
             read_res_process.start()
@@ -1103,6 +1172,7 @@ class DygraphBlockInferencePredictor(BlockInferencePredictorMixin):
                 self.full_hidden_states = self._infer(self.model_inputs)
             else:
                 self._infer(self.model_inputs)
+            self._update_prefill_chunks()
         logger.info(f"running spend {time.time()  -  s_time}")
 
         if self.proposer is not None:
@@ -1245,7 +1315,7 @@ class StaticGraphBlockInferencePredictor(BlockInferencePredictorMixin):
             output_tensor_shape = [MAX_BSZ * MAX_DRAFT_TOKENS + MAX_BSZ + 2, 1]
 
         read_res_process = mp.Process(
-            target=read_res_func, args=[self.model_name_or_path, tensor_queue, result_queue, done_event]
+            target=read_res_func, args=self._get_read_res_args(tensor_queue, result_queue, done_event)
         )
         if self.tensor_parallel_rank == 0:
             read_res_process.start()
@@ -1269,6 +1339,7 @@ class StaticGraphBlockInferencePredictor(BlockInferencePredictorMixin):
                 self.full_hidden_states = self.predictor.run(list(self.model_inputs.values()))[0]
             else:
                 self.predictor.run(list(self.model_inputs.values()))
+            self._update_prefill_chunks()
         logger.info(f"running spend {time.time()  -  s_time}")
 
         if self.proposer is not None:
@@ -339,12 +339,24 @@ def main():
                 train_ds,
                 tokenizer=tokenizer,
                 max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
                 greedy_zero_padding=data_args.greedy_zero_padding,
+                packing_strategy=data_args.packing_strategy,
             )
         if eval_zero_padding and dev_ds is not None:
-            dev_ds = intoken_dataset(dev_ds, tokenizer=tokenizer, max_length=data_args.max_length)
+            dev_ds = intoken_dataset(
+                dev_ds,
+                tokenizer=tokenizer,
+                max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
+            )
         if eval_zero_padding and test_ds is not None:
-            test_ds = intoken_dataset(test_ds, tokenizer=tokenizer, max_length=data_args.max_length)
+            test_ds = intoken_dataset(
+                test_ds,
+                tokenizer=tokenizer,
+                max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
+            )
 
     model = create_peft_model(model_args, reft_args, training_args, dtype, model_config, model, reft_layers)
 
@@ -134,6 +134,10 @@ class DataArguments:
         metadata={"help": "Whether to skip the warmup process of mmap files."},
     )
     data_cache: str = field(default=None, metadata={"help": "The path of the cached dataset."})
+    index_build_workers: int = field(
+        default=1,
+        metadata={"help": "Number of processes used to build the index caches of blended datasets."},
+    )
 
 
 @dataclass
@@ -223,6 +227,7 @@ def create_pretrained_dataset(
         share_folder=data_args.share_folder,
         data_cache_path=data_args.data_cache,
         need_data=need_data,
+        index_build_workers=data_args.index_build_workers,
     )
 
     def print_dataset(data, mode="train"):
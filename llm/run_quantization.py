@@ -342,6 +342,7 @@ def main():
                 train_ds,
                 tokenizer=tokenizer,
                 max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
                 greedy_zero_padding=data_args.greedy_zero_padding,
             )
             if train_ds is not None
@@ -352,6 +353,7 @@ def main():
                 ptq_ds,
                 tokenizer=tokenizer,
                 max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
                 greedy_zero_padding=data_args.greedy_zero_padding,
             )
             if ptq_ds is not None
@@ -364,6 +366,7 @@ def main():
                     dev_ds,
                     tokenizer=tokenizer,
                     max_length=data_args.max_length,
+                    dense_attention_mask=data_args.dense_attention_mask,
                 )
                 if dev_ds is not None
                 else None
@@ -519,6 +522,7 @@ def main():
                 test_ds,
                 tokenizer=tokenizer,
                 max_length=data_args.max_length,
+                dense_attention_mask=data_args.dense_attention_mask,
             )
         eval_result = trainer.predict(test_ds).metrics
         trainer.log_metrics("test", eval_result)
@@ -0,0 +1,128 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the task queue between the engine and the infer processes.
+
+Requests are put at a fixed rate and read by mp_num consumer processes, the enqueue latency
+and the delivery latency (until every rank has read the request) are reported for each backend.
+
+Usage:
+    cd llm/server/server && mkdir -p log && python scripts/benchmark_task_queue.py --mp_num 8 --rate 1000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from server.engine.task_queue_manager import (
+    ShmTaskQueue,
+    TaskQueueManager,
+    launch_queue_service,
+)
+
+SHM_NAME = "shm_task_queue_benchmark"
+
+
+def create_queue(backend, args, rank=0, create=False):
+    if backend == "shm":
+        return ShmTaskQueue(SHM_NAME, rank=rank, mp_num=args.mp_num, create=create)
+    return TaskQueueManager(rank=rank, mp_num=args.mp_num, port=args.port)
+
+
+def consume(backend, args, rank, result_queue):
+    queue = create_queue(backend, args, rank=rank)
+    latencies = list()
+    while len(latencies) < args.num_requests:
+        tasks, _ = queue.get()
+        now = time.time()
+        for req_dicts, _ in tasks:
+            latencies.append(now - req_dicts[0]["send_time"])
+        if not tasks:
+            time.sleep(0.0001)
+    result_queue.put(latencies)
+
+
+def run(backend, args):
+    service = None
+    if backend == "manager":
+        service = multiprocessing.Process(target=launch_queue_service, args=(args.port, args.mp_num), daemon=True)
+        service.start()
+        time.sleep(1)
+    queue = create_queue(backend, args, create=True)
+
+    result_queue = multiprocessing.Queue()
+    consumers = [
+        multiprocessing.Process(target=consume, args=(backend, args, rank, result_queue))
+        for rank in range(args.mp_num)
+    ]
+    for p in consumers:
+        p.start()
+
+    put_latencies = list()
+    start_time = time.perf_counter()
+    for i in range(args.num_requests):
+        delay = start_time + i / args.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        task = {
+            "req_id": str(i),
+            "input_ids": list(range(args.input_len)),
+            "max_dec_len": 1024,
+            "eos_token_ids": [2],
+            "send_time": time.time(),
+        }
+        tik = time.perf_counter()
+        queue.put(([task], 1))
+        put_latencies.append(time.perf_counter() - tik)
+
+    # the slowest rank decides when a request is delivered
+    delivery_latencies = np.max([result_queue.get() for _ in consumers], axis=0)
+    for p in consumers:
+        p.join()
+    if backend == "shm":
+        queue.close(unlink=True)
+    if service is not None:
+        service.terminate()
+
+    put_latencies = np.array(put_latencies) * 1000
+    delivery_latencies = delivery_latencies * 1000
+    print(f"{backend:>8}: put p50 {np.percentile(put_latencies, 50):.3f}ms, "
+          f"p99 {np.percentile(put_latencies, 99):.3f}ms | "
+          f"delivery p50 {np.percentile(delivery_latencies, 50):.3f}ms, "
+          f"p99 {np.percentile(delivery_latencies, 99):.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", type=str, default="all", choices=["all", "shm", "manager"])
+    parser.add_argument("--mp_num", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1000, help="requests per second")
+    parser.add_argument("--num_requests", type=int, default=5000)
+    parser.add_argument("--input_len", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=56677)
+    args = parser.parse_args()
+
+    backends = ["shm", "manager"] if args.backend == "all" else [args.backend]
+    for backend in backends:
+        run(backend, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -69,6 +69,18 @@ class BaseDataProcessor(ABC):
         """
         raise NotImplementedError
 
+    def process_responses(self, response_dicts):
+        """
+        Preprocess the responses of one engine step
+
+        Args:
+            response_dicts (List[Dict]): responses for engine, contain ids fields
+
+        Returns:
+            List[Dict]: responses contain text fields
+        """
+        return [self.process_response(response_dict) for response_dict in response_dicts]
+
     def text2ids(self, text):
         """
         text to token ids
@@ -117,14 +129,102 @@ class BaseDataProcessor(ABC):
         raise NotImplementedError
 
 
+class IncrementalDetokenizer(object):
+    """
+    Detokenize the generated token ids of many requests incrementally.
+
+    Every request keeps a window of token ids: the ids from `prefix_offset` to `read_offset` were already
+    detokenized and only serve as context for the tokenizer's space and byte handling, the ids after
+    `read_offset` are new. Each step decodes the window with and without the new ids and emits the difference,
+    so the cost per token does not grow with the output length. The windows of all the requests of a step are
+    decoded with a single `batch_decode` call.
+
+    Args:
+        tokenizer: HF or PaddleNLP tokenizer
+        skip_special_tokens (bool): whether to remove special tokens in the decoding
+        max_window (int): max number of pending token ids, the text is emitted even if it ends with an
+            unfinished utf-8 sequence once the pending ids exceed it
+    """
+
+    def __init__(self, tokenizer, skip_special_tokens=False, max_window=64):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.max_window = max_window
+        # task id -> [window token ids, read offset in the window, emitted token strings]
+        self.decode_status = dict()
+
+    def decode(self, token_ids_list, task_ids, is_end_list=None):
+        """
+        detokenize the new token ids of a batch of requests
+
+        Args:
+            token_ids_list (List[List[int]]): new token ids of each request
+            task_ids (List[str]): task id of each request
+            is_end_list (List[bool]): whether each request is finished, the pending text is flushed if so
+
+        Returns:
+            List[str]: new strings of each request
+        """
+        if is_end_list is None:
+            is_end_list = [False] * len(task_ids)
+        windows, read_offsets = [], []
+        for token_ids, task_id in zip(token_ids_list, task_ids):
+            if task_id not in self.decode_status:
+                self.decode_status[task_id] = [[], 0, []]
+            status = self.decode_status[task_id]
+            windows.append(status[0] + list(token_ids))
+            read_offsets.append(status[1])
+
+        sequences = [window[:read_offset] for window, read_offset in zip(windows, read_offsets)] + windows
+        texts = self.tokenizer.batch_decode(sequences,
+                                            skip_special_tokens=self.skip_special_tokens,
+                                            clean_up_tokenization_spaces=False) if len(sequences) > 0 else []
+        prefix_texts, new_texts = texts[:len(windows)], texts[len(windows):]
+
+        results = []
+        for i, task_id in enumerate(task_ids):
+            status = self.decode_status[task_id]
+            window, read_offset = windows[i], read_offsets[i]
+            prefix_text, new_text = prefix_texts[i], new_texts[i]
+            # a replacement char at the end means a potential unfinished byte sequence
+            complete = len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd")
+            if complete or is_end_list[i] or len(window) - read_offset > self.max_window:
+                text = new_text[len(prefix_text):]
+                # the emitted ids become the context of the next step
+                status[0] = window[read_offset:]
+                status[1] = len(status[0])
+            else:
+                text = ""
+                status[0] = window
+            if text:
+                status[2].append(text)
+            results.append(text)
+        return results
+
+    def release(self, task_id):
+        """
+        free the status of a finished request
+
+        Args:
+            task_id (str): task id
+
+        Returns:
+            str: all the strings of the request
+        """
+        status = self.decode_status.pop(task_id, None)
+        if status is None:
+            return ""
+        return "".join(status[2])
+
+
 class DataProcessor(BaseDataProcessor):
     def __init__(self):
         self.config = Config()
         max_length = self.config.get_model_config().get('max_length', 1024)
         self.src_length = max_length - self.config.seq_len_limit
 
-        self.decode_status = dict()
         self.tokenizer = self._load_tokenizer()
+        self.detokenizer = IncrementalDetokenizer(self.tokenizer, skip_special_tokens=self.config.use_hf_tokenizer)
         data_processor_logger.info(f"tokenizer infomation: bos_token is {self.tokenizer.bos_token}, {self.tokenizer.bos_token_id}, \
                                 eos_token is {self.tokenizer.eos_token}, {self.tokenizer.eos_token_id} ")
 
@@ -180,13 +280,38 @@ class DataProcessor(BaseDataProcessor):
             return response_dict
 
         token_ids = response_dict.get("token_ids", [])
-        response_dict["token"] = self.ids2tokens(token_ids, response_dict["req_id"])
+        response_dict["token"] = self.detokenizer.decode([token_ids], [req_id], [is_end == 1])[0]
         response_dict["usage"] = {"completion_tokens" : response_dict["send_idx"] + 1}
 
         if is_end:
             response_dict["tokens_all"] = self.clear_request_status(req_id)
         return response_dict
 
+    def process_responses(self, response_dicts):
+        """
+        Preprocess the responses of one engine step, detokenizing all of them in one batch
+
+        Args:
+            response_dicts (List[Dict]): responses for engine, contain ids fields
+
+        Returns:
+            List[Dict]: responses contain text fields
+        """
+        batch = [response_dict for response_dict in response_dicts if "choices" not in response_dict]
+        tokens = self.detokenizer.decode([response_dict.get("token_ids", []) for response_dict in batch],
+                                         [response_dict["req_id"] for response_dict in batch],
+                                         [response_dict.get("is_end", 0) == 1 for response_dict in batch])
+        for response_dict, token in zip(batch, tokens):
+            response_dict["token"] = token
+            response_dict["usage"] = {"completion_tokens" : response_dict["send_idx"] + 1}
+            if response_dict.get("is_end", 0):
+                response_dict["tokens_all"] = self.clear_request_status(response_dict["req_id"])
+
+        for response_dict in response_dicts:
+            if "choices" in response_dict:
+                self.process_response(response_dict)
+        return response_dicts
+
     def text2ids(self, text):
         """
         text to token ids
@@ -243,38 +368,7 @@ class DataProcessor(BaseDataProcessor):
         Returns:
             List[str]: strings
         """
-        if self.config.use_hf_tokenizer:
-            if task_id not in self.decode_status:
-                # history token ids & history token strings & befer decode str
-                self.decode_status[task_id] = [[], [], ""]
-
-            previous_token_ids = self.decode_status[task_id][0]
-            decode_str = self.tokenizer.batch_decode([previous_token_ids + token_id],
-                                        skip_special_tokens=True,
-                                        clean_up_tokenization_spaces=False)
-            if isinstance(decode_str, list) and len(decode_str):
-                new_str = decode_str[0].replace(self.decode_status[task_id][2], "", 1)
-                self.decode_status[task_id][1].append(new_str)
-                self.decode_status[task_id][2] = decode_str[0]
-            else:
-                new_str = ""
-            self.decode_status[task_id][0] += token_id
-            return new_str
-        else:
-            if task_id not in self.decode_status:
-                # prefix offset & read offset & history token ids & history token strings
-                self.decode_status[task_id] = [0, 0, [], []]
-
-            prefix_offset = self.decode_status[task_id][0]
-            read_offset = self.decode_status[task_id][1]
-            previous_token_ids = self.decode_status[task_id][2]
-            decode_str, prefix_offset, read_offset = self.tokenizer.decode_token(
-                previous_token_ids + token_id, prefix_offset, read_offset)
-            self.decode_status[task_id][0] = prefix_offset
-            self.decode_status[task_id][1] = read_offset
-            self.decode_status[task_id][2] += token_id
-            self.decode_status[task_id][3].append(decode_str)
-            return decode_str
+        return self.detokenizer.decode([token_id], [task_id])[0]
 
     def _load_tokenizer(self):
         """
@@ -300,14 +394,7 @@ class DataProcessor(BaseDataProcessor):
         Returns:
             results_all (str): all token strings
         """
-        results_all = ""
-        if task_id in self.decode_status:
-            if self.config.use_hf_tokenizer:
-                results_all = self.decode_status[task_id][2]
-            else:
-                results_all = "".join(self.decode_status[task_id][3])
-            del self.decode_status[task_id]
-        return results_all
+        return self.detokenizer.release(task_id)
 
     def get_eos_tokens_lens(self):
         """
@@ -64,6 +64,14 @@ class Config:
         if self.max_prefill_batch <= 0:
             raise Exception(f"MAX_PREFILL_BATCH ({self.max_prefill_batch}) must be greater than 0")
         self.disable_streaming = int(os.getenv("DISABLE_STREAMING", 0))
+        # admission scheduler policy, one of fcfs, spf (shortest prompt first) and token_budget
+        self.scheduler_policy = os.getenv("SCHEDULER_POLICY", "fcfs")
+        # requests waiting longer than this are served first come first served by the spf scheduler
+        self.scheduler_max_wait_time = float(os.getenv("SCHEDULER_MAX_WAIT_TIME", 30))
+        # prompt tokens inserted per round by the token_budget scheduler
+        self.max_prefill_token_num = int(os.getenv("MAX_PREFILL_TOKEN_NUM", 8192))
+        if self.max_prefill_token_num <= 0:
+            raise Exception(f"MAX_PREFILL_TOKEN_NUM ({self.max_prefill_token_num}) must be greater than 0")
 
         # max cached task num
         self.max_cached_task_num = int(os.getenv("MAX_CACHED_TASK_NUM", "128"))
@@ -102,9 +110,20 @@ class Config:
         self.block_ratio = float(os.getenv("BLOCK_RATIO", 0.75))
         self.bad_tokens = str(env.get("BAD_TOKENS", "-1"))
         self.first_token_id = int(os.getenv("FIRST_TOKEN_ID", 1))
+        # reuse the KV cache blocks of prompt prefixes shared between requests
+        self.enable_prefix_caching = int(os.getenv("ENABLE_PREFIX_CACHING", 0)) == 1
+        # prompts longer than it are prefilled in chunks of this size, interleaved with decoding, 0 means disabled
+        self.prefill_chunk_size = int(os.getenv("PREFILL_CHUNK_SIZE", 0))
+        # maximum number of prompt chunk tokens prefilled in a step, 0 means no limit
+        self.prefill_step_token_num = int(os.getenv("PREFILL_STEP_TOKEN_NUM", 0))
 
         # infer queue port
         self.infer_port = int(os.getenv("INFER_QUEUE_PORT", 56666))
+        # task queue between the engine and the infer processes, shm (shared memory ring buffer) or manager
+        self.task_queue_backend = os.getenv("TASK_QUEUE_BACKEND", "shm")
+        if self.task_queue_backend not in ["shm", "manager"]:
+            raise Exception(f"TASK_QUEUE_BACKEND ({self.task_queue_backend}) must be shm or manager")
+        self.task_queue_shm_size = int(os.getenv("TASK_QUEUE_SHM_SIZE", 64 * 1024 * 1024))
 
         # whether to use custom health checker
         self.use_custom_health_checker = int(os.getenv("USE_CUSTOM_HEALTH_CHECKER", 1))
@@ -149,6 +168,15 @@ class Config:
         self.total_block_num = int(self.block_bs * self.max_query_block_num)
         self.max_block_num = int(self.total_block_num * self.block_ratio)
         model_server_logger.info(f"max_block_num:{self.max_block_num}")
+        if self.enable_prefix_caching and self.block_ratio < 1.0:
+            # the engine may swap out the blocks of a running task when block_ratio < 1,
+            # which is not safe for blocks shared with other tasks
+            model_server_logger.warning("prefix caching requires BLOCK_RATIO >= 1.0, so it is disabled")
+            self.enable_prefix_caching = False
+        if self.prefill_chunk_size > 0 and self.block_ratio < 1.0:
+            # a swapped out task is recovered by prefilling its whole prompt at once
+            model_server_logger.warning("chunked prefill requires BLOCK_RATIO >= 1.0, so it is disabled")
+            self.prefill_chunk_size = 0
 
     def check(self):
         """
@@ -163,6 +191,10 @@ class Config:
             f"which means the exported MAX_SEQ_LEN should less than "
             f"{self.max_seq_len}, but now it's {self.seq_len_limit}."
         )
+        assert self.prefill_chunk_size % self.block_size == 0, (
+            f"PREFILL_CHUNK_SIZE should be a multiple of BLOCK_SIZE ({self.block_size}), "
+            f"but now it's {self.prefill_chunk_size}."
+        )
         assert self.dec_len_limit <= self.max_seq_len, (
             f"The dec_len_limit shouldn't greater than max_seq_len in model, "
             f"which means the exported MAX_DEC_LEN should less than "
@@ -24,7 +24,9 @@ from multiprocessing import shared_memory
 
 import numpy as np
 from server.engine.resource_manager import ResourceManager
-from server.engine.task_queue_manager import (TaskQueueManager,
+from server.engine.task_queue_manager import (ShmTaskQueue,
+                                              create_task_queue,
+                                              get_task_queue_backend,
                                               launch_queue_service)
 from server.engine.token_processor import TokenProcessor, WarmUpTokenProcessor
 from server.utils import model_server_logger
@@ -51,7 +53,7 @@ class Engine(object):
         assert not self.is_started, "The engine is already started.!"
         start_time = time.time()
         self.queue_service = self._start_tasks_queue_service()
-        self.tasks_queue = TaskQueueManager(mp_num=self.cfg.mp_num, port=self.cfg.infer_port)
+        self.tasks_queue = create_task_queue(self.cfg, mp_num=self.cfg.mp_num, create=True)
 
         self.token_processor.tasks_queue = self.tasks_queue
         self.infer_proc = self._start_infer_service()
@@ -346,6 +348,8 @@ class Engine(object):
             self.queue_service.join()
         if hasattr(self, "infer_proc") and self.infer_proc is not None:
             os.killpg(self.infer_proc.pid, signal.SIGTERM)
+        if isinstance(getattr(self, "tasks_queue", None), ShmTaskQueue):
+            self.tasks_queue.close(unlink=True)
 
     def _start_tasks_queue_service(self):
         """
@@ -384,7 +388,8 @@ class Engine(object):
                     f" --max_block_num {self.cfg.total_block_num} --block_size {self.cfg.block_size}"
                     f" --use_cache_kv_int8 {self.cfg.use_cache_kv_int8}"
                     f" --enc_dec_block_num {self.cfg.enc_dec_block_num}"
-                    f" --block_ratio {self.cfg.block_ratio} --dtype {self.cfg.dtype}")
+                    f" --block_ratio {self.cfg.block_ratio} --dtype {self.cfg.dtype}"
+                    f" --task_queue_backend {get_task_queue_backend(self.tasks_queue)}")
         pd_cmd = pd_cmd + arguments + " >log/launch_infer.log 2>&1"
         model_server_logger.info("Launch infer service command: {}".format(pd_cmd))
         p = subprocess.Popen(
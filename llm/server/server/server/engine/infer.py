@@ -32,7 +32,7 @@ from server.data.processor import DataProcessor
 from server.engine.config import Config
 from paddlenlp.experimental.transformers import InferenceWithReferenceProposer
 from server.utils import get_logger
-from task_queue_manager import TaskQueueManager
+from task_queue_manager import create_task_queue
 
 File_Path = os.path.realpath(sys.argv[0])
 Dir_Path = os.path.dirname(File_Path)
@@ -58,6 +58,16 @@ class ModelRunner:
 
         self.reduce_dialogue_repetition = int(os.environ.get("REDUCE_DIALOGUE_REPETITION", 0))
 
+        # idx -> [input ids, offset of the next chunk] of the prompts which are prefilled in chunks
+        self.prefill_chunk_size = self.config.prefill_chunk_size
+        self.prefill_chunks = dict()
+        # maximum number of prompt chunk tokens prefilled in a step, 0 means no limit
+        self.prefill_step_token_num = self.config.prefill_step_token_num
+        # number of prompt chunk tokens scheduled for the next step
+        self.scheduled_prefill_token_num = 0
+        if self.prefill_chunk_size > 0 and self.is_speculate_decoding:
+            raise ValueError("chunked prefill is not supported with speculate decoding")
+
         self.max_stop_seqs_num = int(os.getenv("MAX_STOP_SEQS_NUM", 5))
         self.stop_seqs_max_len = int(os.getenv("STOP_SEQS_MAX_LEN", 8))
 
@@ -82,7 +92,8 @@ class ModelRunner:
         else:
             self.proposer = None
 
-        self.infer_queue = TaskQueueManager(rank=self.rank, mp_num=self.nranks, port=self.config.infer_port)
+        self.infer_queue = create_task_queue(self.config, rank=self.rank, mp_num=self.nranks,
+                                             backend=self.args.task_queue_backend)
 
         model_rank_path = os.path.join(self.args.model_dir, f"rank_{self.rank}")
         if not os.path.exists(model_rank_path):
@@ -299,7 +310,19 @@ class ModelRunner:
             task = tasks[i]
             idx = task['idx']
             length = len(task['input_ids'])
-            self.share_inputs['input_ids'][idx:idx + 1, :length] = np.array(task['input_ids'])
+            # the kv cache of the first cached_token_num tokens is already in the shared prefix blocks
+            cached_token_num = task.get('cached_token_num', 0)
+            prefill_len = length - cached_token_num
+            self.prefill_chunks.pop(idx, None)
+            if self.prefill_chunk_size > 0 and prefill_len > self.prefill_chunk_size:
+                prefill_len = self.prefill_chunk_size
+                if not self.schedule_prefill_chunk(prefill_len):
+                    # the first chunk waits for a later step, see update_prefill_chunks
+                    prefill_len = 0
+                self.prefill_chunks[idx] = [np.array(task['input_ids']), cached_token_num + prefill_len]
+            if prefill_len > 0:
+                self.share_inputs['input_ids'][idx:idx + 1, :prefill_len] = np.array(
+                                            task['input_ids'][cached_token_num:cached_token_num + prefill_len])
             if len(task['eos_token_ids']) < self.eos_tokens_lens:
                 task['eos_token_ids'].append(task['eos_token_ids'][0])
             self.share_inputs['eos_token_id'][:] = np.array(task['eos_token_ids'], dtype="int64").reshape(-1, 1)
@@ -309,10 +332,10 @@ class ModelRunner:
             self.share_inputs['penalty_score'][idx:idx + 1] = task.get('penalty_score', 1.0)
             self.share_inputs['frequency_score'][idx:idx + 1] = task.get('frequency_score', 0.0)
             self.share_inputs['presence_score'][idx:idx + 1] = task.get('presence_score', 0.0)
-            self.share_inputs['seq_lens_this_time'][idx:idx + 1] = length
-            self.share_inputs['step_seq_lens_encoder'][idx:idx + 1] = length
-            self.share_inputs['seq_lens_encoder'][idx:idx + 1] = length
-            self.share_inputs['seq_lens_decoder'][idx:idx + 1] = 0
+            self.share_inputs['seq_lens_this_time'][idx:idx + 1] = prefill_len
+            self.share_inputs['step_seq_lens_encoder'][idx:idx + 1] = prefill_len
+            self.share_inputs['seq_lens_encoder'][idx:idx + 1] = prefill_len
+            self.share_inputs['seq_lens_decoder'][idx:idx + 1] = cached_token_num
             self.share_inputs['step_idx'][idx:idx + 1] = 0
             self.share_inputs['min_length'][idx:idx + 1] = task.get('min_dec_len', 1)
             if "max_dec_len" in task:
@@ -322,10 +345,11 @@ class ModelRunner:
             else:
                 max_dec_len = self.args.max_dec_len
             self.share_inputs['max_length'][idx:idx + 1] = max_dec_len
-            self.share_inputs['stop_flags'][idx:idx + 1] = False
+            # a prompt waiting for its first chunk is stopped, and outputs -1 as it has no tokens this step
+            self.share_inputs['stop_flags'][idx:idx + 1] = prefill_len == 0
 
             if self.reduce_dialogue_repetition:
-                self.share_inputs['first_token_ids'][idx:idx + 1] =  self.share_inputs['input_ids'][idx:idx + 1, :1]
+                self.share_inputs['first_token_ids'][idx:idx + 1] = task['input_ids'][0]
                 self.share_inputs["ori_seq_lens_encoder"][idx:idx + 1] = length
 
             if "infer_seed" in task:
@@ -350,6 +374,53 @@ class ModelRunner:
                 self.share_inputs["draft_tokens"][idx:idx + 1] = np.zeros([self.speculate_config.speculate_max_draft_token_num + 1])
                 self.share_inputs["actual_draft_token_num"][idx:idx + 1] = np.array([self.speculate_config.speculate_max_draft_token_num])
 
+    def schedule_prefill_chunk(self, chunk_len):
+        """
+        schedule a prompt chunk for the next step if it fits in the step token budget,
+        the first chunk of a step is always scheduled
+
+        Args:
+            chunk_len (int): number of tokens of the chunk
+
+        Returns:
+            bool: whether the chunk is scheduled
+        """
+        if (self.prefill_step_token_num > 0 and self.scheduled_prefill_token_num > 0 and
+                self.scheduled_prefill_token_num + chunk_len > self.prefill_step_token_num):
+            return False
+        self.scheduled_prefill_token_num += chunk_len
+        return True
+
+    def update_prefill_chunks(self, seq_lens_this_time):
+        """
+        feed the next chunk of the prompts which are prefilled in chunks, within the step token budget
+        in order of insertion, the others are stopped until a later step. the token sampled after a
+        chunk which is not the last one, or -1 of a stopped prompt, is dropped by the token processor
+
+        Args:
+            seq_lens_this_time (Tensor): sequence lengths of the next step
+        """
+        for idx in list(self.prefill_chunks.keys()):
+            input_ids, offset = self.prefill_chunks[idx]
+            chunk_len = min(self.prefill_chunk_size, len(input_ids) - offset)
+            if not self.schedule_prefill_chunk(chunk_len):
+                seq_lens_this_time[idx:idx + 1] = 0
+                self.share_inputs['seq_lens_encoder'][idx:idx + 1] = 0
+                self.share_inputs['stop_flags'][idx:idx + 1] = True
+                continue
+            self.share_inputs['input_ids'][idx:idx + 1, :chunk_len] = input_ids[offset:offset + chunk_len]
+            seq_lens_this_time[idx:idx + 1] = chunk_len
+            self.share_inputs['seq_lens_encoder'][idx:idx + 1] = chunk_len
+            self.share_inputs['seq_lens_decoder'][idx:idx + 1] = offset
+            self.share_inputs['step_idx'][idx:idx + 1] = 0
+            self.share_inputs['pre_ids'][idx:idx + 1] = -1
+            self.share_inputs['stop_flags'][idx:idx + 1] = False
+            if offset + chunk_len >= len(input_ids):
+                del self.prefill_chunks[idx]
+            else:
+                self.prefill_chunks[idx][1] = offset + chunk_len
+        self.share_inputs['not_need_stop'][0] = True
+
     def step_cuda(self, seq_lens_this_time):
         """
         step cuda
@@ -506,6 +577,9 @@ class ModelRunner:
                 )
 
             self.infer_engine.predictor.run()
+            self.scheduled_prefill_token_num = 0
+            if self.prefill_chunks:
+                self.update_prefill_chunks(seq_lens_this_time)
             self.share_inputs['infer_seed'].add_(infer_seed_increment)
             self.share_inputs['infer_seed'][:] %= self.MAX_INFER_SEED
             if self.free_list_len > 0:
@@ -658,6 +732,11 @@ def parse_args():
                         type=int,
                         default=1,
                         help="first token id")
+    parser.add_argument('--task_queue_backend',
+                        type=str,
+                        default=None,
+                        choices=["shm", "manager"],
+                        help="task queue backend created by the engine")
     args = parser.parse_args()
     return args
 
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import copy
 import os
 import random
@@ -22,6 +23,162 @@ import numpy as np
 from server.utils import model_server_logger
 
 
+class PrefixBlockCache(object):
+    """
+    reference counted cache of the kv cache blocks filled by prompt prefixes
+
+    Every full block is indexed by the hash of its tokens chained with the hash of its parent block,
+    so the cached blocks form a radix tree of token blocks and a lookup walks down from the root.
+    A cached block is shared by all the running tasks that reference it and becomes evictable,
+    in least recently used order, once no task references it anymore.
+    """
+    def __init__(self, block_size):
+        self.block_size = block_size
+        # block hash -> block id
+        self.hash_to_block = dict()
+        # block id -> (block hash, parent block hash, block tokens)
+        self.block_info = dict()
+        # block id -> number of running tasks using the block
+        self.ref_counts = dict()
+        # unreferenced cached blocks, least recently used first
+        self.evictable = collections.OrderedDict()
+
+        self.num_queries = 0
+        self.num_hit_queries = 0
+        self.num_query_tokens = 0
+        self.num_hit_tokens = 0
+
+    def _iter_blocks(self, token_ids, max_blocks):
+        """
+        iterate over the (block hash, parent block hash, block tokens) of the full blocks of token_ids
+        """
+        parent_hash = None
+        for i in range(min(len(token_ids) // self.block_size, max_blocks)):
+            tokens = tuple(int(x) for x in token_ids[i * self.block_size: (i + 1) * self.block_size])
+            block_hash = hash((parent_hash, tokens))
+            yield block_hash, parent_hash, tokens
+            parent_hash = block_hash
+
+    def match(self, token_ids, max_blocks):
+        """
+        find the cached blocks of the longest prefix of token_ids and take a reference on them
+
+        Args:
+            token_ids (list): token ids of the prompt
+            max_blocks (int): maximum number of blocks to match
+
+        Returns:
+            list: cached block ids of the prefix
+        """
+        block_list = list()
+        for block_hash, parent_hash, tokens in self._iter_blocks(token_ids, max_blocks):
+            block_id = self.hash_to_block.get(block_hash)
+            if block_id is None or self.block_info[block_id] != (block_hash, parent_hash, tokens):
+                break
+            block_list.append(block_id)
+        for block_id in block_list:
+            self.ref_counts[block_id] += 1
+            self.evictable.pop(block_id, None)
+        return block_list
+
+    def insert(self, token_ids, block_list):
+        """
+        register the full prompt blocks of a task whose prefill is done, the task holds a reference on them
+
+        Args:
+            token_ids (list): token ids of the prompt
+            block_list (list): block ids of the task
+        """
+        for i, (block_hash, parent_hash, tokens) in enumerate(self._iter_blocks(token_ids, len(block_list))):
+            block_id = block_list[i]
+            if block_id in self.block_info:
+                continue
+            if block_hash in self.hash_to_block:
+                # the same prefix has been cached by another task meanwhile, keep this block private
+                continue
+            self.hash_to_block[block_hash] = block_id
+            self.block_info[block_id] = (block_hash, parent_hash, tokens)
+            self.ref_counts[block_id] = 1
+
+    def release(self, block_list):
+        """
+        drop the references of a finished task
+
+        Args:
+            block_list (list): block ids of the task
+
+        Returns:
+            list: block ids which are not cached and can be freed
+        """
+        free_blocks = list()
+        # deeper blocks are released first so that they are evicted before their parents
+        for block_id in reversed(block_list):
+            if block_id not in self.block_info:
+                free_blocks.append(block_id)
+                continue
+            self.ref_counts[block_id] -= 1
+            if self.ref_counts[block_id] == 0:
+                self.evictable[block_id] = None
+                self.evictable.move_to_end(block_id)
+        free_blocks.reverse()
+        return free_blocks
+
+    def evict(self, block_num):
+        """
+        remove the least recently used unreferenced blocks from the cache
+
+        Args:
+            block_num (int): number of blocks to evict
+
+        Returns:
+            list: evicted block ids
+        """
+        block_list = list()
+        while len(block_list) < block_num and self.evictable:
+            block_id, _ = self.evictable.popitem(last=False)
+            block_hash = self.block_info.pop(block_id)[0]
+            del self.hash_to_block[block_hash]
+            del self.ref_counts[block_id]
+            block_list.append(block_id)
+        return block_list
+
+    def num_evictable(self):
+        """
+        number of cached blocks which can be evicted
+
+        Returns:
+            int: evictable block number
+        """
+        return len(self.evictable)
+
+    def record(self, query_token_num, hit_token_num):
+        """
+        update the hit statistics with an allocated task
+
+        Args:
+            query_token_num (int): number of prompt tokens
+            hit_token_num (int): number of prompt tokens served from the cache
+        """
+        self.num_queries += 1
+        self.num_hit_queries += int(hit_token_num > 0)
+        self.num_query_tokens += query_token_num
+        self.num_hit_tokens += hit_token_num
+
+    def metrics(self):
+        """
+        hit statistics of the cache
+
+        Returns:
+            dict: cache metrics
+        """
+        return {
+            "cached_block_num": len(self.block_info),
+            "query_hit_rate": self.num_hit_queries / max(self.num_queries, 1),
+            "token_hit_rate": self.num_hit_tokens / max(self.num_query_tokens, 1),
+            "saved_token_num": self.num_hit_tokens,
+        }
+
+
 class ResourceManager(object):
     """
     record and allocate resources for the engine
@@ -31,6 +188,13 @@ class ResourceManager(object):
         self.stop_flags = [True] * cfg.max_batch_size
         self.free_list = list(range(cfg.max_block_num - 1, -1, -1))
         self.tasks_list = [None] * self.cfg.max_batch_size
+        self.prefix_cache = None
+        if getattr(cfg, "enable_prefix_caching", False):
+            self.prefix_cache = PrefixBlockCache(cfg.block_size)
+        # guards the free list and the prefix cache, shared by the insert and the token processor threads
+        self.lock = threading.Lock()
+        # called whenever resources are released, to wake up the scheduler
+        self.release_callbacks = list()
         # current batch status of the engine
         self.real_bsz = 0
         model_server_logger.info(f"{self.info()}")
@@ -99,16 +263,71 @@ class ResourceManager(object):
         else:
             raise ValueError('unknown required type')
         block_num = min(block_num, self.cfg.max_query_block_num)
+        with self.lock:
+            block_list = self._pop_free_blocks(block_num)
+        if block_list:
+            model_server_logger.info(f"dispatch {len(block_list)} blocks.")
+        return block_list
+
+    def _pop_free_blocks(self, block_num):
+        """
+        take blocks from the free list, evicting unreferenced cached blocks when it is short
+
+        Args:
+            block_num (int): block number
+
+        Returns:
+            list: block list, empty if the resources are insufficient
+        """
         block_list = list()
-        if block_num > len(self.free_list):
-            model_server_logger.error("block_num:{0} > free_list len:{1}".format(block_num, len(self.free_list)))
+        if block_num > self.availabel_block_num():
+            model_server_logger.error("block_num:{0} > availabel_block_num:{1}".format(
+                block_num, self.availabel_block_num()))
             return block_list
+        if block_num > len(self.free_list):
+            self.free_list.extend(self.prefix_cache.evict(block_num - len(self.free_list)))
         for _ in range(block_num):
             used_block_id = self.free_list.pop()
             block_list.append(used_block_id)
-        model_server_logger.info(f"dispatch {len(block_list)} blocks.")
         return block_list
 
+    def _get_block_tables_with_prefix_cache(self, task):
+        """
+        allocate memory resources for a task, reusing the cached blocks of its prompt prefix
+
+        Args:
+            task (dict): task
+
+        Returns:
+            list: block list, the cached prefix blocks come first
+        """
+        input_token_num = len(task["input_ids"])
+        block_num = min(self.get_required_block_number(input_token_num), self.cfg.max_query_block_num)
+        with self.lock:
+            # at least one prompt token is left to be computed, which produces the first output token
+            cached_blocks = self.prefix_cache.match(task["input_ids"], (input_token_num - 1) // self.cfg.block_size)
+            block_list = self._pop_free_blocks(block_num - len(cached_blocks))
+            if not block_list:
+                self.prefix_cache.release(cached_blocks)
+                return block_list
+            cached_token_num = len(cached_blocks) * self.cfg.block_size
+            self.prefix_cache.record(input_token_num, cached_token_num)
+        task["cached_token_num"] = cached_token_num
+        model_server_logger.info(f"dispatch {len(block_list)} blocks, reuse {len(cached_blocks)} cached blocks.")
+        return cached_blocks + block_list
+
+    def cache_prefix_blocks(self, task):
+        """
+        make the prompt blocks of a task reusable once its prefill is done
+
+        Args:
+            task (dict): task
+        """
+        if self.prefix_cache is None:
+            return
+        with self.lock:
+            self.prefix_cache.insert(task["input_ids"], task["block_tables"])
+
     def _recycle_block_tables(self, block_tables):
         """
         Recycling memory resource blocks
@@ -116,10 +335,24 @@ class ResourceManager(object):
         Args:
             block_tables (list): block list
         """
-        ori_number = len(self.free_list)
-        self.free_list.extend(block_tables)
-        cur_number = len(self.free_list)
+        with self.lock:
+            if self.prefix_cache is not None:
+                block_tables = self.prefix_cache.release(block_tables)
+            ori_number = len(self.free_list)
+            self.free_list.extend(block_tables)
+            cur_number = len(self.free_list)
         model_server_logger.info(f"recycle {cur_number - ori_number} blocks.")
+        for callback in self.release_callbacks:
+            callback()
+
+    def register_release_callback(self, callback):
+        """
+        register a function called whenever a task releases its resources
+
+        Args:
+            callback (function): function without arguments
+        """
+        self.release_callbacks.append(callback)
 
     def available_batch(self):
         """
@@ -137,6 +370,8 @@ class ResourceManager(object):
         Returns:
             int: available block size
         """
+        if self.prefix_cache is not None:
+            return len(self.free_list) + self.prefix_cache.num_evictable()
         return len(self.free_list)
 
     def is_resource_sufficient(self, input_token_num):
@@ -201,10 +436,18 @@ class ResourceManager(object):
                     else:
                         task["infer_seed"] = random.randint(0, 9223372036854775807)
                     task["idx"] = allocated_position
-                    task["block_tables"] = self._get_block_tables(len(task["input_ids"]))
+                    if self.prefix_cache is not None:
+                        task["block_tables"] = self._get_block_tables_with_prefix_cache(task)
+                    else:
+                        task["block_tables"] = self._get_block_tables(len(task["input_ids"]))
                     if not task["block_tables"]:
                         model_server_logger.error("req_id: {0} block_tables is empty".format(task["req_id"]))
                         continue
+                    if self.cfg.prefill_chunk_size > 0:
+                        # number of engine steps the prompt takes, the first ones only fill the cache
+                        prefill_token_num = len(task["input_ids"]) - task.get("cached_token_num", 0)
+                        task["prefill_chunk_num"] = (prefill_token_num + self.cfg.prefill_chunk_size -
+                                                     1) // self.cfg.prefill_chunk_size
 
                     processed_tasks.append(task)
                     self.stop_flags[allocated_position] = False
@@ -238,4 +481,9 @@ class ResourceManager(object):
         info = f"ResourceManager info, " \
                f"total_block_number: {self.total_block_number()}, total_batch_number: {len(self.stop_flags)}, " \
                f"availabel_block_num: {self.availabel_block_num()}, available_batch: {self.available_batch()}"
+        if self.prefix_cache is not None:
+            metrics = self.prefix_cache.metrics()
+            info += f", cached_block_num: {metrics['cached_block_num']}, " \
+                    f"prefix_cache_hit_rate: {metrics['token_hit_rate']:.4f}, " \
+                    f"saved_token_num: {metrics['saved_token_num']}"
         return info
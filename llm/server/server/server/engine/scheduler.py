@@ -0,0 +1,232 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from server.utils import model_server_logger
+
+
+class Scheduler(object):
+    """
+    base class of the admission schedulers
+
+    A scheduler holds the requests waiting to be inserted into the engine and decides which of them
+    are inserted next. The insert thread sleeps on `wait` and is woken up by new requests or by
+    released engine resources instead of polling.
+    """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.counter = itertools.count()
+
+    def __len__(self):
+        with self.lock:
+            return self._num_tasks()
+
+    def put(self, task):
+        """
+        add a request to the waiting queue
+
+        Args:
+            task (dict): request
+        """
+        task["schedule_arrival_time"] = time.time()
+        with self.lock:
+            self._push(task)
+        self.event.set()
+
+    def notify(self):
+        """
+        wake up the insert thread, called when engine resources are released
+        """
+        self.event.set()
+
+    def wait(self, timeout=None):
+        """
+        wait for new requests or released resources
+
+        Args:
+            timeout (float): maximum waiting time in seconds
+
+        Returns:
+            bool: whether it is woken up before the timeout
+        """
+        woken = self.event.wait(timeout)
+        self.event.clear()
+        return woken
+
+    def get_tasks(self, max_num, resource_manager):
+        """
+        pop the requests to insert into the engine in this round
+
+        Args:
+            max_num (int): maximum number of requests
+            resource_manager (ResourceManager): resource manager of the engine
+
+        Returns:
+            list: requests in insertion order
+        """
+        available_batch = resource_manager.available_batch()
+        available_block_num = resource_manager.availabel_block_num()
+        tasks = list()
+        token_num = 0
+        with self.lock:
+            while len(tasks) < min(max_num, available_batch) and self._num_tasks() > 0:
+                task = self._peek()
+                input_token_num = len(task["input_ids"])
+                block_num = resource_manager.get_required_block_number(input_token_num)
+                if block_num > available_block_num:
+                    break
+                if tasks and not self._within_budget(token_num + input_token_num):
+                    break
+                self._pop()
+                tasks.append(task)
+                token_num += input_token_num
+                available_block_num -= block_num
+        return tasks
+
+    def _within_budget(self, token_num):
+        """
+        whether the requests inserted in one round may hold token_num prompt tokens
+        """
+        return True
+
+    def _num_tasks(self):
+        raise NotImplementedError
+
+    def _push(self, task):
+        raise NotImplementedError
+
+    def _peek(self):
+        raise NotImplementedError
+
+    def _pop(self):
+        raise NotImplementedError
+
+
+class FCFSScheduler(Scheduler):
+    """
+    first come first served, a request which does not fit blocks the requests behind it
+    """
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.queue = deque()
+
+    def _num_tasks(self):
+        return len(self.queue)
+
+    def _push(self, task):
+        self.queue.append(task)
+
+    def _peek(self):
+        return self.queue[0]
+
+    def _pop(self):
+        return self.queue.popleft()
+
+
+class ShortestPromptFirstScheduler(Scheduler):
+    """
+    shortest prompt first, which lowers the average waiting time under mixed length traffic
+
+    Requests waiting longer than max_wait_time seconds are served first come first served,
+    so that long prompts are not starved.
+    """
+    def __init__(self, cfg, max_wait_time=None):
+        super().__init__(cfg)
+        if max_wait_time is None:
+            max_wait_time = cfg.scheduler_max_wait_time
+        self.max_wait_time = max_wait_time
+        # (input token number, arrival index, task)
+        self.heap = list()
+        # arrival index of the queued requests in arrival order
+        self.arrival_queue = deque()
+        self.popped = set()
+        self.serve_oldest = False
+
+    def _num_tasks(self):
+        return len(self.heap)
+
+    def _push(self, task):
+        index = next(self.counter)
+        heapq.heappush(self.heap, (len(task["input_ids"]), index, task))
+        self.arrival_queue.append((index, task))
+
+    def _oldest(self):
+        while self.arrival_queue and self.arrival_queue[0][0] in self.popped:
+            self.popped.discard(self.arrival_queue.popleft()[0])
+        return self.arrival_queue[0] if self.arrival_queue else None
+
+    def _peek(self):
+        oldest = self._oldest()
+        # decided here so that _pop removes the request returned by _peek
+        self.serve_oldest = oldest is not None and \
+            time.time() - oldest[1]["schedule_arrival_time"] > self.max_wait_time
+        if self.serve_oldest:
+            return oldest[1]
+        return self.heap[0][2]
+
+    def _pop(self):
+        if self.serve_oldest:
+            index, task = self.arrival_queue.popleft()
+            self.heap.remove((len(task["input_ids"]), index, task))
+            heapq.heapify(self.heap)
+            return task
+        _, index, task = heapq.heappop(self.heap)
+        self.popped.add(index)
+        return task
+
+
+class TokenBudgetScheduler(FCFSScheduler):
+    """
+    first come first served with a budget of prompt tokens per round, which bounds the prefill
+    time of a step and so the latency added to the running requests
+    """
+    def __init__(self, cfg, max_prefill_token_num=None):
+        super().__init__(cfg)
+        if max_prefill_token_num is None:
+            max_prefill_token_num = cfg.max_prefill_token_num
+        self.max_prefill_token_num = max_prefill_token_num
+
+    def _within_budget(self, token_num):
+        return token_num <= self.max_prefill_token_num
+
+
+SCHEDULERS = {
+    "fcfs": FCFSScheduler,
+    "spf": ShortestPromptFirstScheduler,
+    "token_budget": TokenBudgetScheduler,
+}
+
+
+def create_scheduler(cfg):
+    """
+    create the admission scheduler configured by SCHEDULER_POLICY
+
+    Args:
+        cfg (Config): server config
+
+    Returns:
+        Scheduler: admission scheduler
+    """
+    if cfg.scheduler_policy not in SCHEDULERS:
+        raise ValueError(f"unknown scheduler policy: {cfg.scheduler_policy}, "
+                         f"supported policies: {list(SCHEDULERS.keys())}")
+    model_server_logger.info(f"use {cfg.scheduler_policy} scheduler")
+    return SCHEDULERS[cfg.scheduler_policy](cfg)
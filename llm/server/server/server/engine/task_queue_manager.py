@@ -13,12 +13,15 @@
 # limitations under the License.
 
 import os
+import pickle
 import threading
 import time
+from multiprocessing import shared_memory
 from multiprocessing.managers import (AcquirerProxy, BaseManager, ListProxy,
                                       Value, ValueProxy)
 from queue import Queue
 
+import numpy as np
 from server.utils import get_logger
 
 logger = get_logger("infer_server", "task_queue_manager.log")
@@ -131,6 +134,187 @@ class TaskQueueManager(object):
         return input_list, read_finish
 
 
+class ShmTaskQueue(object):
+    """
+    shared memory task queue, a single producer ring buffer read by every infer process
+
+    The buffer holds length prefixed pickled items. The producer publishes an item by advancing the
+    write position after copying it, and every rank advances its own read position after copying
+    the items out, so neither side takes a lock or makes a RPC call. Positions are byte sequence
+    numbers which only grow.
+
+    As with the queue manager, an item is published only once every rank has read all the previous
+    ones, so that the tensor parallel ranks, which read the queue in the same step, always get the
+    same items.
+    """
+    # every position lives in its own cache line
+    POS_STRIDE = 8
+
+    def __init__(self, name, rank=0, mp_num=8, size=64 * 1024 * 1024, create=False):
+        """
+        Initialization function, the engine creates the queue and the infer processes attach to it
+
+        Args:
+            name (str): name of the shared memory
+            rank (int): rank of the infer process
+            mp_num (int): number of infer processes
+            size (int): capacity of the buffer in bytes
+            create (bool): whether to create the shared memory
+        """
+        self.max_get_num = int(os.getenv("ENGINE_MAX_NEED_NUM", 0))
+        self.name = name
+        self.rank = rank
+        self.mp_num = mp_num
+        header_size = (mp_num + 1) * self.POS_STRIDE * 8
+        if create:
+            try:
+                tmp = shared_memory.SharedMemory(create=False, name=name)
+                tmp.close()
+                tmp.unlink()
+            except:
+                pass
+            self.shm = shared_memory.SharedMemory(create=True, size=header_size + size, name=name)
+        else:
+            self.shm = shared_memory.SharedMemory(create=False, name=name)
+            size = self.shm.size - header_size
+        self.size = size
+        self.header = np.ndarray([(mp_num + 1) * self.POS_STRIDE], dtype=np.int64, buffer=self.shm.buf)
+        self.buffer = np.ndarray([size], dtype=np.uint8, buffer=self.shm.buf, offset=header_size)
+        if create:
+            self.header[:] = 0
+        self.read_index = (rank + 1) * self.POS_STRIDE
+        logger.info(f"init shared memory task queue success, rank: {rank}, size: {size}")
+
+    def _write_pos(self):
+        return int(self.header[0])
+
+    def _min_read_pos(self):
+        return int(self.header[self.POS_STRIDE::self.POS_STRIDE].min())
+
+    def _copy_in(self, pos, data):
+        start = pos % self.size
+        first = min(len(data), self.size - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < len(data):
+            self.buffer[:len(data) - first] = data[first:]
+
+    def _copy_out(self, pos, length):
+        start = pos % self.size
+        first = min(length, self.size - start)
+        if first == length:
+            return self.buffer[start:start + length].tobytes()
+        return self.buffer[start:].tobytes() + self.buffer[:length - first].tobytes()
+
+    def empty(self):
+        """
+        check whether every infer process has read all the items
+
+        Returns:
+            bool: True if the queue is empty, otherwise False
+        """
+        return self._min_read_pos() == self._write_pos()
+
+    def put(self, item):
+        """
+        put item to queue, only called by the engine
+
+        Args:
+            item (any): the item to put into queue
+        """
+        payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        data = np.frombuffer(np.int64(len(payload)).tobytes() + payload, dtype=np.uint8)
+        if len(data) > self.size:
+            raise ValueError(f"item of {len(data)} bytes exceeds the task queue size {self.size}, "
+                             f"please increase TASK_QUEUE_SHM_SIZE")
+        write_pos = self._write_pos()
+        # wait for every rank to read the previous items, a rank reading between two puts would get
+        # more items than the ranks which have read before
+        if self._min_read_pos() < write_pos:
+            while self._min_read_pos() < write_pos:
+                time.sleep(0.001)
+            logger.info("put item to queue wait finish")
+        self._copy_in(write_pos, data)
+        # publish the item after it is copied
+        self.header[0] = write_pos + len(data)
+        logger.info("put item to queue success")
+
+    def get(self):
+        """
+        get item from queue
+
+        Returns:
+            list: the item from queue
+            bool: True if every infer process has read all the items
+        """
+        input_list = []
+        write_pos = self._write_pos()
+        read_pos = int(self.header[self.read_index])
+        while read_pos < write_pos and (self.max_get_num <= 0 or len(input_list) < self.max_get_num):
+            length = int(np.frombuffer(self._copy_out(read_pos, 8), dtype=np.int64)[0])
+            input_list.append(pickle.loads(self._copy_out(read_pos + 8, length)))
+            read_pos += 8 + length
+        if input_list:
+            self.header[self.read_index] = read_pos
+            logger.info("rank: {0} read {1} items".format(self.rank, len(input_list)))
+        read_finish = self.empty()
+        return input_list, read_finish
+
+    def close(self, unlink=False):
+        """
+        release the shared memory
+
+        Args:
+            unlink (bool): whether to destroy the shared memory, only done by the creator
+        """
+        del self.header, self.buffer
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def create_task_queue(cfg, rank=0, mp_num=8, create=False, backend=None):
+    """
+    create the task queue between the engine and the infer processes
+
+    Args:
+        cfg (Config): server config
+        rank (int): rank of the infer process
+        mp_num (int): number of infer processes
+        create (bool): whether it is the engine side, which creates the shared memory
+        backend (str): backend of the queue, defaults to TASK_QUEUE_BACKEND, the infer processes
+            use the backend created by the engine
+
+    Returns:
+        ShmTaskQueue or TaskQueueManager: task queue
+    """
+    if backend is None:
+        backend = cfg.task_queue_backend
+    if backend == "shm":
+        try:
+            return ShmTaskQueue(cfg.get_unique_name("shm_task_queue"), rank=rank, mp_num=mp_num,
+                                size=cfg.task_queue_shm_size, create=create)
+        except Exception as e:
+            # only the engine falls back, the infer processes must use the same queue as the engine
+            if not create:
+                logger.error(f"attach to the shared memory task queue failed, rank: {rank}, error: {e}")
+                raise
+            logger.warning(f"create shared memory task queue failed, use the queue manager instead: {e}")
+    return TaskQueueManager(rank=rank, mp_num=mp_num, port=cfg.infer_port)
+
+
+def get_task_queue_backend(task_queue):
+    """
+    get the backend of a task queue, which is passed to the infer processes
+
+    Args:
+        task_queue (ShmTaskQueue or TaskQueueManager): task queue
+
+    Returns:
+        str: shm or manager
+    """
+    return "shm" if isinstance(task_queue, ShmTaskQueue) else "manager"
+
+
 def launch_queue_service(port, num_workers):
     """
     Start the process communication queue service
@@ -212,10 +212,18 @@ class TokenProcessor(object):
                 continue
 
             task = self.resource_manager.tasks_list[i]
+            if task.get("prefill_chunk_num", 1) > 1:
+                # the token sampled after a prompt chunk which is not the last one is meaningless
+                task["prefill_chunk_num"] -= 1
+                continue
 
             task_id = task["req_id"]
             result = self._get_single_result(i, task_id, token_ids, task)
 
+            if self.tokens_counter[task_id] == 0:
+                # the prefill of the task is done, its prompt blocks can be shared from now on
+                self.resource_manager.cache_prefix_blocks(task)
+
             for token_id in token_ids:
                 self.tokens_counter[task_id] += 1
                 if token_id not in task["eos_token_ids"]:
@@ -22,17 +22,17 @@ import sys
 import threading
 import time
 import traceback
-from collections import Counter, deque
+from collections import Counter
 from datetime import datetime
 
 import numpy as np
+import server
 from server.checker import add_default_params, check_basic_params
 from server.engine import engine
 from server.engine.config import Config
+from server.engine.scheduler import create_scheduler
 from server.utils import error_logger, model_server_logger
 
-import server
-
 try:
     import triton_python_backend_utils as pb_utils
 except:
@@ -77,15 +77,20 @@ class TritonTokenProcessor(engine.TokenProcessor):
         while True:
             try:
                 batch_result = self.cached_generated_tokens.get()
+                send_results = []
                 for result in batch_result:
-                    req_id = result["req_id"]
                     is_end = result.get("is_end", 0)
                     return_all_tokens = result.get("return_all_tokens", False)
                     if is_end == 0 and (return_all_tokens or self.cfg.disable_streaming):
                         continue
                     if return_all_tokens and "topk_tokens" in result:
                         del result["topk_tokens"]
-                    result = self.triton_server.data_processor.process_response(result)
+                    send_results.append(result)
+                # detokenize the results of the whole step at once
+                send_results = self.triton_server.data_processor.process_responses(send_results)
+                for result in send_results:
+                    req_id = result["req_id"]
+                    is_end = result.get("is_end", 0)
                     if "usage" in result:
                         result["usage"]["prompt_tokens"] = self.triton_server.task_info[req_id]["prompt_tokens"]
                     model_server_logger.debug(f"Send result to client under push mode: {result}")
@@ -274,7 +279,8 @@ class TritonServer(object):
 
             self.response_sender = dict()
             self.task_info = dict()
-            self.cached_task_deque = deque()
+            self.scheduler = create_scheduler(self.cfg)
+            self.engine.resource_manager.register_release_callback(self.scheduler.notify)
             self.enable_insert_task_push_mode = True
             self.insert_task_to_engine_thread = threading.Thread(
                 target=self._insert_task_push_mode, args=())
@@ -283,7 +289,7 @@ class TritonServer(object):
 
     def _process_task_push_mode(self, tasks, current_response_sender):
         """
-        check request and insert into cached_task_deque
+        check request and insert into the scheduler
 
         Args:
             tasks (list): list of request
@@ -292,7 +298,7 @@ class TritonServer(object):
         try:
             tik = time.time()
             req_id = tasks[0]["req_id"]
-            cached_task_num = len(self.cached_task_deque)
+            cached_task_num = len(self.scheduler)
             if cached_task_num >= self.cfg.max_cached_task_num:
                 error_msg = f"cached task num ({cached_task_num}) exceeds " \
                             f"the limit ({self.cfg.max_cached_task_num})"
@@ -359,10 +365,10 @@ class TritonServer(object):
                 self.task_info[task_id] = {"prompt_tokens": input_ids_len}
 
             task["preprocess_end_time"] = datetime.now()
-            self.cached_task_deque.appendleft(task)
+            self.scheduler.put(task)
             tok = time.time()
             model_server_logger.info(f"cache task with req_id ({task_id}), "
-                                     f"cost time: {tok-tik}s, cached_task_num: {len(self.cached_task_deque)}.")
+                                     f"cost time: {tok-tik}s, cached_task_num: {len(self.scheduler)}.")
             model_server_logger.debug(f"cache task: {task}")
         except Exception as e:
             error_msg = "Unexcepted promblem happend while insert new task to server task queue: {}, {}".format(
@@ -371,42 +377,31 @@ class TritonServer(object):
 
     def _insert_task_push_mode(self):
         """
-        Insert task to engine thread, monitor cached_task_deque.
-        if the engine has resource, insert task to engine
+        Insert task to engine thread, driven by the scheduler.
+        The thread sleeps until a new request arrives or the engine releases resources,
+        then inserts the requests chosen by the scheduler policy.
         """
         try:
             while self.enable_insert_task_push_mode:
                 if not hasattr(self, "engine") or self.engine is None:
                     time.sleep(0.1)
                     continue
-                if self.engine.available_batch() == 0:
-                    time.sleep(0.001)
-                    continue
-                if len(self.cached_task_deque) == 0:
-                    time.sleep(0.001)
+                if len(self.scheduler) == 0 or self.engine.available_batch() == 0:
+                    self.scheduler.wait(timeout=1.0)
                     continue
                 if not self.engine.is_queue_empty():
+                    # the task queue is consumed by the infer process, there is no event to wait for
                     time.sleep(0.001)
                     continue
 
-                i_bs = 0
-                for _ in range(self.cfg.max_prefill_batch):
-                    if len(self.cached_task_deque) == 0:
-                        break
-                    if self.engine.available_batch() == 0:
-                        break
-                    while i_bs < self.cfg.max_batch_size:
-                        if self.engine.task_is_finished(i_bs):
-                            break
-                        i_bs += 1
-                    if i_bs >= self.cfg.max_batch_size:
-                        break
-                    input_token_num = len(self.cached_task_deque[-1]["input_ids"])
-                    if not self.engine.is_resource_sufficient(input_token_num):
-                        break
-                    task = self.cached_task_deque.pop()
+                tasks = self.scheduler.get_tasks(self.cfg.max_prefill_batch, self.engine.resource_manager)
+                if not tasks:
+                    self.scheduler.wait(timeout=1.0)
+                    continue
+                for task in tasks:
                     try:
-                        self.engine.insert_tasks([task])
+                        if not self.engine.insert_tasks([task]):
+                            raise RuntimeError("the engine has no resource for the task")
                     except Exception as e:
                         err_msg = "Error happend while insert task to engine: {}, {}.".format(
                             e, str(traceback.format_exc()))
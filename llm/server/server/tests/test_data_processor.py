@@ -0,0 +1,73 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Usage:
+    cd llm/server/server && python -m pytest tests/test_data_processor.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FD_LOG_DIR", tempfile.mkdtemp())
+from server.data.processor import IncrementalDetokenizer
+
+TEXT = "héllo, 世界! 👋"
+
+
+class ByteTokenizer(object):
+    """
+    one token per utf-8 byte, so that characters span several tokens
+    """
+    def batch_decode(self, sequences, skip_special_tokens=False, clean_up_tokenization_spaces=False):
+        return [bytes(seq).decode("utf-8", errors="replace") for seq in sequences]
+
+
+class IncrementalDetokenizerTest(unittest.TestCase):
+    def test_deltas_match_full_decode(self):
+        detokenizer = IncrementalDetokenizer(ByteTokenizer())
+        token_ids = {"a": list(TEXT.encode("utf-8")), "b": list(TEXT[::-1].encode("utf-8"))}
+        deltas = {"a": [], "b": []}
+        # both requests are decoded in the same batch, one token per step
+        for step in range(max(len(ids) for ids in token_ids.values())):
+            task_ids = [task_id for task_id, ids in token_ids.items() if step < len(ids)]
+            results = detokenizer.decode([[token_ids[task_id][step]] for task_id in task_ids], task_ids,
+                                         [step == len(token_ids[task_id]) - 1 for task_id in task_ids])
+            for task_id, text in zip(task_ids, results):
+                self.assertNotIn("�", text)
+                deltas[task_id].append(text)
+
+        self.assertEqual("".join(deltas["a"]), TEXT)
+        self.assertEqual("".join(deltas["b"]), TEXT[::-1])
+        # the first byte of "é" is held back until the character is complete
+        self.assertEqual(deltas["a"][1:3], ["", "é"])
+        self.assertEqual(detokenizer.release("a"), TEXT)
+        self.assertEqual(detokenizer.release("b"), TEXT[::-1])
+        self.assertEqual(detokenizer.decode_status, dict())
+        self.assertEqual(detokenizer.release("a"), "")
+
+    def test_flush_at_end(self):
+        detokenizer = IncrementalDetokenizer(ByteTokenizer())
+        token_ids = list("世".encode("utf-8"))
+        self.assertEqual(detokenizer.decode([token_ids[:2]], ["a"]), [""])
+        # an unfinished sequence is flushed when the request ends
+        self.assertEqual(detokenizer.decode([[]], ["a"], [True]), ["�"])
+        self.assertEqual(detokenizer.release("a"), "�")
+
+
+if __name__ == "__main__":
+    unittest.main()
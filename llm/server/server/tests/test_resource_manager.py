@@ -0,0 +1,110 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Usage:
+    cd llm/server/server && python -m pytest tests/test_resource_manager.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FD_LOG_DIR", tempfile.mkdtemp())
+from server.engine.resource_manager import PrefixBlockCache, ResourceManager
+
+
+class PrefixBlockCacheTest(unittest.TestCase):
+    def test_match_insert_release(self):
+        cache = PrefixBlockCache(block_size=2)
+        self.assertEqual(cache.match([1, 2, 3, 4, 5], max_blocks=2), [])
+        # only the full blocks of the prompt are cached
+        cache.insert([1, 2, 3, 4, 5], [10, 11, 12])
+        self.assertEqual(cache.metrics()["cached_block_num"], 2)
+
+        self.assertEqual(cache.match([1, 2, 3, 4, 9], max_blocks=2), [10, 11])
+        self.assertEqual(cache.match([1, 2, 7, 7], max_blocks=2), [10])
+        # a block only matches under the same parent block
+        self.assertEqual(cache.match([7, 7, 3, 4], max_blocks=2), [])
+        self.assertEqual(cache.ref_counts, {10: 3, 11: 2})
+
+        # the uncached block is freed right away, the cached ones once unreferenced
+        self.assertEqual(cache.release([10, 11, 12]), [12])
+        self.assertEqual(cache.release([10, 11, 13]), [13])
+        self.assertEqual(cache.ref_counts, {10: 1, 11: 0})
+        self.assertEqual(cache.num_evictable(), 1)
+        self.assertEqual(cache.release([10, 14]), [14])
+        self.assertEqual(cache.num_evictable(), 2)
+
+        # a referenced block is not evictable anymore
+        self.assertEqual(cache.match([1, 2], max_blocks=1), [10])
+        self.assertEqual(cache.evict(2), [11])
+        self.assertEqual(cache.match([1, 2, 3, 4], max_blocks=2), [10])
+
+    def test_evict_least_recently_used_deepest_first(self):
+        cache = PrefixBlockCache(block_size=1)
+        cache.insert([1, 2, 3], [0, 1, 2])
+        cache.insert([4, 5], [3, 4])
+        cache.release([0, 1, 2])
+        cache.release([3, 4])
+        # the first released prefix is evicted first, its deeper blocks before their parents
+        self.assertEqual(cache.evict(4), [2, 1, 0, 4])
+        self.assertEqual(cache.match([1, 2, 3], max_blocks=3), [])
+        self.assertEqual(cache.match([4, 5], max_blocks=2), [3])
+        self.assertEqual(cache.evict(1), [])
+
+
+class ResourceManagerPrefixCacheTest(unittest.TestCase):
+    def setUp(self):
+        cfg = SimpleNamespace(max_batch_size=2, max_block_num=4, block_size=2, dec_token_num=2,
+                              max_query_block_num=8, enable_prefix_caching=True)
+        self.resource_manager = ResourceManager(cfg)
+
+    def run_task(self, input_ids):
+        task = {"input_ids": input_ids}
+        task["block_tables"] = self.resource_manager._get_block_tables_with_prefix_cache(task)
+        self.resource_manager.cache_prefix_blocks(task)
+        return task
+
+    def test_reuse_cached_prefix(self):
+        task = self.run_task([1, 2, 3, 4, 5])
+        self.assertEqual(task["block_tables"], [0, 1, 2, 3])
+        self.resource_manager._recycle_block_tables(task["block_tables"])
+        self.assertEqual(self.resource_manager.free_list, [2, 3])
+
+        task = self.run_task([1, 2, 3, 4, 6])
+        self.assertEqual(task["block_tables"][:2], [0, 1])
+        self.assertEqual(task["cached_token_num"], 4)
+        self.assertEqual(self.resource_manager.prefix_cache.metrics()["saved_token_num"], 4)
+
+    def test_pop_free_blocks_evicts(self):
+        task = self.run_task([1, 2, 3, 4, 5])
+        self.resource_manager._recycle_block_tables(task["block_tables"])
+        self.assertEqual(self.resource_manager.availabel_block_num(), 4)
+
+        # two blocks are left in the free list, the cached blocks are evicted for the other two
+        with self.resource_manager.lock:
+            block_list = self.resource_manager._pop_free_blocks(4)
+        self.assertEqual(sorted(block_list), [0, 1, 2, 3])
+        self.assertEqual(self.resource_manager.prefix_cache.metrics()["cached_block_num"], 0)
+        self.assertEqual(self.resource_manager.availabel_block_num(), 0)
+        with self.resource_manager.lock:
+            self.assertEqual(self.resource_manager._pop_free_blocks(1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
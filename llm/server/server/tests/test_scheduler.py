@@ -0,0 +1,116 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Usage:
+    cd llm/server/server && python -m pytest tests/test_scheduler.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FD_LOG_DIR", tempfile.mkdtemp())
+from server.engine.scheduler import ShortestPromptFirstScheduler, TokenBudgetScheduler
+
+
+class FakeResourceManager(object):
+    """
+    one block per prompt token
+    """
+    def __init__(self, block_num, batch_size=8):
+        self.block_num = block_num
+        self.batch_size = batch_size
+
+    def available_batch(self):
+        return self.batch_size
+
+    def availabel_block_num(self):
+        return self.block_num
+
+    def get_required_block_number(self, input_token_num):
+        return input_token_num
+
+
+def make_task(name, input_token_num):
+    return {"req_id": name, "input_ids": [0] * input_token_num}
+
+
+def req_ids(tasks):
+    return [task["req_id"] for task in tasks]
+
+
+class ShortestPromptFirstSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ShortestPromptFirstScheduler(SimpleNamespace(), max_wait_time=60)
+
+    def put(self, name, input_token_num, waited=0):
+        task = make_task(name, input_token_num)
+        self.scheduler.put(task)
+        task["schedule_arrival_time"] -= waited
+        return task
+
+    def test_shortest_first(self):
+        self.put("long", 10)
+        self.put("short", 2)
+        self.put("medium", 5)
+        self.assertEqual(req_ids(self.scheduler.get_tasks(2, FakeResourceManager(100))), ["short", "medium"])
+        self.assertEqual(req_ids(self.scheduler.get_tasks(2, FakeResourceManager(100))), ["long"])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_starved_request_served_first(self):
+        self.put("long", 10, waited=120)
+        self.put("short", 2)
+        self.assertEqual(req_ids(self.scheduler.get_tasks(1, FakeResourceManager(100))), ["long"])
+        self.assertEqual(req_ids(self.scheduler.get_tasks(1, FakeResourceManager(100))), ["short"])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_starved_request_blocks_until_it_fits(self):
+        self.put("long", 10, waited=120)
+        self.put("short", 2)
+        # _peek picked the starved request, which does not fit, so nothing is popped
+        self.assertEqual(self.scheduler.get_tasks(2, FakeResourceManager(5)), [])
+        self.assertEqual(len(self.scheduler), 2)
+        self.assertEqual(req_ids(self.scheduler.get_tasks(2, FakeResourceManager(12))), ["long", "short"])
+
+    def test_oldest_skips_requests_served_by_length(self):
+        self.put("short", 2)
+        long_task = self.put("long", 10)
+        self.assertEqual(req_ids(self.scheduler.get_tasks(1, FakeResourceManager(100))), ["short"])
+        # "short" is still at the head of the arrival queue and must be skipped
+        long_task["schedule_arrival_time"] -= 120
+        self.put("tiny", 1)
+        self.assertEqual(req_ids(self.scheduler.get_tasks(1, FakeResourceManager(100))), ["long"])
+        self.assertEqual(req_ids(self.scheduler.get_tasks(1, FakeResourceManager(100))), ["tiny"])
+        self.assertEqual(len(self.scheduler), 0)
+
+
+class TokenBudgetSchedulerTest(unittest.TestCase):
+    def test_prefill_token_budget(self):
+        scheduler = TokenBudgetScheduler(SimpleNamespace(), max_prefill_token_num=10)
+        for i, input_token_num in enumerate([4, 4, 4, 20, 1]):
+            scheduler.put(make_task(str(i), input_token_num))
+        resource_manager = FakeResourceManager(100)
+        self.assertEqual(req_ids(scheduler.get_tasks(8, resource_manager)), ["0", "1"])
+        self.assertEqual(req_ids(scheduler.get_tasks(8, resource_manager)), ["2"])
+        # a request over the budget on its own is still inserted, alone
+        self.assertEqual(req_ids(scheduler.get_tasks(8, resource_manager)), ["3"])
+        self.assertEqual(req_ids(scheduler.get_tasks(8, resource_manager)), ["4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
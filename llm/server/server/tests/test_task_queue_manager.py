@@ -0,0 +1,130 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Usage:
+    cd llm/server/server && python -m pytest tests/test_task_queue_manager.py
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("FD_LOG_DIR", tempfile.mkdtemp())
+from server.engine.task_queue_manager import (
+    ShmTaskQueue,
+    create_task_queue,
+    get_task_queue_backend,
+)
+
+SHM_NAME = f"shm_task_queue_test_{os.getpid()}"
+
+
+def read_in_lockstep(rank, mp_num, num_steps, barrier, flag, result_queue):
+    """
+    every step, rank 0 checks whether the queue has items and the ranks read it after a barrier,
+    as the infer processes do
+    """
+    queue = ShmTaskQueue(SHM_NAME, rank=rank, mp_num=mp_num)
+    rng = random.Random(rank)
+    steps = list()
+    for _ in range(num_steps):
+        if rank == 0 and not queue.empty():
+            flag.value = 1
+        barrier.wait()
+        tasks = list()
+        if flag.value == 1:
+            time.sleep(rng.random() * 0.002)
+            tasks, read_finish = queue.get()
+            if read_finish:
+                flag.value = 0
+        steps.append(tasks)
+        time.sleep(rng.random() * 0.002)
+    queue.close()
+    result_queue.put((rank, steps))
+
+
+class ShmTaskQueueTest(unittest.TestCase):
+    def test_ranks_read_the_same_items(self):
+        mp_num, num_items, num_steps = 2, 20, 200
+        queue = ShmTaskQueue(SHM_NAME, mp_num=mp_num, size=1024 * 1024, create=True)
+        barrier = multiprocessing.Barrier(mp_num)
+        flag = multiprocessing.Value("i", 0, lock=False)
+        result_queue = multiprocessing.Queue()
+        ranks = [
+            multiprocessing.Process(target=read_in_lockstep,
+                                    args=(rank, mp_num, num_steps, barrier, flag, result_queue))
+            for rank in range(mp_num)
+        ]
+        for p in ranks:
+            p.start()
+
+        # back to back puts, as the engine inserts the tasks
+        def put_items():
+            for i in range(num_items):
+                queue.put(([{"req_id": str(i)}], 1))
+        producer = threading.Thread(target=put_items)
+        producer.start()
+
+        results = dict(result_queue.get() for _ in ranks)
+        for p in ranks:
+            p.join()
+        producer.join()
+        queue.close(unlink=True)
+
+        for step in range(num_steps):
+            self.assertEqual(results[0][step], results[1][step], f"step {step}")
+        items = [req_dicts[0]["req_id"] for tasks in results[0] for req_dicts, _ in tasks]
+        self.assertEqual(items, [str(i) for i in range(num_items)])
+
+    def test_put_waits_for_every_rank(self):
+        engine_queue = ShmTaskQueue(SHM_NAME, mp_num=2, size=1024, create=True)
+        rank_queues = [ShmTaskQueue(SHM_NAME, rank=rank, mp_num=2) for rank in range(2)]
+        engine_queue.put("A")
+        self.assertEqual(rank_queues[0].get(), (["A"], False))
+
+        # rank 1 has not read A yet, B is not published before it does
+        producer = threading.Thread(target=engine_queue.put, args=("B",))
+        producer.start()
+        time.sleep(0.05)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(rank_queues[1].get(), (["A"], True))
+        producer.join()
+        self.assertEqual(rank_queues[0].get(), (["B"], False))
+        self.assertEqual(rank_queues[1].get(), (["B"], True))
+
+        for queue in rank_queues:
+            queue.close()
+        engine_queue.close(unlink=True)
+
+    def test_infer_side_does_not_fall_back(self):
+        cfg = SimpleNamespace(task_queue_backend="shm", task_queue_shm_size=1024,
+                              infer_port=56666, get_unique_name=lambda name: f"{name}_missing_{os.getpid()}")
+        with self.assertRaises(FileNotFoundError):
+            create_task_queue(cfg, rank=0, mp_num=2, backend="shm")
+
+        queue = create_task_queue(cfg, mp_num=2, create=True)
+        self.assertEqual(get_task_queue_backend(queue), "shm")
+        queue.close(unlink=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,6 +20,14 @@ import time
 import numpy as np
 import paddle
 
+from paddlenlp.data.index_cache import (
+    build_index_cache,
+    is_index_cache_complete,
+    save_npy_atomic,
+    save_text_atomic,
+    wait_index_cache,
+)
+
 local_rank = int(os.getenv("PADDLE_RANK_IN_NODE", 0))
 
 
@@ -90,7 +98,9 @@ class BlendableDataset(paddle.io.Dataset):
             desc_path = os.path.join(data_cache_path, desc_hash + ".dsc")
             index_path = os.path.join(data_cache_path, desc_hash + "_index.npy")
             sample_index_path = os.path.join(data_cache_path, desc_hash + "_sample_index.npy")
-            cache_hit = os.path.isfile(index_path) and os.path.isfile(sample_index_path)
+            cache_hit = is_index_cache_complete(
+                os.path.join(data_cache_path, desc_hash), [desc_path, index_path, sample_index_path]
+            )
             # cache_success = True
             # if paddle.distributed.get_rank() == 0 and not cache_hit:
             check_rank_flag = not cache_hit and local_rank == 0
@@ -102,50 +112,34 @@ class BlendableDataset(paddle.io.Dataset):
                 flush=True,
             )
             if check_rank_flag:
-                print(
-                    " > WARNING: could not find index map files for blendable"
-                    " dataset, building indices on rank 0 ...",
-                    flush=True,
-                )
-                dataset_index, dataset_sample_index = _build_indices()
+
+                def _build_and_save():
+                    print(
+                        " > WARNING: could not find index map files for blendable"
+                        " dataset, building indices on rank 0 ...",
+                        flush=True,
+                    )
+                    dataset_index, dataset_sample_index = _build_indices()
+                    save_text_atomic(desc_path, desc)
+                    save_npy_atomic(index_path, dataset_index)
+                    save_npy_atomic(sample_index_path, dataset_sample_index)
+
                 try:
-                    os.makedirs(os.path.dirname(index_path), exist_ok=True)
-                    with open(desc_path, "wt") as fd:
-                        fd.write(desc)
-                        np.save(index_path, dataset_index, allow_pickle=True)
-                        np.save(sample_index_path, dataset_sample_index, allow_pickle=True)
+                    build_index_cache(
+                        os.path.join(data_cache_path, desc_hash),
+                        [desc_path, index_path, sample_index_path],
+                        _build_and_save,
+                    )
                 except OSError:
                     print(f"There was an error trying to create the data cache directory ({data_cache_path})")
                     print("or a file in it. This is set with the --data-cache-path argument. Please")
                     print("ensure you have write access to this directory or specify one that you do have")
                     print("write access to.")
-                    # cache_success = False
+                    raise
 
-            # hcg = paddle.distributed.fleet.get_hybrid_communicate_group()
-
-            # counts = paddle.to_tensor([cache_success], dtype="int64")
-            # paddle.distributed.all_reduce(counts, group=hcg.get_data_parallel_group())
-            # paddle.distributed.all_reduce(counts, group=hcg.get_pipeline_model_parallel_group())
-            # if counts[0].item() != (
-            #     paddle.distributed.get_world_size()
-            #     // paddle.distributed.get_world_size(group=hcg.get_tensor_model_parallel_group())
-            # ):
-            #     print_rank_0("Data index creation unsuccessful, exiting.")
-            #     exit()
-
-            else:
-                while True:
-                    if (not os.path.isfile(index_path)) or (not os.path.isfile(sample_index_path)):
-                        print("building indices on rank 0 ...", flush=True)
-                        time.sleep(3)
-                    else:
-                        try:
-                            np.load(index_path, allow_pickle=True, mmap_mode="r")
-                            print("build success", flush=True)
-                            break
-                        except Exception:
-                            print("%s file is still writing or damaged, please wait for a moment." % index_path)
-                            time.sleep(3)
+            elif not cache_hit:
+                # Not every rank creates a BlendableDataset, so the other ranks poll instead of using a barrier.
+                wait_index_cache(os.path.join(data_cache_path, desc_hash))
 
             # paddle.distributed.barrier()
             # Load on all ranks.
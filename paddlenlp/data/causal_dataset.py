@@ -3,13 +3,22 @@
 """GPT style dataset."""
 import hashlib
 import math
+import multiprocessing
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 import paddle
 
 from paddlenlp.data.blendable_dataset import BlendableDataset
+from paddlenlp.data.index_cache import (
+    build_index_cache,
+    check_index_cache,
+    is_index_cache_complete,
+    save_npy_atomic,
+    save_text_atomic,
+)
 from paddlenlp.data.indexed_dataset import make_dataset as make_indexed_dataset
 
 local_rank = int(os.getenv("PADDLE_RANK_IN_NODE", 0))
@@ -125,8 +134,13 @@ def build_train_valid_test_datasets(
     *,
     data_cache_path=None,
     need_data=True,
+    index_build_workers=1,
 ):
-    """Build train, valid, and test datasets."""
+    """Build train, valid, and test datasets.
+
+    With `index_build_workers` > 1, the index caches of a blend of datasets
+    are built concurrently in a process pool before the datasets are created.
+    """
 
     # Single dataset.
     if len(data_prefix) == 1:
@@ -151,6 +165,19 @@ def build_train_valid_test_datasets(
     # Please refer to https://github.com/NVIDIA/NeMo/blob/72f630d087d45655b1a069dc72debf01dfdbdb2d/nemo/collections/nlp/data/language_modeling/megatron/gpt_dataset.py#L74-L80 for more information
     train_num_samples, valid_num_samples, test_num_samples = train_val_test_num_samples
 
+    if need_data and index_build_workers > 1:
+        _build_index_caches_in_parallel(
+            prefixes,
+            data_impl,
+            splits_string,
+            datasets_train_valid_test_num_samples,
+            seq_length,
+            seed,
+            share_folder,
+            data_cache_path,
+            index_build_workers,
+        )
+
     # Build individual datasets.
     train_datasets = []
     valid_datasets = []
@@ -199,6 +226,74 @@ def build_train_valid_test_datasets(
     return (blending_train_dataset, blending_valid_dataset, blending_test_dataset)
 
 
+def _build_index_caches(
+    data_prefix, data_impl, splits_string, train_val_test_num_samples, seq_length, seed, share_folder, data_cache_path
+):
+    """Build the doc/sample/shuffle index caches of every split of one dataset,
+    the same way `GPTDataset` would."""
+    indexed_dataset = make_indexed_dataset(data_prefix, data_impl, skip_warmup=True)
+    splits = get_train_valid_test_split_(splits_string, indexed_dataset.sizes.shape[0])
+    for index, name in enumerate(["train", "valid", "test"]):
+        if splits[index + 1] <= splits[index]:
+            continue
+        documents = np.arange(splits[index], splits[index + 1], 1, np.int32)
+        _build_index_mappings(
+            name,
+            data_prefix,
+            documents,
+            indexed_dataset.sizes,
+            splits_string,
+            train_val_test_num_samples[index],
+            seq_length,
+            seed,
+            share_folder,
+            data_cache_path=data_cache_path,
+        )
+
+
+def _build_index_caches_in_parallel(
+    prefixes,
+    data_impl,
+    splits_string,
+    datasets_train_valid_test_num_samples,
+    seq_length,
+    seed,
+    share_folder,
+    data_cache_path,
+    num_workers,
+):
+    """Build the index caches of all the blended datasets in a process pool.
+    Only the rank building the indices starts the pool, the other ranks wait
+    for the caches when they create their datasets."""
+    check_rank_flag = local_rank == 0
+    if share_folder:
+        check_rank_flag = paddle.distributed.get_rank() == 0
+    if not check_rank_flag:
+        return
+
+    start_time = time.time()
+    print_rank_0(f" > building index caches of {len(prefixes)} datasets with {num_workers} processes ...")
+    # Spawn instead of fork, the parent process may hold device or thread state.
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(
+                _build_index_caches,
+                prefix,
+                data_impl,
+                splits_string,
+                num_samples,
+                seq_length,
+                seed,
+                share_folder,
+                data_cache_path,
+            )
+            for prefix, num_samples in zip(prefixes, datasets_train_valid_test_num_samples)
+        ]
+        for future in futures:
+            future.result()
+    print_rank_0(" > finished building index caches in {:4f} seconds".format(time.time() - start_time))
+
+
 def _build_train_valid_test_datasets(
     data_prefix,
     data_impl,
@@ -306,31 +401,42 @@ class GPTDataset(paddle.io.Dataset):
             assert np.min(documents) >= 0
             assert np.max(documents) < indexed_dataset.sizes.shape[0]
 
-            (
-                doc_idx_filename,
-                sample_idx_filename,
-                shuffle_idx_filename,
-                self.desc,
-                self.desc_hash,
-                num_epochs,
-            ) = _build_index_mappings(
-                self.name,
-                data_prefix,
-                documents,
-                self.indexed_dataset.sizes,
-                splits_string,
-                num_samples,
-                seq_length,
-                seed,
-                share_folder,
-                data_cache_path=data_cache_path,
-            )
+            try:
+                (
+                    doc_idx_filename,
+                    sample_idx_filename,
+                    shuffle_idx_filename,
+                    self.desc,
+                    self.desc_hash,
+                    num_epochs,
+                ) = _build_index_mappings(
+                    self.name,
+                    data_prefix,
+                    documents,
+                    self.indexed_dataset.sizes,
+                    splits_string,
+                    num_samples,
+                    seq_length,
+                    seed,
+                    share_folder,
+                    data_cache_path=data_cache_path,
+                )
+            except Exception:
+                # Release the ranks waiting for the indices at the barrier below.
+                if paddle.distributed.get_world_size() > 1:
+                    paddle.distributed.barrier()
+                raise
 
+        # The ranks not building the indices wait here for the ranks building them.
         if paddle.distributed.get_world_size() > 1:
             paddle.distributed.barrier()
 
         # Load mappings.
         if need_data and len(documents) > 0:
+            check_index_cache(
+                os.path.join(os.path.dirname(doc_idx_filename), self.desc_hash),
+                [doc_idx_filename, sample_idx_filename, shuffle_idx_filename],
+            )
             start_time = time.time()
             print_rank_0(f" > loading doc-idx mapping from {doc_idx_filename}")
             self.doc_idx = np.load(doc_idx_filename, allow_pickle=True, mmap_mode="r")
@@ -353,65 +459,90 @@ class GPTDataset(paddle.io.Dataset):
         #    sample i --> [sample_idx[i], sample_idx[i+1])
         return self.sample_idx.shape[0] - 1
 
-    def __getitem__(self, idx):
+    def _sample_spans(self, idx):
+        """Returns the `(document, offset, length)` pieces of the shuffled sample `idx`."""
         # Get the shuffled index.
         idx = self.shuffle_idx[idx]
         # Start and end documents and offsets.
-        doc_index_f = self.sample_idx[idx][0]
-        doc_index_l = self.sample_idx[idx + 1][0]
-        offset_f = self.sample_idx[idx][1]
-        offset_l = self.sample_idx[idx + 1][1]
+        doc_index_f, offset_f = self.sample_idx[idx]
+        doc_index_l, offset_l = self.sample_idx[idx + 1]
         # If we are within the same document, just extract the chunk.
-        doc_ids = []
         if doc_index_f == doc_index_l:
-            doc_ids.append(self.doc_idx[doc_index_f])
+            return [(self.doc_idx[doc_index_f], offset_f, offset_l - offset_f + 1)]
+
+        sizes = self.indexed_dataset.sizes
+        # Otherwise, get the rest of the initial document.
+        doc_id = self.doc_idx[doc_index_f]
+        spans = [(doc_id, offset_f, sizes[doc_id] - offset_f)]
+        # Loop over all in between documents and add the entire document.
+        for i in range(doc_index_f + 1, doc_index_l):
+            doc_id = self.doc_idx[i]
+            spans.append((doc_id, 0, sizes[doc_id]))
+        # And finally add the relevant portion of last document.
+        spans.append((self.doc_idx[doc_index_l], 0, offset_l + 1))
+        return spans
+
+    def _read_spans(self, spans, text, mask=None):
+        """Copies the tokens (and loss mask) of `spans` into the preallocated
+        `text` (and `mask`) buffers. `MMapIndexedDataset.get` returns views of
+        the memory map, so this is the only copy of the data."""
+        start = 0
+        for doc_id, offset, length in spans:
+            sample, sample_mask = self.indexed_dataset.get(doc_id, offset=offset, length=length)
+            text[start : start + length] = sample
+            if mask is not None:
+                mask[start : start + length] = sample_mask
+            start += length
 
-            sample, mask = self.indexed_dataset.get(
-                self.doc_idx[doc_index_f], offset=offset_f, length=offset_l - offset_f + 1
-            )
-        else:
-            # Otherwise, get the rest of the initial document.
-            doc_ids.append(self.doc_idx[doc_index_f])
-            sample, mask = self.indexed_dataset.get(self.doc_idx[doc_index_f], offset=offset_f)
-            append_mask = True
-            if mask is None:
-                append_mask = False
-
-            sample_list = [sample]
-            mask_list = []
-            mask_list = [mask]
-            # Loop over all in between documents and add the entire document.
-            for i in range(doc_index_f + 1, doc_index_l):
-                doc_ids.append(self.doc_idx[i])
-                sample, mask = self.indexed_dataset.get(self.doc_idx[i])
-                sample_list.append(sample)
-                if append_mask:
-                    mask_list.append(mask)
-
-            # And finally add the relevant portion of last document.
-            doc_ids.append(self.doc_idx[doc_index_l])
-            sample, mask = self.indexed_dataset.get(self.doc_idx[doc_index_l], length=offset_l + 1)
-            sample_list.append(sample)
-            if append_mask:
-                mask_list.append(mask)
-            sample = np.concatenate(sample_list)
-            if append_mask:
-                mask = np.concatenate(mask_list)
-        # print(sample)
+    def __getitem__(self, idx):
+        spans = self._sample_spans(idx)
+        num_tokens = sum(length for _, _, length in spans)
+        text = np.empty(num_tokens, dtype=np.int64)
+        mask = np.empty(num_tokens, dtype=np.int64) if self.indexed_dataset.has_loss_mask else None
+        self._read_spans(spans, text, mask)
+
+        sample = {"text": text}
         if self.return_doc_ids:  # for retro preprocessing
-            if mask is None:
-                return {"text": np.array(sample, dtype=np.int64), "doc_ids": np.array(doc_ids, dtype=np.int64)}
-            else:
-                return {
-                    "text": np.array(sample, dtype=np.int64),
-                    "doc_ids": np.array(doc_ids, dtype=np.int64),
-                    "mask": np.array(mask, dtype=np.int64),
-                }
-        else:
-            if mask is None:
-                return {"text": np.array(sample, dtype=np.int64)}
-            else:
-                return {"text": np.array(sample, dtype=np.int64), "mask": np.array(mask, dtype=np.int64)}
+            sample["doc_ids"] = np.array([doc_id for doc_id, _, _ in spans], dtype=np.int64)
+        if mask is not None:
+            sample["mask"] = mask
+        return sample
+
+    def get_batch(self, indices, keep_dtype=False):
+        """Gathers the samples `indices` into one `[len(indices), seq_length + 1]`
+        buffer read directly from the indexed dataset, instead of building and
+        copying every sample separately as `__getitem__` does.
+
+        Args:
+            indices (list[int]): Indices of the samples of the batch.
+            keep_dtype (bool, optional): Whether to keep the tokens in the dtype
+                they are stored with (e.g. uint16) and the loss mask as uint8,
+                leaving the cast to int64 to the collator. Defaults to False.
+
+        Returns:
+            dict: Same keys as `__getitem__`, each value stacked over the batch.
+            `doc_ids` is a list of arrays since samples span a varying number
+            of documents.
+        """
+        spans_list = [self._sample_spans(idx) for idx in indices]
+        num_tokens = [sum(length for _, _, length in spans) for spans in spans_list]
+        if len(set(num_tokens)) > 1:
+            raise ValueError(f"Samples of a batch must have the same length, but got lengths {num_tokens}.")
+
+        shape = [len(indices), num_tokens[0] if num_tokens else 0]
+        text = np.empty(shape, dtype=self.indexed_dataset.dtype if keep_dtype else np.int64)
+        mask = None
+        if self.indexed_dataset.has_loss_mask:
+            mask = np.empty(shape, dtype=np.uint8 if keep_dtype else np.int64)
+        for row, spans in enumerate(spans_list):
+            self._read_spans(spans, text[row], None if mask is None else mask[row])
+
+        batch = {"text": text}
+        if self.return_doc_ids:
+            batch["doc_ids"] = [np.array([doc_id for doc_id, _, _ in spans], dtype=np.int64) for spans in spans_list]
+        if mask is not None:
+            batch["mask"] = mask
+        return batch
 
 
 def _build_index_mappings(
@@ -458,10 +589,7 @@ def _build_index_mappings(
             "sample": os.path.join(prefix, sample_idx_filename),
             "shuffle": os.path.join(prefix, shuffle_idx_filename),
         }
-        for f in idx_path.values():
-            if not os.path.isfile(f):
-                break
-        else:
+        if is_index_cache_complete(os.path.join(prefix, desc_hash), idx_path.values()):
             # Found our files!
             build_indices = False
             break
@@ -478,7 +606,8 @@ def _build_index_mappings(
         f"searching for causual dataset, build_indices={build_indices}, share_folder {share_folder}, check_rank_flag {check_rank_flag}",
         flush=True,
     )
-    if check_rank_flag:
+
+    def _build():
         print_rank_0(" > WARNING: could not find index map files, building " "the indices on rank 0 ...")
 
         # For the last epoch, decide whether include the entire epoch
@@ -518,88 +647,48 @@ def _build_index_mappings(
                 )
             print(string.format(last_epoch_num_samples, num_samples_per_epoch), flush=True)
 
-        try:
-            os.makedirs(data_cache_dir, exist_ok=True)
+        # description
+        save_text_atomic(idx_path["desc"], desc)
 
-            # description
-            with open(idx_path["desc"], "wt") as fd:
-                fd.write(desc)
+        # doc-idx.
+        start_time = time.time()
+        doc_idx = _build_doc_idx(documents, num_epochs, np_rng, separate_last_epoch)
+        save_npy_atomic(idx_path["doc"], doc_idx)
+        print_rank_0(
+            " > elasped time to build and save doc-idx mapping " "(seconds): {:4f}".format(time.time() - start_time)
+        )
+        # sample-idx.
+        start_time = time.time()
+        sample_idx = build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch)
+        save_npy_atomic(idx_path["sample"], sample_idx)
+        print_rank_0(
+            " > elasped time to build and save sample-idx mapping " "(seconds): {:4f}".format(time.time() - start_time)
+        )
+        # shuffle-idx.
+        start_time = time.time()
+        # -1 is due to data structure used to retieve the index:
+        #    sample i --> [sample_idx[i], sample_idx[i+1])
+        if separate_last_epoch:
+            num_samples_ = num_samples_from_epochs_minus_one
+        else:
+            num_samples_ = sample_idx.shape[0] - 1
+        shuffle_idx = _build_shuffle_idx(num_samples_, sample_idx.shape[0] - 1, np_rng)
+        save_npy_atomic(idx_path["shuffle"], shuffle_idx)
+        print_rank_0(
+            " > elasped time to build and save shuffle-idx mapping"
+            " (seconds): {:4f}".format(time.time() - start_time)
+        )
 
-            # doc-idx.
-            start_time = time.time()
-            doc_idx = _build_doc_idx(documents, num_epochs, np_rng, separate_last_epoch)
-            np.save(idx_path["doc"], doc_idx, allow_pickle=True)
-            print_rank_0(
-                " > elasped time to build and save doc-idx mapping "
-                "(seconds): {:4f}".format(time.time() - start_time)
-            )
-            # sample-idx.
-            start_time = time.time()
-            # Use C++ implementation for speed.
-            # First compile and then import.
-            # from megatron.data import helpers
-            from fast_dataindex import helpers
-
-            assert doc_idx.dtype == np.int32
-            assert sizes.dtype == np.int32
-            sample_idx = helpers.build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch)
-            np.save(idx_path["sample"], sample_idx, allow_pickle=True)
-            print_rank_0(
-                " > elasped time to build and save sample-idx mapping "
-                "(seconds): {:4f}".format(time.time() - start_time)
-            )
-            # shuffle-idx.
-            start_time = time.time()
-            # -1 is due to data structure used to retieve the index:
-            #    sample i --> [sample_idx[i], sample_idx[i+1])
-            if separate_last_epoch:
-                num_samples_ = num_samples_from_epochs_minus_one
-            else:
-                num_samples_ = sample_idx.shape[0] - 1
-            shuffle_idx = _build_shuffle_idx(num_samples_, sample_idx.shape[0] - 1, np_rng)
-            np.save(idx_path["shuffle"], shuffle_idx, allow_pickle=True)
-            print_rank_0(
-                " > elasped time to build and save shuffle-idx mapping"
-                " (seconds): {:4f}".format(time.time() - start_time)
-            )
+    if check_rank_flag:
+        try:
+            build_index_cache(os.path.join(data_cache_dir, desc_hash), idx_path.values(), _build)
         except OSError:
             print(f"There was an error trying to create the data cache directory ({data_cache_dir})")
             print('or a file in it. This defaults to a directory "index-cache" within the directory')
             print("the data files are in and can be set with the --data-cache-path argument. Please")
             print("ensure you have write access to this directory or specify one that you do have")
             print("write access to.")
-            # data_cache_success = False
-    else:
-        while True:
-            if (
-                (not os.path.isfile(idx_path["doc"]))
-                or (not os.path.isfile(idx_path["sample"]))
-                or (not os.path.isfile(idx_path["shuffle"]))
-            ):
-                print("building indices on rank 0 ...", flush=True)
-                time.sleep(3)
-            else:
-                try:
-                    np.load(idx_path["shuffle"], allow_pickle=True, mmap_mode="r")
-                    print("build success", flush=True)
-                    break
-                except Exception:
-                    print("%s file is still writing or damaged, please wait for a moment." % idx_path["shuffle"])
-                    time.sleep(3)
-    # try:
-    #     hcg = paddle.distributed.fleet.get_hybrid_communicate_group()
-    # except:
-    #     hcg = FakeHCG()
-
-    # counts = paddle.to_tensor([data_cache_success], dtype="int64")
-    # paddle.distributed.all_reduce(counts, group=hcg.get_data_parallel_group())
-    # paddle.distributed.all_reduce(counts, group=hcg.get_pipe_parallel_group())
-    # if counts[0].item() != (
-    #     paddle.distributed.get_world_size() // paddle.distributed.get_world_size(group=hcg.get_model_parallel_group())
-    # ):
-    #     print_rank_0("Data index creation unsuccessful, exiting.")
-    #     exit()
-    # paddle.distributed.barrier()
+            raise
 
     return idx_path["doc"], idx_path["sample"], idx_path["shuffle"], desc, desc_hash, num_epochs
 
@@ -688,6 +777,88 @@ def _build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch):
     return sample_idx
 
 
+def _build_sample_idx_fast(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch, chunk_size=None, num_workers=1):
+    """Vectorized equivalent of `_build_sample_idx`.
+
+    The i-th sample boundary is always the global token position
+    `i * seq_length` of the documents concatenated in `doc_idx` order, so
+    each row can be located with `np.searchsorted` over the cumulative
+    document lengths instead of walking the documents token by token.
+
+    The int32 layout of `_build_sample_idx` is kept whenever it fits, int64 is
+    used once the number of samples or of `doc_idx` entries exceeds the int32
+    range. `chunk_size` bounds the temporary memory by filling the mapping
+    chunk by chunk, and `num_workers` > 1 fills the chunks in a thread pool
+    (`np.searchsorted` releases the GIL).
+    """
+
+    # Total number of samples. For -1 see comments in `_num_epochs`.
+    num_samples = (num_epochs * tokens_per_epoch - 1) // seq_length
+    int32_max = np.iinfo(np.int32).max
+    if num_samples + 1 <= int32_max and len(doc_idx) <= int32_max:
+        dtype = np.int32
+    else:
+        dtype = np.int64
+    sample_idx = np.empty([num_samples + 1, 2], dtype=dtype)
+
+    doc_lengths = np.asarray(sizes)[doc_idx].astype(np.int64)
+    doc_ends = np.cumsum(doc_lengths)
+    doc_starts = doc_ends - doc_lengths
+    del doc_lengths
+
+    def _fill(start, stop):
+        positions = np.arange(start, stop, dtype=np.int64) * seq_length
+        # Empty documents share their end with the next one and are skipped,
+        # exactly like the `remaining_seq_length` loop does.
+        doc_idx_index = np.searchsorted(doc_ends, positions, side="right")
+        sample_idx[start:stop, 0] = doc_idx_index
+        sample_idx[start:stop, 1] = positions - doc_starts[doc_idx_index]
+
+    chunk_size = chunk_size or num_samples + 1
+    chunks = [(start, min(start + chunk_size, num_samples + 1)) for start in range(0, num_samples + 1, chunk_size)]
+    if num_workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(lambda chunk: _fill(*chunk), chunks))
+    else:
+        for start, stop in chunks:
+            _fill(start, stop)
+
+    # Start with first document and no offset, even if that document is empty.
+    sample_idx[0] = 0
+    return sample_idx
+
+
+def build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch):
+    """Build the sample-idx mapping, using the `fast_dataindex` C++ helpers
+    when they are installed and applicable, and `_build_sample_idx_fast`
+    otherwise."""
+    num_samples = (num_epochs * tokens_per_epoch - 1) // seq_length
+    try:
+        from fast_dataindex import helpers
+    except ImportError:
+        helpers = None
+
+    if (
+        helpers is not None
+        and doc_idx.dtype == np.int32
+        and sizes.dtype == np.int32
+        and num_samples < np.iinfo(np.int32).max
+    ):
+        # Use C++ implementation for speed.
+        return helpers.build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch)
+
+    print_rank_0(" > building sample-idx mapping with numpy ...")
+    return _build_sample_idx_fast(
+        sizes,
+        doc_idx,
+        seq_length,
+        num_epochs,
+        tokens_per_epoch,
+        chunk_size=2**24,
+        num_workers=min(8, os.cpu_count() or 1),
+    )
+
+
 def _build_shuffle_idx(num_samples, total_size, np_rng):
     """Build the range [0, size) and shuffle."""
     print(
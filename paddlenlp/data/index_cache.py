@@ -0,0 +1,145 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Helpers to build the dataset index caches safely across ranks.
+
+Every cache entry is a group of files sharing the same description hash. The
+files are written to a temporary name and renamed into place, and a `.done`
+marker is written last, so a cache entry is either complete or invisible. If
+building the entry fails, a `.failed` marker holding the error is written
+instead.
+
+Only one rank builds an entry (global rank 0 when the cache folder is shared
+between nodes, the first rank of each node otherwise). `GPTDataset` releases
+the other ranks with the barrier following the build, since every rank
+creates it. `BlendableDataset` is only created on the ranks loading data, so
+no collective can be used there and its waiting ranks poll for the markers
+with `wait_index_cache`.
+"""
+
+import os
+import time
+
+import numpy as np
+
+# `.failed` markers older than this process were left by a previous run
+_START_TIME = time.time()
+
+
+def index_cache_done_path(path_prefix):
+    return path_prefix + ".done"
+
+
+def index_cache_failed_path(path_prefix):
+    return path_prefix + ".failed"
+
+
+def is_index_cache_complete(path_prefix, paths):
+    """Whether the cache entry is complete. Caches written before the `.done`
+    marker was introduced are accepted if all of their files exist."""
+    if os.path.isfile(index_cache_done_path(path_prefix)):
+        return True
+    return all(os.path.isfile(path) for path in paths)
+
+
+def _atomic_write(path, write_fn):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            write_fn(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_npy_atomic(path, array):
+    _atomic_write(path, lambda f: np.save(f, array, allow_pickle=True))
+
+
+def save_text_atomic(path, text):
+    _atomic_write(path, lambda f: f.write(text.encode("utf-8")))
+
+
+def mark_index_cache_complete(path_prefix):
+    save_text_atomic(index_cache_done_path(path_prefix), "")
+
+
+def build_index_cache(path_prefix, paths, build_fn):
+    """Build the cache entry `path_prefix` unless it already exists. Must only
+    be called on the rank building the indices.
+
+    `build_fn` must write every file in `paths` (with `save_npy_atomic` /
+    `save_text_atomic`), the `.done` marker is written once it returns. If it
+    raises, the error is written to the `.failed` marker and re-raised.
+
+    Returns:
+        bool: whether this call built the entry.
+    """
+    if is_index_cache_complete(path_prefix, paths):
+        built = False
+    else:
+        os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+        failed_path = index_cache_failed_path(path_prefix)
+        if os.path.exists(failed_path):
+            os.remove(failed_path)
+        try:
+            build_fn()
+        except Exception as e:
+            try:
+                save_text_atomic(failed_path, f"{type(e).__name__}: {e}")
+            except OSError:
+                pass
+            raise
+        built = True
+    mark_index_cache_complete(path_prefix)
+    return built
+
+
+def _raise_build_failure(path_prefix):
+    with open(index_cache_failed_path(path_prefix), "r", encoding="utf-8") as f:
+        raise RuntimeError(f"Building the index cache {path_prefix} failed on the builder rank: {f.read()}")
+
+
+def check_index_cache(path_prefix, paths):
+    """Raise if the cache entry `path_prefix` is not complete once the rank
+    building it is done, with the error of the build if it failed."""
+    if is_index_cache_complete(path_prefix, paths):
+        return
+    failed_path = index_cache_failed_path(path_prefix)
+    if os.path.isfile(failed_path):
+        _raise_build_failure(path_prefix)
+    raise RuntimeError(f"The index cache {path_prefix} was not built, missing files in {paths}.")
+
+
+def wait_index_cache(path_prefix, timeout=7200, interval=3):
+    """Wait until the rank building the cache entry `path_prefix` marks it
+    complete, polling the markers every `interval` seconds.
+
+    Raises:
+        RuntimeError: if the build failed on the builder rank.
+        TimeoutError: if the entry is not complete after `timeout` seconds.
+    """
+    done_path, failed_path = index_cache_done_path(path_prefix), index_cache_failed_path(path_prefix)
+    if not os.path.isfile(done_path):
+        print(f"waiting for the index cache {path_prefix} to be built on rank 0 ...", flush=True)
+    deadline = time.time() + timeout
+    while not os.path.isfile(done_path):
+        if os.path.isfile(failed_path) and os.path.getmtime(failed_path) >= _START_TIME:
+            _raise_build_failure(path_prefix)
+        if time.time() > deadline:
+            raise TimeoutError(f"The index cache {path_prefix} was not built within {timeout} seconds.")
+        time.sleep(interval)
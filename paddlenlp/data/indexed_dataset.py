@@ -261,6 +261,10 @@ class IndexedDataset(paddle.io.Dataset):
     def supports_prefetch(self):
         return False  # avoid prefetching to save memory
 
+    @property
+    def has_loss_mask(self):
+        return False
+
     @property
     def doc_idx(self):
         return self._doc_idx
@@ -555,6 +559,14 @@ class MMapIndexedDataset(paddle.io.Dataset):
     def sizes(self):
         return self._index.sizes
 
+    @property
+    def dtype(self):
+        return self._index.dtype
+
+    @property
+    def has_loss_mask(self):
+        return self._loss_mask_buffer is not None
+
     @property
     def doc_idx(self):
         return self._index.doc_idx
@@ -871,6 +883,8 @@ class MMapIndexedDatasetBuilder(object):
 
     def finalize(self, index_file):
         self._data_file.close()
+        if self._loss_mask_file is not None:
+            self._loss_mask_file.close()
 
         with MMapIndexedDataset.Index.writer(index_file, self._dtype) as index:
             index.write(self._sizes, self._doc_idx)
@@ -957,6 +971,14 @@ class CompatibleIndexedDataset(paddle.io.Dataset):
     def sizes(self):
         return self._sizes
 
+    @property
+    def dtype(self):
+        return self._token_ids.dtype
+
+    @property
+    def has_loss_mask(self):
+        return False
+
     @property
     def doc_idx(self):
         return self._doc_idx
@@ -12,34 +12,207 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import heapq
+
 import numpy as np
 from paddle.io import Dataset, IterableDataset
 from scipy.linalg import block_diag
 
+from ..utils.log import logger
 
-def generate_greedy_packs(examples, max_length):
-    left_len = np.zeros([len(examples)]) - 1
-    left_len[0] = max_length  # At the beginning, only the first pack is valid.
-    generate_packs = [[] for i in range(len(examples))]
-    index, left_index = 0, 0
-
-    while index < len(examples):
-        record = examples[index]
-        max_left_index = left_len.argmax()
-        # Put the current sequence into the largest left space valid pack.
-        if len(record["input_ids"]) <= left_len[max_left_index]:
-            generate_packs[max_left_index].append(record)
-            left_len[max_left_index] -= len(record["input_ids"])
-            index += 1
-        else:
-            left_index += 1
-            left_len[left_index] = max_length
+PACKING_STRATEGIES = ["worst_fit", "first_fit_decreasing", "best_fit"]
+
+
+class _LeftmostSegmentTree:
+    """Max segment tree answering "leftmost index whose value is >= threshold"
+    in O(log n)."""
+
+    def __init__(self, size, value):
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        self.tree[self.size : self.size + size] = [value] * size
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def __getitem__(self, index):
+        return self.tree[self.size + index]
+
+    def update(self, index, value):
+        i = self.size + index
+        self.tree[i] = value
+        i //= 2
+        while i > 0:
+            parent_value = max(self.tree[2 * i], self.tree[2 * i + 1])
+            if self.tree[i] == parent_value:
+                # The ancestors are unchanged as well.
+                break
+            self.tree[i] = parent_value
+            i //= 2
+
+    def find_first(self, threshold):
+        if self.tree[1] < threshold:
+            return -1
+        i = 1
+        while i < self.size:
+            i = 2 * i if self.tree[2 * i] >= threshold else 2 * i + 1
+        return i - self.size
+
+
+class _BestFitBins:
+    """Open packs bucketed by remaining space, to find the pack with the
+    smallest remaining space that still fits a sequence in O(log max_length)."""
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+        self.buckets = [[] for _ in range(max_length + 1)]
+        # The leaf of a non-empty bucket holds its remaining space, -1 otherwise.
+        self.tree = _LeftmostSegmentTree(max_length + 1, -1)
+
+    def push(self, pack_index, left_len):
+        bucket = self.buckets[left_len]
+        bucket.append(pack_index)
+        if len(bucket) == 1:
+            self.tree.update(left_len, left_len)
+
+    def pop(self, min_left_len=0):
+        """Removes the pack with the smallest remaining space >= `min_left_len`,
+        returns `(pack_index, left_len)` or None if there is no such pack."""
+        left_len = self.tree.find_first(min_left_len)
+        if left_len == -1:
+            return None
+        bucket = self.buckets[left_len]
+        pack_index = bucket.pop()
+        if not bucket:
+            self.tree.update(left_len, -1)
+        return pack_index, left_len
+
+
+def pack_sequences(lengths, max_length, strategy="worst_fit"):
+    """Packs sequences into bins of `max_length` tokens.
+
+    Args:
+        lengths (list[int]): Length of every sequence, none of them should
+            exceed `max_length`.
+        max_length (int): Capacity of a pack.
+        strategy (str, optional): One of `PACKING_STRATEGIES`:
+
+            - "worst_fit": put every sequence, in order, into the open pack
+              with the largest remaining space.
+            - "first_fit_decreasing": put the sequences, longest first, into
+              the first pack they fit in.
+            - "best_fit": put every sequence, in order, into the open pack
+              with the smallest remaining space that fits it.
+
+            Defaults to "worst_fit".
+
+    Returns:
+        list[list[int]]: Indices of the sequences of every pack.
+    """
+    packs = []
+    if strategy == "worst_fit":
+        # Ties are broken by the pack index, like `argmax` does.
+        heap = []
+        for index, length in enumerate(lengths):
+            if heap and -heap[0][0] >= length:
+                neg_left_len, pack_index = heapq.heappop(heap)
+                packs[pack_index].append(index)
+                heapq.heappush(heap, (neg_left_len + length, pack_index))
+            else:
+                packs.append([index])
+                heapq.heappush(heap, (length - max_length, len(packs) - 1))
+    elif strategy == "first_fit_decreasing":
+        # Unused packs have the full capacity, so the first fitting pack is
+        # either an open one or the next one to open.
+        tree = _LeftmostSegmentTree(len(lengths), max_length)
+        for index in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+            pack_index = tree.find_first(lengths[index])
+            if pack_index == len(packs):
+                packs.append([])
+            packs[pack_index].append(index)
+            tree.update(pack_index, tree[pack_index] - lengths[index])
+    elif strategy == "best_fit":
+        bins = _BestFitBins(max_length)
+        for index, length in enumerate(lengths):
+            fit = bins.pop(length)
+            if fit is None:
+                packs.append([])
+                fit = (len(packs) - 1, max_length)
+            pack_index, left_len = fit
+            packs[pack_index].append(index)
+            bins.push(pack_index, left_len - length)
+    else:
+        raise ValueError(f"Unsupported packing strategy {strategy}, should be one of {PACKING_STRATEGIES}.")
+    return packs
+
+
+def generate_greedy_packs(examples, max_length, strategy="worst_fit"):
+    packs = pack_sequences([len(record["input_ids"]) for record in examples], max_length, strategy)
+    return [[examples[index] for index in pack] for pack in packs]
 
-    return generate_packs
+
+class StreamingBestFitPacker:
+    """Packs a stream of examples with the best-fit strategy, keeping at most
+    `max_open_packs` packs open. A pack is emitted as soon as it is full, or,
+    when too many packs are open, the fullest one is emitted."""
+
+    def __init__(self, max_length, max_open_packs=500):
+        self.max_length = max_length
+        self.max_open_packs = max_open_packs
+        self.bins = _BestFitBins(max_length)
+        self.open_packs = {}
+        self.next_pack_index = 0
+
+    def add(self, record):
+        """Adds an example, returns the list of packs completed by it."""
+        length = len(record["input_ids"])
+        fit = self.bins.pop(length)
+        if fit is None:
+            fit = (self.next_pack_index, self.max_length)
+            self.open_packs[self.next_pack_index] = []
+            self.next_pack_index += 1
+        pack_index, left_len = fit
+        self.open_packs[pack_index].append(record)
+        left_len -= length
+
+        if left_len == 0:
+            return [self.open_packs.pop(pack_index)]
+        self.bins.push(pack_index, left_len)
+        if len(self.open_packs) > self.max_open_packs:
+            pack_index, _ = self.bins.pop()
+            return [self.open_packs.pop(pack_index)]
+        return []
+
+    def flush(self):
+        """Returns the remaining open packs, in the order they were opened."""
+        packs = [self.open_packs[pack_index] for pack_index in sorted(self.open_packs)]
+        self.bins = _BestFitBins(self.max_length)
+        self.open_packs = {}
+        return packs
+
+
+def attn_mask_startend_row_indices_to_dense(attn_mask_startend_row_indices):
+    """Builds the dense causal attention mask described by `attn_mask_startend_row_indices`.
+
+    Token `j` is visible from the rows `j <= i < attn_mask_startend_row_indices[j]`,
+    i.e. until the end of the packed sequence it belongs to.
+
+    Returns:
+        np.ndarray: bool mask of shape `[1, seq_length, seq_length]`.
+    """
+    start_rows = np.asarray(attn_mask_startend_row_indices)
+    seq_length = start_rows.shape[-1]
+    rows = np.arange(seq_length)[:, None]
+    attention_mask = (rows >= rows.T) & (rows < start_rows[None, :])
+    return np.expand_dims(attention_mask, axis=0)
 
 
 class ZeroPadding:
     required_output_keys = ["input_ids", "labels", "attention_mask"]
+    # Packs without custom attention masks store their causal masks under this key in the compact
+    # `attn_mask_startend_row_indices` format, they are output as set by `dense_attention_mask`.
+    causal_mask_key = "causal_mask_startend_row_indices"
     # Only supported the following keys for ZeroPadding. Keys outside of the set will be ignored.
     supported_input_keys = [
         "input_ids",
@@ -57,7 +230,10 @@ class ZeroPadding:
         # Only consider supported input keys
         input_keys = [key for key in batch_records[0].keys() if key in cls.supported_input_keys]
         if "attn_mask_startend_row_indices" not in input_keys and "attention_mask" not in input_keys:
-            input_keys.append("attention_mask")
+            # Without custom attention masks, keep the causal masks of the packed
+            # sequences as start row indices instead of a dense block diagonal
+            # mask, see `_output_causal_mask`.
+            input_keys.append(cls.causal_mask_key)
         batched_features = {key: [] for key in input_keys}
         sequence_sum = 0
         for record in batch_records:
@@ -81,9 +257,11 @@ class ZeroPadding:
 
             seq_length = len(record["input_ids"])
             # If attention_mask is not given, assume it's causal mask
-            if "attn_mask_startend_row_indices" in record:
+            if "attn_mask_startend_row_indices" in batched_features:
                 attn_mask_startend_row_indices = [i + sequence_sum for i in record["attn_mask_startend_row_indices"]]
                 batched_features["attn_mask_startend_row_indices"].extend(attn_mask_startend_row_indices)
+            elif cls.causal_mask_key in batched_features:
+                batched_features[cls.causal_mask_key].extend([sequence_sum + seq_length] * seq_length)
             else:
                 attention_mask = record.get("attention_mask", np.tril(np.ones([seq_length, seq_length], dtype=bool)))
                 batched_features["attention_mask"].append(attention_mask)
@@ -102,13 +280,62 @@ class ZeroPadding:
             batched_features["position_ids"] = np.concatenate(batched_features["position_ids"], axis=-1).tolist()
         return batched_features
 
+    def _output_causal_mask(self, features):
+        """Outputs the causal mask of a pack without custom attention masks as the dense
+        `[1, seq_length, seq_length]` `attention_mask` when `dense_attention_mask` is set,
+        else as the compact `attn_mask_startend_row_indices`."""
+        if self.causal_mask_key not in features:
+            return features
+        features = dict(features)
+        attn_mask_startend_row_indices = features.pop(self.causal_mask_key)
+        if self.dense_attention_mask:
+            features["attention_mask"] = attn_mask_startend_row_indices_to_dense(attn_mask_startend_row_indices)
+        else:
+            features["attn_mask_startend_row_indices"] = attn_mask_startend_row_indices
+        return features
+
+    @property
+    def packing_efficiency(self):
+        """Ratio of real tokens in the packs emitted so far, each pack holding `max_length` tokens."""
+        if self.num_packs == 0:
+            return 0.0
+        return self.num_packed_tokens / (self.num_packs * self.max_length)
+
+    def _pack_records(self, batch_records):
+        self.num_packs += 1
+        self.num_packed_tokens += sum(len(record["input_ids"]) for record in batch_records)
+        return self._pad_batch_records(batch_records)
+
 
 class ZeroPaddingMapDataset(ZeroPadding, Dataset):
-    def __init__(self, data, tokenizer, max_length, greedy_zero_padding=False):
+    def __init__(
+        self,
+        data,
+        tokenizer,
+        max_length,
+        greedy_zero_padding=False,
+        packing_strategy="worst_fit",
+        packing_buffer_size=500,
+        dense_attention_mask=True,
+    ):
         self.tokenizer = tokenizer
         self.max_length = max_length
         self.greedy_zero_padding = greedy_zero_padding
+        # Packs without custom attention masks are stored with compact causal
+        # masks, output as the dense `attention_mask` built when a pack is
+        # fetched, or as `attn_mask_startend_row_indices` if this is unset.
+        self.dense_attention_mask = dense_attention_mask
+        # Only used by greedy zero padding, see `pack_sequences`.
+        self.packing_strategy = packing_strategy
+        # Number of examples packed together, None to pack the whole dataset at once.
+        self.packing_buffer_size = packing_buffer_size
+        self.num_packs = 0
+        self.num_packed_tokens = 0
         self.new_data = self._create_zero_padding_data(data)
+        logger.info(
+            f"Packed {self.num_packed_tokens} tokens into {self.num_packs} sequences of max_length {self.max_length}, "
+            f"packing efficiency: {self.packing_efficiency:.2%}"
+        )
 
     def _create_zero_padding_data(self, data):
         total_data = []
@@ -125,7 +352,7 @@ class ZeroPaddingMapDataset(ZeroPadding, Dataset):
                     cur_len_so_far += len(record["input_ids"])
                 else:
                     # exceed max length
-                    padded_list = self._pad_batch_records(batch_records)
+                    padded_list = self._pack_records(batch_records)
                     total_data.append(padded_list)
                     # reset
                     batch_records = []
@@ -136,52 +363,62 @@ class ZeroPaddingMapDataset(ZeroPadding, Dataset):
 
             # remaining data
             if batch_records:
-                padded_list = self._pad_batch_records(batch_records)
+                padded_list = self._pack_records(batch_records)
                 total_data.append(padded_list)
         else:
             examples = []
-            buffer_size = 500
-            i = 0
             for record in data:
                 if len(record["input_ids"]) > self.max_length:
                     continue
-                if i < buffer_size:
-                    examples.append(record)
-                    i += 1
-                else:
+                examples.append(record)
+                if self.packing_buffer_size is not None and len(examples) >= self.packing_buffer_size:
                     # Running greedy strategy in examples.
-                    generate_packs = generate_greedy_packs(examples, self.max_length)
-                    for batch_records in generate_packs:
-                        if len(batch_records) > 0:
-                            padded_list = self._pad_batch_records(batch_records)
-                            total_data.append(padded_list)
-                    examples = [record]
-                    i = 1
+                    for batch_records in generate_greedy_packs(examples, self.max_length, self.packing_strategy):
+                        total_data.append(self._pack_records(batch_records))
+                    examples = []
             if len(examples) > 0:
-                generate_packs = generate_greedy_packs(examples, self.max_length)
-                for batch_records in generate_packs:
-                    if len(batch_records) > 0:
-                        padded_list = self._pad_batch_records(batch_records)
-                        total_data.append(padded_list)
+                for batch_records in generate_greedy_packs(examples, self.max_length, self.packing_strategy):
+                    total_data.append(self._pack_records(batch_records))
 
         return total_data
 
     def __getitem__(self, idx):
-        return self.new_data[idx]
+        return self._output_causal_mask(self.new_data[idx])
 
     def __len__(self):
         return len(self.new_data)
 
 
 class ZeroPaddingIterableDataset(ZeroPadding, IterableDataset):
-    def __init__(self, data, tokenizer, max_length, greedy_zero_padding=False):
+    def __init__(
+        self,
+        data,
+        tokenizer,
+        max_length,
+        greedy_zero_padding=False,
+        packing_strategy="worst_fit",
+        packing_buffer_size=500,
+        dense_attention_mask=True,
+    ):
         self.data = data
         self.tokenizer = tokenizer
         self.max_length = max_length
         self.zero_padding_global_step = 0
         self.greedy_zero_padding = greedy_zero_padding
+        self.dense_attention_mask = dense_attention_mask
+        # Only used by greedy zero padding. "best_fit" packs the stream with
+        # `StreamingBestFitPacker` keeping at most `packing_buffer_size` open
+        # packs, the other strategies pack buffers of `packing_buffer_size` examples.
+        self.packing_strategy = packing_strategy
+        self.packing_buffer_size = packing_buffer_size
+        self.num_packs = 0
+        self.num_packed_tokens = 0
 
     def __iter__(self):
+        for features in self._iter_packs():
+            yield self._output_causal_mask(features)
+
+    def _iter_packs(self):
         if not self.greedy_zero_padding:
             batch_records = []
             cur_len_so_far = 0
@@ -193,7 +430,7 @@ class ZeroPaddingIterableDataset(ZeroPadding, IterableDataset):
                     cur_len_so_far += len(record["input_ids"])
                 else:
                     # exceed max length
-                    padded_list = self._pad_batch_records(batch_records)
+                    padded_list = self._pack_records(batch_records)
                     yield padded_list
                     # reset
                     batch_records = []
@@ -203,32 +440,30 @@ class ZeroPaddingIterableDataset(ZeroPadding, IterableDataset):
                     self.zero_padding_global_step += 1
                     cur_len_so_far += len(record["input_ids"])
             if batch_records:
-                padded_list = self._pad_batch_records(batch_records)
+                padded_list = self._pack_records(batch_records)
                 yield padded_list
+        elif self.packing_strategy == "best_fit":
+            packer = StreamingBestFitPacker(self.max_length, max_open_packs=self.packing_buffer_size or float("inf"))
+            for record in self.data:
+                if len(record["input_ids"]) > self.max_length:
+                    continue
+                self.zero_padding_global_step += 1
+                for batch_records in packer.add(record):
+                    yield self._pack_records(batch_records)
+            for batch_records in packer.flush():
+                yield self._pack_records(batch_records)
         else:
             examples = []
-            buffer_size = 500
-            i = 0
             for record in self.data:
                 if len(record["input_ids"]) > self.max_length:
                     continue
-                if i < buffer_size:
-                    examples.append(record)
-                    self.zero_padding_global_step += 1
-                    i += 1
-                else:
+                examples.append(record)
+                self.zero_padding_global_step += 1
+                if self.packing_buffer_size is not None and len(examples) >= self.packing_buffer_size:
                     # Running greedy strategy in examples.
-                    generate_packs = generate_greedy_packs(examples, self.max_length)
-                    for batch_records in generate_packs:
-                        if len(batch_records) > 0:
-                            padded_list = self._pad_batch_records(batch_records)
-                            yield padded_list
-                    examples = [record]
-                    self.zero_padding_global_step += 1
-                    i = 1
+                    for batch_records in generate_greedy_packs(examples, self.max_length, self.packing_strategy):
+                        yield self._pack_records(batch_records)
+                    examples = []
             if len(examples) > 0:
-                generate_packs = generate_greedy_packs(examples, self.max_length)
-                for batch_records in generate_packs:
-                    if len(batch_records) > 0:
-                        padded_list = self._pad_batch_records(batch_records)
-                        yield padded_list
+                for batch_records in generate_greedy_packs(examples, self.max_length, self.packing_strategy):
+                    yield self._pack_records(batch_records)
@@ -59,6 +59,12 @@ class LogitsProcessorList:
     def append(self, processor: LogitsProcessor):
         self._processors[len(self._processors)] = processor
 
+    def reorder_state(self, beam_idx: paddle.Tensor):
+        """Reorders the per-hypothesis state of the stateful processors after beam search selected `beam_idx`."""
+        for processor in self._processors.values():
+            if hasattr(processor, "reorder_state"):
+                processor.reorder_state(beam_idx)
+
 
 class MinLengthLogitsProcessor(LogitsProcessor):
     r"""
@@ -174,6 +180,37 @@ def _calc_banned_ngram_tokens(ngram_size: int, prev_input_ids: paddle.Tensor, nu
     return banned_tokens
 
 
+def _calc_banned_ngram_mask(ngram_size: int, prev_input_ids: paddle.Tensor, vocab_size: int):
+    """
+    Batched version of `_calc_banned_ngram_tokens`. Every window of `ngram_size - 1` tokens is compared with the
+    trailing `ngram_size - 1` tokens of its hypothesis at once, and the tokens following the matching windows are
+    scattered into a `[num_hypos, vocab_size]` count tensor. Everything stays on device, so no host synchronization
+    or per-hypothesis loop is needed.
+
+    Returns:
+        paddle.Tensor or None: bool mask of the banned tokens, or None if no n-gram has been completed yet.
+    """
+    num_hypos, cur_len = prev_input_ids.shape
+    num_windows = cur_len + 1 - ngram_size
+    if num_windows <= 0:
+        return None
+
+    tail = prev_input_ids[:, num_windows:]
+    matched = paddle.ones([num_hypos, num_windows], dtype="bool")
+    for i in range(ngram_size - 1):
+        matched = paddle.logical_and(matched, prev_input_ids[:, i : i + num_windows] == tail[:, i : i + 1])
+
+    next_tokens = prev_input_ids[:, ngram_size - 1 :]
+    banned_counts = paddle.put_along_axis(
+        paddle.zeros([num_hypos, vocab_size], dtype="int32"),
+        next_tokens,
+        matched.astype("int32"),
+        axis=1,
+        reduce="add",
+    )
+    return banned_counts > 0
+
+
 class NoRepeatNGramLogitsProcessor(LogitsProcessor):
     r"""
     [`LogitsProcessor`] that enforces no repetition of n-grams. See
@@ -181,24 +218,96 @@ class NoRepeatNGramLogitsProcessor(LogitsProcessor):
     Args:
         ngram_size (`int`):
             All ngrams of size `ngram_size` can only occur once.
+        incremental (`bool`, optional):
+            By default the banned tokens are recomputed from `input_ids` on device at every step. If True, a n-gram
+            table is kept per hypothesis and only extended with the newest token, so a step costs O(1) per hypothesis
+            instead of O(cur_len). The tables follow beam reselection through `reorder_state`, which `beam_search`
+            calls; the processor must not be shared between concurrent `generate` calls, and the per-group calls of
+            group beam search always use the stateless path. Defaults to False.
     """
 
-    def __init__(self, ngram_size: int):
+    def __init__(self, ngram_size: int, incremental: bool = False):
         if not isinstance(ngram_size, int) or ngram_size <= 0:
             raise ValueError(f"`ngram_size` has to be a strictly positive integer, but is {ngram_size}")
         self.ngram_size = ngram_size
+        self.incremental = incremental
+        self.reset_state()
+
+    def reset_state(self):
+        # per hypothesis: {prefix of `ngram_size - 1` tokens: tuple of the tokens that followed it}
+        self._ngram_tables = None
+        # per hypothesis: the last `ngram_size - 1` tokens
+        self._tails = None
+        # whether the table of a hypothesis is shared with another one after a beam reorder (copy on write)
+        self._shared = None
+        self._cur_len = 0
+
+    def _add_token(self, idx, token):
+        tail = self._tails[idx]
+        if len(tail) == self.ngram_size - 1:
+            if self._shared[idx]:
+                self._ngram_tables[idx] = dict(self._ngram_tables[idx])
+                self._shared[idx] = False
+            table = self._ngram_tables[idx]
+            table[tail] = table.get(tail, ()) + (token,)
+        if self.ngram_size > 1:
+            self._tails[idx] = (tail + (token,))[1 - self.ngram_size :]
+
+    def _build_state(self, input_ids):
+        num_hypos, cur_len = input_ids.shape
+        self._ngram_tables = [{} for _ in range(num_hypos)]
+        self._tails = [() for _ in range(num_hypos)]
+        self._shared = [False] * num_hypos
+        for idx, tokens in enumerate(input_ids.tolist()):
+            for token in tokens:
+                self._add_token(idx, token)
+        self._cur_len = cur_len
+
+    def _update_state(self, input_ids):
+        num_hypos, cur_len = input_ids.shape
+        if self._ngram_tables is None or len(self._ngram_tables) != num_hypos or cur_len != self._cur_len + 1:
+            # first step, or the caller did not follow the one-token-per-step protocol
+            self._build_state(input_ids)
+            return
+        for idx, token in enumerate(input_ids[:, -1].tolist()):
+            self._add_token(idx, token)
+        self._cur_len = cur_len
+
+    def reorder_state(self, beam_idx):
+        """Selects the n-gram state of the hypotheses kept by beam search, `beam_idx[i]` being the source of row i."""
+        if self._ngram_tables is None:
+            return
+        beam_idx = beam_idx.tolist() if isinstance(beam_idx, paddle.Tensor) else list(beam_idx)
+        if len(beam_idx) != len(self._ngram_tables):
+            self.reset_state()
+            return
+        num_selected = np.bincount(beam_idx, minlength=len(self._ngram_tables))
+        self._ngram_tables = [self._ngram_tables[idx] for idx in beam_idx]
+        self._tails = [self._tails[idx] for idx in beam_idx]
+        self._shared = [bool(num_selected[idx] > 1) or self._shared[idx] for idx in beam_idx]
+
+    def _incremental_call(self, input_ids, scores):
+        self._update_state(input_ids)
+        vocab_size = scores.shape[-1]
+        banned_ids = [
+            idx * vocab_size + token
+            for idx, (table, tail) in enumerate(zip(self._ngram_tables, self._tails))
+            for token in table.get(tail, ())
+        ]
+        if len(banned_ids) == 0:
+            return scores
+        banned_ids = paddle.to_tensor(banned_ids, dtype="int64")
+        min_scores = paddle.full([len(banned_ids)], paddle.finfo(scores.dtype).min, dtype=scores.dtype)
+        return paddle.scatter(scores.flatten(), banned_ids, min_scores).reshape(scores.shape)
 
     def __call__(self, input_ids: paddle.Tensor, scores: paddle.Tensor):
-        num_batch_hypotheses = scores.shape[0]
-        cur_len = input_ids.shape[-1]
-        banned_batch_tokens = _calc_banned_ngram_tokens(self.ngram_size, input_ids, num_batch_hypotheses, cur_len)
+        if self.incremental:
+            return self._incremental_call(input_ids, scores)
 
-        for i, banned_tokens in enumerate(banned_batch_tokens):
-            if len(banned_tokens) == 0:
-                continue
-            scores[i, banned_tokens] = paddle.finfo(scores.dtype).min
-
-        return scores
+        banned_mask = _calc_banned_ngram_mask(self.ngram_size, input_ids, scores.shape[-1])
+        if banned_mask is None:
+            return scores
+        return paddle.where(banned_mask, paddle.full_like(scores, paddle.finfo(scores.dtype).min), scores)
 
 
 class HammingDiversityLogitsProcessor(LogitsProcessor):
@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from queue import Queue
-from typing import Optional
+from typing import List, Optional
 
 from paddlenlp.transformers.tokenizer_utils import PretrainedTokenizer
 
@@ -39,9 +40,16 @@ class TextStreamer(BaseStreamer):
             The tokenized used to decode the tokens.
         skip_prompt (`bool`, *optional*, defaults to `False`):
             Whether to skip the prompt to `.generate()` or not. Useful e.g. for chatbots.
+        eos_token_id (`int`, *optional*):
+            The end-of-sequence token id used by `.generate()`. When given, the tokens received for a sequence after
+            it are ignored, they are the padding of the finished sequences of a batch.
         decode_kwargs (`dict`, *optional*):
             Additional keyword arguments to pass to the tokenizer's `decode` method.
 
+    Every sequence of a batch is decoded incrementally: only its new tokens, in the context of the previous ones, are
+    decoded at each step. With a batch size larger than 1, the new text of every sequence is passed to
+    `on_finalized_batch_text` instead of `on_finalized_text`.
+
     Examples:
 
         ```python
@@ -59,63 +67,129 @@ class TextStreamer(BaseStreamer):
         ```
     """
 
-    def __init__(self, tokenizer: PretrainedTokenizer, skip_prompt: bool = False, **decode_kwargs):
+    def __init__(
+        self,
+        tokenizer: PretrainedTokenizer,
+        skip_prompt: bool = False,
+        eos_token_id: Optional[int] = None,
+        **decode_kwargs
+    ):
         self.tokenizer = tokenizer
         self.skip_prompt = skip_prompt
+        self.eos_token_id = eos_token_id
         self.decode_kwargs = decode_kwargs
 
         # variables used in the streaming process
-        self.token_cache = []
-        self.print_len = 0
         self.next_tokens_are_prompt = True
+        self._reset()
+
+    def _reset(self):
+        self.batch_size = None
+        # per sequence: all its tokens, the window of tokens [prefix_offset, read_offset) whose text has already been
+        # emitted and is decoded again so that the new tokens are decoded in context, and the decoded text waiting for
+        # the end of a word
+        self.token_ids = []
+        self.prefix_offsets = []
+        self.read_offsets = []
+        self.pending_texts = []
+        self.finished = []
 
     def put(self, value):
         """
-        Receives tokens, decodes them, and prints them to stdout as soon as they form entire words.
+        Receives tokens of shape `[batch_size, num_tokens]` (or `[num_tokens]` for a single sequence), decodes the new
+        tokens of every sequence, and emits the text of each sequence as soon as it forms entire words.
         """
-        if len(value.shape) > 1 and value.shape[0] > 1:
-            raise ValueError("TextStreamer only supports batch size 1")
-        elif len(value.shape) > 1:
-            value = value[0]
-
         if self.skip_prompt and self.next_tokens_are_prompt:
             self.next_tokens_are_prompt = False
             return
 
-        # Add the new token to the cache and decodes the entire thing.
-        self.token_cache.extend(value.tolist())
-        text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
-
-        # After the symbol for a new line, we flush the cache.
-        if text.endswith("\n"):
-            printable_text = text[self.print_len :]
-            self.token_cache = []
-            self.print_len = 0
-        # If the last token is a CJK character, we print the characters.
-        elif len(text) > 0 and self._is_chinese_char(ord(text[-1])):
-            printable_text = text[self.print_len :]
-            self.print_len += len(printable_text)
-        # Otherwise, prints until the last space char (simple heuristic to avoid printing incomplete words,
-        # which may change with the subsequent token -- there are probably smarter ways to do this!)
-        else:
-            printable_text = text[self.print_len : text.rfind(" ") + 1]
-            self.print_len += len(printable_text)
-
-        self.on_finalized_text(printable_text)
+        value = value.tolist()
+        if len(value) == 0 or not isinstance(value[0], list):
+            value = [value]
+        if self.batch_size is None:
+            self.batch_size = len(value)
+            self.token_ids = [[] for _ in range(self.batch_size)]
+            self.prefix_offsets = [0] * self.batch_size
+            self.read_offsets = [0] * self.batch_size
+            self.pending_texts = [""] * self.batch_size
+            self.finished = [False] * self.batch_size
+        elif len(value) != self.batch_size:
+            raise ValueError(f"The batch size changed from {self.batch_size} to {len(value)} during streaming.")
+
+        for i, new_ids in enumerate(value):
+            if self.finished[i]:
+                continue
+            # the tokens generated after the end of a sequence are padding
+            if self.eos_token_id is not None and self.eos_token_id in new_ids:
+                new_ids = new_ids[: new_ids.index(self.eos_token_id) + 1]
+                self.finished[i] = True
+            self.token_ids[i].extend(new_ids)
+
+        deltas = self._decode_new_tokens(flush=self.finished)
+        texts = []
+        for i, delta in enumerate(deltas):
+            text = self.pending_texts[i] + delta
+            # After the symbol for a new line, the end of the sequence or a CJK character, we print the whole text.
+            if (
+                text.endswith("\n")
+                or (delta and self.finished[i])
+                or (len(text) > 0 and self._is_chinese_char(ord(text[-1])))
+            ):
+                printable_text = text
+            # Otherwise, prints until the last space char (simple heuristic to avoid printing incomplete words,
+            # which may change with the subsequent token -- there are probably smarter ways to do this!)
+            else:
+                printable_text = text[: text.rfind(" ") + 1]
+            self.pending_texts[i] = text[len(printable_text) :]
+            texts.append(printable_text)
+
+        self._on_finalized_texts(texts)
+
+    def _decode_new_tokens(self, flush):
+        """Decodes the new tokens of every sequence with a single `batch_decode` call over the windows of unread
+        tokens, and returns the new text of each sequence. Text ending with an incomplete character is held back unless
+        the sequence is flushed."""
+        prefix_ids, full_ids, indices = [], [], []
+        for i in range(self.batch_size):
+            if self.read_offsets[i] < len(self.token_ids[i]):
+                prefix_ids.append(self.token_ids[i][self.prefix_offsets[i] : self.read_offsets[i]])
+                full_ids.append(self.token_ids[i][self.prefix_offsets[i] :])
+                indices.append(i)
+
+        deltas = [""] * self.batch_size
+        if not indices:
+            return deltas
+        texts = self.tokenizer.batch_decode(prefix_ids + full_ids, **self.decode_kwargs)
+        for k, i in enumerate(indices):
+            prefix_text, full_text = texts[k], texts[len(indices) + k]
+            if flush[i] or (len(full_text) > len(prefix_text) and not full_text.endswith("\ufffd")):
+                deltas[i] = full_text[len(prefix_text) :]
+                self.prefix_offsets[i] = self.read_offsets[i]
+                self.read_offsets[i] = len(self.token_ids[i])
+        return deltas
 
     def end(self):
         """Flushes any remaining cache and prints a newline to stdout."""
-        # Flush the cache, if it exists
-        if len(self.token_cache) > 0:
-            text = self.tokenizer.decode(self.token_cache, **self.decode_kwargs)
-            printable_text = text[self.print_len :]
-            self.token_cache = []
-            self.print_len = 0
-        else:
-            printable_text = ""
+        texts = []
+        if self.batch_size is not None:
+            deltas = self._decode_new_tokens(flush=[True] * self.batch_size)
+            texts = [pending + delta for pending, delta in zip(self.pending_texts, deltas)]
+        self._reset()
 
         self.next_tokens_are_prompt = True
-        self.on_finalized_text(printable_text, stream_end=True)
+        self._on_finalized_texts(texts, stream_end=True)
+
+    def _on_finalized_texts(self, texts: List[str], stream_end: bool = False):
+        if len(texts) <= 1:
+            self.on_finalized_text(texts[0] if texts else "", stream_end=stream_end)
+        else:
+            self.on_finalized_batch_text(texts, stream_end=stream_end)
+
+    def on_finalized_batch_text(self, texts: List[str], stream_end: bool = False):
+        """Prints the new text of every sequence of a batch to stdout, one line per sequence with new text."""
+        for i, text in enumerate(texts):
+            if text:
+                print(f"[{i}] {text}", flush=True)
 
     def on_finalized_text(self, text: str, stream_end: bool = False):
         """Prints the new text to stdout. If the stream is ending, also prints a newline."""
@@ -160,6 +234,8 @@ class TextIteratorStreamer(TextStreamer):
         timeout (`float`, *optional*):
             The timeout for the text queue. If `None`, the queue will block indefinitely. Useful to handle exceptions
             in `.generate()`, when it is called in a separate thread.
+        eos_token_id (`int`, *optional*):
+            The end-of-sequence token id used by `.generate()`, the tokens after it are ignored.
         decode_kwargs (`dict`, *optional*):
             Additional keyword arguments to pass to the tokenizer's `decode` method.
 
@@ -185,6 +261,9 @@ class TextIteratorStreamer(TextStreamer):
         >>> generated_text
         'An increasing sequence: one, two, three, four, five, six, seven, eight, nine, ten, eleven,'
         ```
+
+    With a batch size larger than 1, every item is the list of the new texts of the sequences, an empty string for the
+    sequences without new text.
     """
 
     def __init__(
@@ -192,9 +271,10 @@ class TextIteratorStreamer(TextStreamer):
         tokenizer: PretrainedTokenizer,
         skip_prompt: bool = False,
         timeout: Optional[float] = None,
+        eos_token_id: Optional[int] = None,
         **decode_kwargs
     ):
-        super().__init__(tokenizer, skip_prompt, **decode_kwargs)
+        super().__init__(tokenizer, skip_prompt, eos_token_id, **decode_kwargs)
         self.text_queue = Queue()
         self.stop_signal = None
         self.timeout = timeout
@@ -205,6 +285,10 @@ class TextIteratorStreamer(TextStreamer):
         if stream_end:
             self.text_queue.put(self.stop_signal, timeout=self.timeout)
 
+    def on_finalized_batch_text(self, texts: List[str], stream_end: bool = False):
+        """Put the new texts of the batch in the queue. If the stream is ending, also put a stop signal in the queue."""
+        self.on_finalized_text(texts, stream_end=stream_end)
+
     def __iter__(self):
         return self
 
@@ -214,3 +298,83 @@ class TextIteratorStreamer(TextStreamer):
             raise StopIteration()
         else:
             return value
+
+
+class AsyncTextIteratorStreamer(TextStreamer):
+    """
+    Streamer that stores print-ready text in an `asyncio.Queue`, to be used by a downstream asyncio application as an
+    async iterator, e.g. a server streaming the generated text to its clients. It must be created in the event loop
+    that consumes it, while `.generate()` runs in a separate thread.
+
+    Parameters:
+        tokenizer (`AutoTokenizer`):
+            The tokenized used to decode the tokens.
+        skip_prompt (`bool`, *optional*, defaults to `False`):
+            Whether to skip the prompt to `.generate()` or not. Useful e.g. for chatbots.
+        timeout (`float`, *optional*):
+            The timeout in seconds to wait for the next text. If `None`, it waits indefinitely.
+        eos_token_id (`int`, *optional*):
+            The end-of-sequence token id used by `.generate()`, the tokens after it are ignored.
+        decode_kwargs (`dict`, *optional*):
+            Additional keyword arguments to pass to the tokenizer's `decode` method.
+
+    Examples:
+
+        ```python
+        >>> import asyncio
+        >>> from threading import Thread
+        >>> from paddlenlp.transformers import AutoModelForCausalLM, AutoTokenizer
+        >>> from paddlenlp.generation import AsyncTextIteratorStreamer
+
+        >>> tok = AutoTokenizer.from_pretrained("gpt2")
+        >>> model = AutoModelForCausalLM.from_pretrained("gpt2")
+        >>> inputs = tok(["An increasing sequence: one,"], return_tensors="pd")
+
+        >>> async def main():
+        ...     streamer = AsyncTextIteratorStreamer(tok)
+        ...     generation_kwargs = dict(inputs, streamer=streamer, max_length=20)
+        ...     thread = Thread(target=model.generate, kwargs=generation_kwargs)
+        ...     thread.start()
+        ...     generated_text = ""
+        ...     async for new_text in streamer:
+        ...         generated_text += new_text
+        ...     return generated_text
+        >>> asyncio.run(main())
+        'An increasing sequence: one, two, three, four, five, six, seven, eight, nine, ten, eleven,'
+        ```
+    """
+
+    def __init__(
+        self,
+        tokenizer: PretrainedTokenizer,
+        skip_prompt: bool = False,
+        timeout: Optional[float] = None,
+        eos_token_id: Optional[int] = None,
+        **decode_kwargs
+    ):
+        super().__init__(tokenizer, skip_prompt, eos_token_id, **decode_kwargs)
+        self.text_queue = asyncio.Queue()
+        self.stop_signal = None
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        """Put the new text in the queue from the generation thread. If the stream is ending, also put a stop signal in
+        the queue."""
+        self.loop.call_soon_threadsafe(self.text_queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.text_queue.put_nowait, self.stop_signal)
+
+    def on_finalized_batch_text(self, texts: List[str], stream_end: bool = False):
+        """Put the new texts of the batch in the queue."""
+        self.on_finalized_text(texts, stream_end=stream_end)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        value = await asyncio.wait_for(self.text_queue.get(), timeout=self.timeout)
+        if value == self.stop_signal:
+            raise StopAsyncIteration()
+        else:
+            return value
@@ -388,7 +388,9 @@ class GenerationMixin(object):
         if repetition_penalty is not None and repetition_penalty != 1.0:
             processors.append(RepetitionPenaltyLogitsProcessor(penalty=repetition_penalty))
         if no_repeat_ngram_size is not None and no_repeat_ngram_size > 0:
-            processors.append(NoRepeatNGramLogitsProcessor(no_repeat_ngram_size))
+            # group beam search calls the processors on a subset of the hypotheses, which the incremental n-gram
+            # state can not follow
+            processors.append(NoRepeatNGramLogitsProcessor(no_repeat_ngram_size, incremental=num_beam_groups == 1))
         if forced_bos_token_id is not None:
             processors.append(ForcedBOSTokenLogitsProcessor(forced_bos_token_id))
         if forced_eos_token_id is not None:
@@ -1625,6 +1627,7 @@ class GenerationMixin(object):
             # beam_idx may contain element -1 and cause error
             # PR: https://github.com/PaddlePaddle/Paddle/issues/57366
             beam_idx = paddle.maximum(beam_idx, paddle.full_like(beam_idx, 0))
+            logits_processors.reorder_state(beam_idx)
 
             cur_len += 1
             input_ids = paddle.concat(
@@ -37,6 +37,10 @@ class MergeConfig:
     sparsify_type: str = field(default=None, metadata={"help": "The type of sparsify process."})
     split_pieces: int = field(default=8, metadata={"help": "Split large tensor to multi-piece"})
     max_tensor_mem: float = field(default=0.5, metadata={"help": "Split tensor if exceed setting max_tensor_mem."})
+    max_merge_mem: Optional[float] = field(
+        default=None,
+        metadata={"help": "Host memory budget (GB) of the merge, limits the number of concurrent merge processes."},
+    )
 
     # Model parameters
     model_path_list: Optional[List[str]] = field(default=None, metadata={"help": "Merge model name or path list"})
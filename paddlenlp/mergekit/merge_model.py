@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import contextlib
 import json
 import math
 import os
@@ -36,13 +37,15 @@ from paddlenlp.utils.env import (
     SAFE_WEIGHTS_NAME,
 )
 from paddlenlp.utils.log import logger
-from paddlenlp.utils.safetensors import fast_safe_open
+from paddlenlp.utils.safetensors import fast_safe_open, fast_safe_writer
 
 from .merge_method import MergeMethod
 from .merge_utils import (
+    bf16_to_fp32,
     divide_lora_key_list,
     divide_positions,
     divide_safetensor_key_list,
+    fp32_to_bf16,
 )
 from .sparsify_method import SparsifyMethod
 
@@ -330,70 +333,130 @@ class MergeModel:
                 for k in key_list[positions[i] : positions[i + 1]]:
                     index["weight_map"][k] = shard_file
         else:
-            threads = []
+            shard_list = []
             for i in range(len(positions) - 1):
                 shard_file = (
                     f"{self.merge_config.merge_prefix}-{i+1:05d}-of-{self.merge_config.n_process:05d}.safetensors"
                 )
-                t = Process(
-                    target=self.shard_merge_np if self.merge_config.tensor_type == "np" else self.shard_merge_pd,
-                    args=(
-                        key_list[positions[i] : positions[i + 1]],  # key_list
-                        index_list,  # index_list
-                        shard_file,  # shard_file name
-                    ),
-                )
-                threads.append(t)
+                shard_list.append((key_list[positions[i] : positions[i + 1]], index_list, shard_file))
                 for k in key_list[positions[i] : positions[i + 1]]:
                     index["weight_map"][k] = shard_file
-
-            for t in threads:
-                t.start()
-            for t in threads:
-                t.join()
+            self.run_shard_merge(shard_list, index_list)
         # Save safe index file
         if paddle.distributed.get_rank() == 0:
             save_index_file = os.path.join(self.merge_config.output_path, self.safe_index_name())
             with open(save_index_file, "w", encoding="utf-8") as f:
                 f.write(json.dumps(index, indent=2) + "\n")
 
+    def is_elementwise_merge(self):
+        """Whether every output element only depends on the same element of the inputs, so tensors can be merged
+        in row-chunks. Slerp, trim and magprune look at the whole tensor. Dare draws its random mask chunk by chunk,
+        which keeps the same distribution but not the same values as masking the whole tensor."""
+        return self.merge_config.merge_type in ["linear", "ties"] and self.merge_config.sparsify_type in [None, "dare"]
+
+    def get_num_merge_workers(self, num_shards, index_list):
+        """Number of shards merged concurrently, bounded by the CPU count and the `max_merge_mem` budget."""
+        num_workers = min(num_shards, os.cpu_count() or 1)
+        if self.merge_config.max_merge_mem is None:
+            return num_workers
+        # A worker holds a (chunk of) tensor of every input model, the merged result and a few temporaries
+        num_inputs = len(index_list)
+        if self.is_elementwise_merge():
+            tensor_mem = self.merge_config.max_tensor_mem
+        else:
+            tensor_mem = self.get_max_tensor_mem(self.merge_config.model_path_list[0], index_list[0])
+        worker_mem = (num_inputs + 3) * tensor_mem
+        return max(1, min(num_workers, int(self.merge_config.max_merge_mem // worker_mem)))
+
+    def get_max_tensor_mem(self, model_path, index):
+        """Size in GB of the largest tensor of a model once upcast to float32."""
+        max_numel = 0
+        for file_name in set(index["weight_map"].values()):
+            with fast_safe_open(os.path.join(model_path, file_name), framework="np") as f:
+                for key in f.keys():
+                    max_numel = max(max_numel, int(np.prod(f.get_slice(key).shape)))
+        return max_numel * 4 / (1024**3)
+
+    def merge_shards(self, shard_list):
+        for key_list, index_list, shard_file in shard_list:
+            if self.merge_config.tensor_type == "np":
+                self.shard_merge_np(key_list, index_list, shard_file)
+            else:
+                self.shard_merge_pd(key_list, index_list, shard_file)
+
+    def run_shard_merge(self, shard_list, index_list):
+        num_workers = self.get_num_merge_workers(len(shard_list), index_list)
+        logger.info(f"Merging {len(shard_list)} shards with {num_workers} processes.")
+        if num_workers == 1:
+            self.merge_shards(shard_list)
+            return
+        processes = [Process(target=self.merge_shards, args=(shard_list[i::num_workers],)) for i in range(num_workers)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        failed = [p.exitcode for p in processes if p.exitcode != 0]
+        if len(failed) > 0:
+            raise RuntimeError(f"{len(failed)} merge processes failed with exit codes {failed}.")
+
     def shard_merge_np(
         self,
         key_list,
         index_list,
         shard_file,
     ):
-        merge_state_dict = {}
-        for k in key_list:
-            tensor_list = []
-            for i, model_path in enumerate(self.merge_config.model_path_list):
-                with fast_safe_open(os.path.join(model_path, index_list[i]["weight_map"][k]), framework="np") as w:
-                    tensor = w.get_tensor(k)
-                    dtype = tensor.dtype
-                    # dtype==bfloat16: numpy(uint16) -> paddle(bfloat16) -> paddle(float32) -> numpy(float32)
-                    if tensor.dtype == np.uint16:
-                        tensor = paddle.Tensor(tensor, zero_copy=True).astype("float32").numpy()
-                    tensor_list.append(tensor)
-            if self.merge_config.base_model_path is not None:
-                with fast_safe_open(
-                    os.path.join(self.merge_config.base_model_path, index_list[-1]["weight_map"][k]),
-                    framework="np",
-                ) as w:
-                    base_tensor = w.get_tensor(k)
-                    if base_tensor.dtype == np.uint16:
-                        base_tensor = paddle.Tensor(base_tensor, zero_copy=True).astype("float32").numpy()
-                tensor_list = [tensor - base_tensor for tensor in tensor_list]
-            merge_state_dict[k] = self.merge_method.merge(tensor_list)
-            if self.merge_config.base_model_path is not None:
-                merge_state_dict[k] += base_tensor
-            # dtype==bfloat16: numpy(float32) -> paddle(float32) -> paddle(bfloat16) -> numpy(uint16)
-            if dtype == np.uint16:
-                merge_state_dict[k] = paddle.Tensor(merge_state_dict[k], zero_copy=True).astype("bfloat16").numpy()
-        save_file(
-            merge_state_dict,
-            os.path.join(self.merge_config.output_path, shard_file),
-            metadata={"format": "np"},
-        )
+        model_path_list = self.merge_config.model_path_list.copy()
+        if self.merge_config.base_model_path is not None:
+            model_path_list.append(self.merge_config.base_model_path)
+
+        with contextlib.ExitStack() as stack:
+            # Keep the source files open for the whole shard instead of re-opening them for every key
+            safe_files = {}
+
+            def get_slice(i, k):
+                file_path = os.path.join(model_path_list[i], index_list[i]["weight_map"][k])
+                if file_path not in safe_files:
+                    safe_files[file_path] = stack.enter_context(fast_safe_open(file_path, framework="np"))
+                return safe_files[file_path].get_slice(k)
+
+            tensor_infos = {}
+            for k in key_list:
+                safe_slice = get_slice(0, k)
+                tensor_infos[k] = (np.dtype(safe_slice.dtype), safe_slice.shape)
+            writer = stack.enter_context(
+                fast_safe_writer(
+                    os.path.join(self.merge_config.output_path, shard_file), tensor_infos, metadata={"format": "np"}
+                )
+            )
+
+            for k in key_list:
+                dtype, shape = tensor_infos[k]
+                num_rows = shape[0] if len(shape) > 0 else 1
+                rows_per_chunk = num_rows
+                if self.is_elementwise_merge() and len(shape) > 0:
+                    row_mem = int(np.prod(shape[1:])) * 4 / (1024**3)
+                    rows_per_chunk = (
+                        max(1, int(self.merge_config.max_tensor_mem // row_mem)) if row_mem > 0 else num_rows
+                    )
+                for start in range(0, max(num_rows, 1), max(rows_per_chunk, 1)):
+                    tensor_list = []
+                    for i in range(len(model_path_list)):
+                        safe_slice = get_slice(i, k)
+                        tensor = safe_slice[start : start + rows_per_chunk] if len(shape) > 0 else safe_slice.get()
+                        # dtype==bfloat16: numpy(uint16) -> numpy(float32)
+                        if tensor.dtype == np.uint16:
+                            tensor = bf16_to_fp32(tensor)
+                        tensor_list.append(tensor)
+                    if self.merge_config.base_model_path is not None:
+                        base_tensor = tensor_list.pop()
+                        tensor_list = [tensor - base_tensor for tensor in tensor_list]
+                    merge_tensor = self.merge_method.merge(tensor_list)
+                    if self.merge_config.base_model_path is not None:
+                        merge_tensor += base_tensor
+                    # dtype==bfloat16: numpy(float32) -> numpy(uint16)
+                    if dtype == np.uint16:
+                        merge_tensor = fp32_to_bf16(merge_tensor)
+                    writer.write(k, np.asarray(merge_tensor).astype(dtype, copy=False))
 
     def shard_merge_pd(
         self,
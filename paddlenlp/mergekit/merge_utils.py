@@ -13,6 +13,8 @@
 # limitations under the License.
 import re
 
+import numpy as np
+
 
 def divide_positions(m, n):
     if n == 0:
@@ -71,3 +73,16 @@ def divide_safetensor_key_list(weight_map, n):
             key_list += file_map[file]
         positions.append(len(key_list))
     return key_list, positions
+
+
+def bf16_to_fp32(tensor):
+    """Converts bfloat16 data stored as numpy uint16 to float32."""
+    return (tensor.astype(np.uint32) << 16).view(np.float32)
+
+
+def fp32_to_bf16(tensor):
+    """Converts float32 to bfloat16 stored as numpy uint16, rounding to the nearest even."""
+    bits = np.ascontiguousarray(tensor, dtype=np.float32).view(np.uint32)
+    rounded = ((bits + (0x7FFF + ((bits >> 16) & 1))) >> 16).astype(np.uint16)
+    # keep NaNs quiet instead of letting the rounding carry turn them into infinities
+    return np.where(np.isnan(tensor), np.uint16(0x7FC0), rounded)
@@ -16,9 +16,10 @@ import math
 import sys
 from collections import defaultdict
 
+import numpy as np
 import paddle
 
-from .utils import default_trans_func
+from .utils import default_trans_func, parallel_map_chunks
 
 __all__ = ["BLEU", "BLEUForDuReader"]
 
@@ -54,6 +55,88 @@ def get_ngram(sent, n_size, label=None):
     return ngram_list
 
 
+def _ngram_rows(sentences, order):
+    """
+    Returns the n-grams of `order` tokens of the int token arrays `sentences` as the rows of a matrix, and the index
+    of the sentence of every row.
+    """
+    lengths = np.array([len(sentence) for sentence in sentences], dtype=np.int64)
+    num_ngrams = np.maximum(lengths - order + 1, 0)
+    total = int(num_ngrams.sum())
+    if total == 0:
+        return np.zeros((0, order), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    tokens = np.concatenate(sentences)
+    sentence_index = np.repeat(np.arange(len(sentences)), num_ngrams)
+    # start of every n-gram in `tokens`: start of its sentence plus its position in the sentence
+    ngram_offsets = np.cumsum(num_ngrams) - num_ngrams
+    starts = (np.cumsum(lengths) - lengths)[sentence_index] + np.arange(total) - ngram_offsets[sentence_index]
+    return tokens[starts[:, None] + np.arange(order)], sentence_index
+
+
+def _count_ngram_matches(cand_rows, cand_inst, ref_rows, ref_inst, ref_index):
+    """
+    Returns the number of candidate n-grams matched by the references of the same instance, the count of an n-gram
+    being clipped by its maximum count in a single reference, as in `get_match_size`.
+    """
+    if len(cand_rows) == 0 or len(ref_rows) == 0:
+        return 0
+    # id of every (instance, n-gram) pair
+    keys = np.concatenate([np.column_stack([cand_inst, cand_rows]), np.column_stack([ref_inst, ref_rows])])
+    _, key_ids = np.unique(keys, axis=0, return_inverse=True)
+    key_ids = key_ids.reshape(-1)
+    num_keys = int(key_ids.max()) + 1
+    cand_counts = np.bincount(key_ids[: len(cand_rows)], minlength=num_keys)
+
+    # count of every n-gram in every reference, and its maximum over the references
+    num_refs = int(ref_index.max()) + 1
+    ref_keys, ref_counts = np.unique(key_ids[len(cand_rows) :] * num_refs + ref_index, return_counts=True)
+    ref_max_counts = np.zeros(num_keys, dtype=np.int64)
+    np.maximum.at(ref_max_counts, ref_keys // num_refs, ref_counts)
+    return int(np.minimum(cand_counts, ref_max_counts).sum())
+
+
+def bleu_statistics(cand_list, ref_lists, n_size=4):
+    """
+    Computes the BLEU statistics of a batch at once, the tokens being mapped to ints and the n-grams of every order
+    counted over all the sentences with array operations.
+
+    Args:
+        cand_list (list): Tokenized candidate sentences.
+        ref_lists (list): Lists of tokenized ground truth sentences of the candidates.
+        n_size (int, optional): Number of gram. Defaults to 4.
+
+    Returns:
+        tuple: The number of matched n-grams and of candidate n-grams of every order, the total length of the
+        candidates and of their closest references, as accumulated by `BLEU.add_inst`.
+    """
+    vocab = {}
+
+    def encode(sentence):
+        return np.array([vocab.setdefault(token, len(vocab)) for token in sentence], dtype=np.int64)
+
+    cands = [encode(cand) for cand in cand_list]
+    refs, ref_inst = [], []
+    for i, ref_list in enumerate(ref_lists):
+        for ref in ref_list:
+            refs.append(encode(ref))
+            ref_inst.append(i)
+    ref_inst = np.array(ref_inst, dtype=np.int64)
+
+    match_ngram, candi_ngram = [], []
+    for n in range(n_size):
+        cand_rows, cand_inst = _ngram_rows(cands, n + 1)
+        ref_rows, ref_index = _ngram_rows(refs, n + 1)
+        match_ngram.append(_count_ngram_matches(cand_rows, cand_inst, ref_rows, ref_inst[ref_index], ref_index))
+        candi_ngram.append(len(cand_rows))
+
+    bp_c = sum(len(cand) for cand in cand_list)
+    bp_r = sum(
+        min([(abs(len(cand) - len(ref)), len(ref)) for ref in ref_list])[1]
+        for cand, ref_list in zip(cand_list, ref_lists)
+    )
+    return match_ngram, candi_ngram, bp_c, bp_r
+
+
 class BLEU(paddle.metric.Metric):
     r"""
     BLEU (bilingual evaluation understudy) is an algorithm for evaluating the
@@ -160,8 +243,7 @@ class BLEU(paddle.metric.Metric):
             cand_list, ref_list = self.trans_func(output, label, seq_mask)
         if len(cand_list) != len(ref_list):
             raise ValueError("Length error! Please check the output of network.")
-        for i in range(len(cand_list)):
-            self.add_inst(cand_list[i], ref_list[i])
+        self.add_insts(cand_list, ref_list)
 
     def add_inst(self, cand, ref_list):
         """
@@ -175,6 +257,38 @@ class BLEU(paddle.metric.Metric):
             self.count_ngram(cand, ref_list, n_size)
         self.count_bp(cand, ref_list)
 
+    def add_insts(self, cand_list, ref_lists, num_workers=None):
+        """
+        Update the states based on a batch of candidates and their references, with the n-grams of the whole batch
+        counted at once by `bleu_statistics`.
+
+        Args:
+            cand_list (list of list): Tokenized candidate sentences.
+            ref_lists (list of list of list): Lists of tokenized ground truth sentences of the candidates.
+            num_workers (int, optional): The number of processes counting the n-grams, which pays off for
+                corpus-level evaluation. Defaults to None, the n-grams are counted in-process.
+        """
+        if len(cand_list) != len(ref_lists):
+            raise ValueError("Length error! The number of candidates and references should be the same.")
+        if len(cand_list) == 0:
+            return
+        # the subclasses with their own counting are updated instance by instance
+        if type(self).add_inst is not BLEU.add_inst:
+            for cand, ref_list in zip(cand_list, ref_lists):
+                self.add_inst(cand, ref_list)
+            return
+
+        if num_workers is not None and num_workers > 1 and len(cand_list) > 1:
+            results = parallel_map_chunks(bleu_statistics, [cand_list, ref_lists], num_workers, self.n_size)
+        else:
+            results = [bleu_statistics(cand_list, ref_lists, self.n_size)]
+        for match_ngram, candi_ngram, bp_c, bp_r in results:
+            for n_size in range(self.n_size):
+                self.match_ngram[n_size] = self.match_ngram.get(n_size, 0) + match_ngram[n_size]
+                self.candi_ngram[n_size] = self.candi_ngram.get(n_size, 0) + candi_ngram[n_size]
+            self.bp_c += bp_c
+            self.bp_r += bp_r
+
     def count_ngram(self, cand, ref_list, n_size):
         cand_ngram = get_ngram(cand, n_size)
         refs_ngram = []
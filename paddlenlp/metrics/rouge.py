@@ -15,11 +15,60 @@
 import numpy as np
 
 import paddle
-from .utils import default_trans_func
+from .utils import default_trans_func, parallel_map_chunks
 
 __all__ = ["RougeL", "RougeLForDuReader"]
 
 
+def _lcs_length(string, sub):
+    """
+    Length of the longest common subsequence with the bit-parallel algorithm of Allison and Dix: the DP column of
+    the shorter sequence is a bit vector updated with a few big-integer operations per element of the longer one.
+    """
+    if len(string) < len(sub):
+        sub, string = string, sub
+    # bit i of the mask of a token is set if sub[i] is this token
+    masks = {}
+    try:
+        for i, token in enumerate(sub):
+            masks[token] = masks.get(token, 0) | (1 << i)
+    except TypeError:
+        # unhashable tokens, fall back to dynamic programming
+        lengths = np.zeros((len(string) + 1, len(sub) + 1), dtype=np.int64)
+        for j in range(1, len(sub) + 1):
+            for i in range(1, len(string) + 1):
+                if string[i - 1] == sub[j - 1]:
+                    lengths[i][j] = lengths[i - 1][j - 1] + 1
+                else:
+                    lengths[i][j] = max(lengths[i - 1][j], lengths[i][j - 1])
+        return int(lengths[len(string)][len(sub)])
+    full = (1 << len(sub)) - 1
+    v = full
+    for token in string:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    # every zero bit of v is one more element of the LCS
+    return len(sub) - bin(v).count("1")
+
+
+def _rouge_l_score(cand, ref_list, gamma):
+    precs, recalls = [], []
+    for ref in ref_list:
+        basic_lcs = float(_lcs_length(cand, ref))
+        precs.append(basic_lcs / len(cand) if len(cand) > 0.0 else 0.0)
+        recalls.append(basic_lcs / len(ref) if len(ref) > 0.0 else 0.0)
+
+    prec_max = max(precs)
+    rec_max = max(recalls)
+    if prec_max != 0 and rec_max != 0:
+        return ((1 + gamma**2) * prec_max * rec_max) / float(rec_max + gamma**2 * prec_max)
+    return 0.0
+
+
+def _rouge_l_scores(cand_list, ref_lists, gamma):
+    return [_rouge_l_score(cand, ref_list, gamma) for cand, ref_list in zip(cand_list, ref_lists)]
+
+
 class RougeN:
     def __init__(self, n):
         self.n = n
@@ -164,16 +213,7 @@ class RougeL(paddle.metric.Metric):
         Returns:
             float: Returns the length of the longest common subsequence of string and sub.
         """
-        if len(string) < len(sub):
-            sub, string = string, sub
-        lengths = np.zeros((len(string) + 1, len(sub) + 1))
-        for j in range(1, len(sub) + 1):
-            for i in range(1, len(string) + 1):
-                if string[i - 1] == sub[j - 1]:
-                    lengths[i][j] = lengths[i - 1][j - 1] + 1
-                else:
-                    lengths[i][j] = max(lengths[i - 1][j], lengths[i][j - 1])
-        return lengths[len(string)][len(sub)]
+        return float(_lcs_length(string, sub))
 
     def add_inst(self, cand, ref_list):
         """
@@ -200,6 +240,32 @@ class RougeL(paddle.metric.Metric):
             score = 0.0
         self.inst_scores.append(score)
 
+    def add_insts(self, cand_list, ref_lists, num_workers=None):
+        """
+        Update the states based on a batch of candidates and their references.
+
+        Args:
+            cand_list (list): The candidate sentences generated by model.
+            ref_lists (list): The lists of ground truth sentences of the candidates.
+            num_workers (int, optional): The number of processes scoring the candidates, which pays off for
+                corpus-level evaluation of long sentences. Defaults to None, the candidates are scored in-process.
+        """
+        if len(cand_list) != len(ref_lists):
+            raise ValueError("Length error! The number of candidates and references should be the same.")
+        # the subclasses with their own scoring are scored in-process
+        if (
+            num_workers is not None
+            and num_workers > 1
+            and len(cand_list) > 1
+            and type(self).add_inst is RougeL.add_inst
+            and type(self).lcs is RougeL.lcs
+        ):
+            for scores in parallel_map_chunks(_rouge_l_scores, [cand_list, ref_lists], num_workers, self.gamma):
+                self.inst_scores.extend(scores)
+        else:
+            for cand, ref_list in zip(cand_list, ref_lists):
+                self.add_inst(cand, ref_list)
+
     def update(self, output, label, seq_mask=None):
         if self.trans_func is None:
             if self.vocab is None:
@@ -211,8 +277,7 @@ class RougeL(paddle.metric.Metric):
             cand_list, ref_list = self.trans_func(output, label, seq_mask)
         if len(cand_list) != len(ref_list):
             raise ValueError("Length error! Please check the output of network.")
-        for i in range(len(cand_list)):
-            self.add_inst(cand_list[i], ref_list[i])
+        self.add_insts(cand_list, ref_list)
 
     def accumulate(self):
         """
@@ -20,6 +20,156 @@ import json
 import numpy as np
 
 from ..utils.log import logger
+from .utils import parallel_map_chunks
+
+
+def _feature_span_candidates(
+    start_logits, end_logits, offset_mapping, token_is_max_context, n_best_size, max_answer_length
+):
+    """
+    Scores the spans of the `n_best_size` greatest start and end logits of a feature at once, and returns the start
+    indexes, end indexes and scores of the valid spans, in the order of the start then the end logits.
+    """
+    # Go through all possibilities for the `n_best_size` greater start and end logits.
+    start_indexes = np.argsort(start_logits)[-1 : -n_best_size - 1 : -1]
+    end_indexes = np.argsort(end_logits)[-1 : -n_best_size - 1 : -1]
+
+    # Don't consider out-of-scope answers, either because the indices are out of bounds or correspond to part of the
+    # input_ids that are not in the context.
+    def in_context(indexes):
+        return np.array(
+            [
+                index < len(offset_mapping) and offset_mapping[index] is not None and len(offset_mapping[index]) > 0
+                for index in indexes.tolist()
+            ],
+            dtype=bool,
+        )
+
+    start_mask = in_context(start_indexes)
+    # Don't consider answer that don't have the maximum context available (if such information is provided).
+    if token_is_max_context is not None:
+        start_mask &= np.array([token_is_max_context.get(str(i), False) for i in start_indexes.tolist()], dtype=bool)
+
+    # Don't consider answers with a length that is either < 0 or > max_answer_length.
+    lengths = end_indexes[None, :] - start_indexes[:, None] + 1
+    mask = start_mask[:, None] & in_context(end_indexes)[None, :] & (lengths > 0) & (lengths <= max_answer_length)
+    scores = start_logits[start_indexes][:, None] + end_logits[end_indexes][None, :]
+
+    start_positions, end_positions = np.nonzero(mask)
+    return start_indexes[start_positions], end_indexes[end_positions], scores[start_positions, end_positions]
+
+
+def _compute_example_prediction(
+    context, features, version_2_with_negative, n_best_size, max_answer_length, null_score_diff_threshold
+):
+    """
+    Computes the prediction of an example from its features, a list of `(start_logits, end_logits, offset_mapping,
+    token_is_max_context)`, and returns the predicted text, the n_best predictions and the score_diff.
+    """
+    min_null_prediction = None
+    candidates = []
+
+    # Looping through all the features associated to the current example.
+    for feature_index, (start_logits, end_logits, offset_mapping, token_is_max_context) in enumerate(features):
+        start_logits = np.asarray(start_logits)
+        end_logits = np.asarray(end_logits)
+
+        # Update minimum null prediction.
+        feature_null_score = start_logits[0] + end_logits[0]
+        if min_null_prediction is None or min_null_prediction["score"] > feature_null_score:
+            min_null_prediction = {
+                "offsets": (0, 0),
+                "score": feature_null_score,
+                "start_logit": start_logits[0],
+                "end_logit": end_logits[0],
+            }
+
+        start_indexes, end_indexes, scores = _feature_span_candidates(
+            start_logits, end_logits, offset_mapping, token_is_max_context, n_best_size, max_answer_length
+        )
+        candidates.append((np.full(len(scores), feature_index), start_indexes, end_indexes, scores))
+
+    # Only keep the best `n_best_size` predictions, the null prediction being the last candidate so that it comes
+    # after the spans of the same score.
+    feature_indexes, start_indexes, end_indexes, scores = (
+        (np.concatenate(arrays) for arrays in zip(*candidates)) if candidates else (np.zeros(0),) * 4
+    )
+    if version_2_with_negative:
+        null_score = min_null_prediction["score"]
+        scores = np.append(scores, null_score)
+    best_indexes = np.argsort(-scores, kind="stable")[:n_best_size].tolist()
+
+    predictions = []
+    for i in best_indexes:
+        if i == len(feature_indexes):
+            predictions.append(min_null_prediction)
+            continue
+        start_logits, end_logits, offset_mapping, _ = features[feature_indexes[i]]
+        start_index, end_index = int(start_indexes[i]), int(end_indexes[i])
+        predictions.append(
+            {
+                "offsets": (offset_mapping[start_index][0], offset_mapping[end_index][1]),
+                "score": scores[i],
+                "start_logit": start_logits[start_index],
+                "end_logit": end_logits[end_index],
+            }
+        )
+
+    # Add back the minimum null prediction if it was removed because of its low score.
+    if version_2_with_negative and not any(p["offsets"] == (0, 0) for p in predictions):
+        predictions.append(min_null_prediction)
+
+    # Use the offsets to gather the answer text in the original context.
+    for pred in predictions:
+        offsets = pred.pop("offsets")
+        pred["text"] = context[offsets[0] : offsets[1]]
+
+    # In the very rare edge case we have not a single non-null prediction, we create a fake prediction to avoid
+    # failure.
+    if len(predictions) == 0 or (len(predictions) == 1 and predictions[0]["text"] == ""):
+        predictions.insert(0, {"text": "empty", "start_logit": 0.0, "end_logit": 0.0, "score": 0.0})
+
+    # Compute the softmax of all scores (we do it with numpy to stay independent from torch/tf in this file, using
+    # the LogSumExp trick).
+    scores = np.array([pred.pop("score") for pred in predictions])
+    exp_scores = np.exp(scores - np.max(scores))
+    probs = exp_scores / exp_scores.sum()
+
+    # Include the probabilities in our predictions.
+    for prob, pred in zip(probs, predictions):
+        pred["probability"] = prob
+
+    # Pick the best prediction. If the null answer is not possible, this is easy.
+    score_diff = None
+    if not version_2_with_negative:
+        prediction = predictions[0]["text"]
+    else:
+        # Otherwise we first need to find the best non-empty prediction.
+        i = 0
+        while predictions[i]["text"] == "":
+            i += 1
+        best_non_null_pred = predictions[i]
+
+        # Then we compare to the null prediction using the threshold.
+        score_diff = null_score - best_non_null_pred["start_logit"] - best_non_null_pred["end_logit"]
+        if score_diff > null_score_diff_threshold:
+            prediction = ""
+        else:
+            prediction = best_non_null_pred["text"]
+        score_diff = float(score_diff)  # To be JSON-serializable.
+
+    # Make `predictions` JSON-serializable by casting np.float back to float.
+    nbest_json = [
+        {k: (float(v) if isinstance(v, (np.float16, np.float32, np.float64)) else v) for k, v in pred.items()}
+        for pred in predictions
+    ]
+    return prediction, nbest_json, score_diff
+
+
+def _compute_example_predictions(contexts, example_features, *args):
+    return [
+        _compute_example_prediction(context, features, *args) for context, features in zip(contexts, example_features)
+    ]
 
 
 def compute_prediction(
@@ -30,6 +180,7 @@ def compute_prediction(
     n_best_size=20,
     max_answer_length=30,
     null_score_diff_threshold=0.0,
+    num_workers=None,
 ):
     """
     Post-processes the predictions of a question-answering model to convert
@@ -57,6 +208,9 @@ def compute_prediction(
         null_score_diff_threshold (float, optional): The threshold used to select
             the null answer. Only useful when `version_2_with_negative` is True.
             Defaults to 0.0.
+        num_workers (int, optional): The number of processes post-processing
+            the examples. Defaults to None, the examples are post-processed
+            in-process.
 
     Returns:
         A tuple of three dictionaries containing final selected answer, all n_best
@@ -74,129 +228,45 @@ def compute_prediction(
     for i, feature in enumerate(features):
         features_per_example[example_id_to_index[feature["example_id"]]].append(i)
 
+    # Gather the logits, the offsets mapping the positions in our logits to span of texts in the original context
+    # and the optional `token_is_max_context` of the features associated to every example.
+    example_ids, contexts, example_features = [], [], []
+    for example_index, example in enumerate(examples):
+        example_ids.append(example["id"])
+        contexts.append(example["context"])
+        example_features.append(
+            [
+                (
+                    all_start_logits[feature_index],
+                    all_end_logits[feature_index],
+                    features[feature_index]["offset_mapping"],
+                    features[feature_index].get("token_is_max_context", None),
+                )
+                for feature_index in features_per_example[example_index]
+            ]
+        )
+
+    args = (version_2_with_negative, n_best_size, max_answer_length, null_score_diff_threshold)
+    if num_workers is not None and num_workers > 1 and len(example_ids) > 1:
+        results = [
+            result
+            for chunk_results in parallel_map_chunks(
+                _compute_example_predictions, [contexts, example_features], num_workers, *args
+            )
+            for result in chunk_results
+        ]
+    else:
+        results = _compute_example_predictions(contexts, example_features, *args)
+
     # The dictionaries we have to fill.
     all_predictions = collections.OrderedDict()
     all_nbest_json = collections.OrderedDict()
-
     scores_diff_json = collections.OrderedDict()
-
-    # Let's loop over all the examples!
-    for example_index, example in enumerate(examples):
-        # Those are the indices of the features associated to the current example.
-        feature_indices = features_per_example[example_index]
-
-        min_null_prediction = None
-        prelim_predictions = []
-
-        # Looping through all the features associated to the current example.
-        for feature_index in feature_indices:
-            # We grab the predictions of the model for this feature.
-            start_logits = all_start_logits[feature_index]
-            end_logits = all_end_logits[feature_index]
-            # This is what will allow us to map some the positions in our logits to span of texts in the original
-            # context.
-            offset_mapping = features[feature_index]["offset_mapping"]
-            # Optional `token_is_max_context`, if provided we will remove answers that do not have the maximum context
-            # available in the current feature.
-            token_is_max_context = features[feature_index].get("token_is_max_context", None)
-
-            # Update minimum null prediction.
-            feature_null_score = start_logits[0] + end_logits[0]
-            if min_null_prediction is None or min_null_prediction["score"] > feature_null_score:
-                min_null_prediction = {
-                    "offsets": (0, 0),
-                    "score": feature_null_score,
-                    "start_logit": start_logits[0],
-                    "end_logit": end_logits[0],
-                }
-
-            # Go through all possibilities for the `n_best_size` greater start and end logits.
-            start_indexes = np.argsort(start_logits)[-1 : -n_best_size - 1 : -1].tolist()
-            end_indexes = np.argsort(end_logits)[-1 : -n_best_size - 1 : -1].tolist()
-            for start_index in start_indexes:
-                for end_index in end_indexes:
-                    # Don't consider out-of-scope answers, either because the indices are out of bounds or correspond
-                    # to part of the input_ids that are not in the context.
-                    if (
-                        start_index >= len(offset_mapping)
-                        or end_index >= len(offset_mapping)
-                        or offset_mapping[start_index] is None
-                        or offset_mapping[end_index] is None
-                        or len(offset_mapping[start_index]) == 0
-                        or len(offset_mapping[end_index]) == 0
-                    ):
-                        continue
-                    # Don't consider answers with a length that is either < 0 or > max_answer_length.
-                    if end_index < start_index or end_index - start_index + 1 > max_answer_length:
-                        continue
-                    # Don't consider answer that don't have the maximum context available (if such information is
-                    # provided).
-                    if token_is_max_context is not None and not token_is_max_context.get(str(start_index), False):
-                        continue
-                    prelim_predictions.append(
-                        {
-                            "offsets": (offset_mapping[start_index][0], offset_mapping[end_index][1]),
-                            "score": start_logits[start_index] + end_logits[end_index],
-                            "start_logit": start_logits[start_index],
-                            "end_logit": end_logits[end_index],
-                        }
-                    )
+    for example_id, (prediction, nbest_json, score_diff) in zip(example_ids, results):
+        all_predictions[example_id] = prediction
+        all_nbest_json[example_id] = nbest_json
         if version_2_with_negative:
-            # Add the minimum null prediction
-            prelim_predictions.append(min_null_prediction)
-            null_score = min_null_prediction["score"]
-
-        # Only keep the best `n_best_size` predictions.
-        predictions = sorted(prelim_predictions, key=lambda x: x["score"], reverse=True)[:n_best_size]
-
-        # Add back the minimum null prediction if it was removed because of its low score.
-        if version_2_with_negative and not any(p["offsets"] == (0, 0) for p in predictions):
-            predictions.append(min_null_prediction)
-
-        # Use the offsets to gather the answer text in the original context.
-        context = example["context"]
-        for pred in predictions:
-            offsets = pred.pop("offsets")
-            pred["text"] = context[offsets[0] : offsets[1]]
-
-        # In the very rare edge case we have not a single non-null prediction, we create a fake prediction to avoid
-        # failure.
-        if len(predictions) == 0 or (len(predictions) == 1 and predictions[0]["text"] == ""):
-            predictions.insert(0, {"text": "empty", "start_logit": 0.0, "end_logit": 0.0, "score": 0.0})
-
-        # Compute the softmax of all scores (we do it with numpy to stay independent from torch/tf in this file, using
-        # the LogSumExp trick).
-        scores = np.array([pred.pop("score") for pred in predictions])
-        exp_scores = np.exp(scores - np.max(scores))
-        probs = exp_scores / exp_scores.sum()
-
-        # Include the probabilities in our predictions.
-        for prob, pred in zip(probs, predictions):
-            pred["probability"] = prob
-
-        # Pick the best prediction. If the null answer is not possible, this is easy.
-        if not version_2_with_negative:
-            all_predictions[example["id"]] = predictions[0]["text"]
-        else:
-            # Otherwise we first need to find the best non-empty prediction.
-            i = 0
-            while predictions[i]["text"] == "":
-                i += 1
-            best_non_null_pred = predictions[i]
-
-            # Then we compare to the null prediction using the threshold.
-            score_diff = null_score - best_non_null_pred["start_logit"] - best_non_null_pred["end_logit"]
-            scores_diff_json[example["id"]] = float(score_diff)  # To be JSON-serializable.
-            if score_diff > null_score_diff_threshold:
-                all_predictions[example["id"]] = ""
-            else:
-                all_predictions[example["id"]] = best_non_null_pred["text"]
-
-        # Make `predictions` JSON-serializable by casting np.float back to float.
-        all_nbest_json[example["id"]] = [
-            {k: (float(v) if isinstance(v, (np.float16, np.float32, np.float64)) else v) for k, v in pred.items()}
-            for pred in predictions
-        ]
+            scores_diff_json[example_id] = score_diff
 
     return all_predictions, all_nbest_json, scores_diff_json
 
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 
@@ -38,3 +42,18 @@ def default_trans_func(output, label, seq_mask, vocab):
 
         ref_list.append([token_list])
     return cand, ref_list
+
+
+def parallel_map_chunks(func, sequences, num_workers, *args):
+    """
+    Splits the aligned lists `sequences` into `num_workers` contiguous chunks, calls `func(*chunks, *args)` for every
+    chunk in a process pool and returns the results in the order of the chunks.
+    """
+    num_examples = len(sequences[0])
+    chunk_size = math.ceil(num_examples / num_workers)
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(func, *[sequence[start : start + chunk_size] for sequence in sequences], *args)
+            for start in range(0, num_examples, chunk_size)
+        ]
+        return [future.result() for future in futures]
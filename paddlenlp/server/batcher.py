@@ -0,0 +1,202 @@
+# coding:utf-8
+# Copyright (c) 2024  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+from ..utils.log import logger
+
+
+class _BatchRequest:
+    __slots__ = ("data", "parameters", "key", "num_examples", "num_tokens", "future", "enqueue_time")
+
+    def __init__(self, data, parameters, key, num_examples, num_tokens):
+        self.data = data
+        self.parameters = parameters
+        self.key = key
+        self.num_examples = num_examples
+        self.num_tokens = num_tokens
+        self.future = Future()
+        self.enqueue_time = time.monotonic()
+
+
+class DynamicBatcher:
+    """
+    Coalesces concurrent requests into batches and runs them with a single call of `process_fn`.
+
+    A worker takes the oldest queued request and keeps adding compatible requests (same key) until the batch
+    holds `max_batch_size` examples or `max_batch_tokens` tokens, or until the oldest request has waited
+    `max_wait_time` seconds. Requests with a different key stay queued in arrival order for the next batch.
+
+    Args:
+        process_fn (callable): Takes a list of `(data, parameters)` and returns the list of their results.
+        key_fn (callable, optional): Maps `(data, parameters)` to a hashable key, only requests with equal keys are
+            batched together. A key of None means the request is always processed alone.
+        size_fn (callable, optional): Maps `data` to `(num_examples, num_tokens)`. Defaults to one example
+            and no token.
+        max_batch_size (int, optional): Maximum number of examples in a batch. Defaults to 32.
+        max_wait_time (float, optional): Maximum time in seconds the oldest request of a batch waits for more
+            requests. Defaults to 0.005.
+        max_batch_tokens (int, optional): Maximum number of tokens in a batch, None means no limit.
+        num_workers (int, optional): Number of batches processed concurrently. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        process_fn,
+        key_fn=None,
+        size_fn=None,
+        max_batch_size=32,
+        max_wait_time=0.005,
+        max_batch_tokens=None,
+        num_workers=1,
+    ):
+        if max_batch_size <= 0:
+            raise ValueError(f"`max_batch_size` must be a positive integer, but got {max_batch_size}")
+        self._process_fn = process_fn
+        self._key_fn = key_fn or (lambda data, parameters: 0)
+        self._size_fn = size_fn or (lambda data: (1, 0))
+        self._max_batch_size = max_batch_size
+        self._max_wait_time = max_wait_time
+        self._max_batch_tokens = max_batch_tokens
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._num_requests = 0
+        self._num_batches = 0
+        self._num_batched_examples = 0
+        self._max_seen_batch_size = 0
+        self._total_wait_time = 0.0
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"DynamicBatcher-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, data, parameters):
+        """Queues a request and returns the `concurrent.futures.Future` of its result."""
+        num_examples, num_tokens = self._size_fn(data)
+        request = _BatchRequest(data, parameters, self._key_fn(data, parameters), num_examples, num_tokens)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The batcher has been closed.")
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def predict(self, data, parameters):
+        return self.submit(data, parameters).result()
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def metrics(self):
+        with self._cond:
+            num_batches = max(self._num_batches, 1)
+            return {
+                "queue_depth": len(self._queue),
+                "num_requests": self._num_requests,
+                "num_batches": self._num_batches,
+                "avg_batch_size": self._num_batched_examples / num_batches,
+                "max_batch_size": self._max_seen_batch_size,
+                "avg_wait_time": self._total_wait_time / max(self._num_requests, 1),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _fits(self, request, num_examples, num_tokens):
+        if num_examples + request.num_examples > self._max_batch_size:
+            return False
+        return self._max_batch_tokens is None or num_tokens + request.num_tokens <= self._max_batch_tokens
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+            first = self._queue.popleft()
+            batch = [first]
+            if first.key is None:
+                return batch
+            num_examples, num_tokens = first.num_examples, first.num_tokens
+            deadline = first.enqueue_time + self._max_wait_time
+            # Requests before `scanned` were already found incompatible with this batch
+            scanned = 0
+            while num_examples < self._max_batch_size:
+                while scanned < len(self._queue) and num_examples < self._max_batch_size:
+                    request = self._queue[scanned]
+                    if request.key == first.key and self._fits(request, num_examples, num_tokens):
+                        del self._queue[scanned]
+                        batch.append(request)
+                        num_examples += request.num_examples
+                        num_tokens += request.num_tokens
+                    else:
+                        scanned += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _record_batch(self, batch):
+        now = time.monotonic()
+        batch_size = sum(request.num_examples for request in batch)
+        with self._cond:
+            self._num_requests += len(batch)
+            self._num_batches += 1
+            self._num_batched_examples += batch_size
+            self._max_seen_batch_size = max(self._max_seen_batch_size, batch_size)
+            self._total_wait_time += sum(now - request.enqueue_time for request in batch)
+
+    def _run(self, batch):
+        results = self._process_fn([(request.data, request.parameters) for request in batch])
+        if len(results) != len(batch):
+            raise ValueError(f"`process_fn` returned {len(results)} results for {len(batch)} requests.")
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._record_batch(batch)
+            try:
+                self._run(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                    continue
+                # Retry the requests one by one so that a bad request only fails itself
+                logger.warning(f"Batched prediction of {len(batch)} requests failed ({e}), retrying them one by one.")
+                for request in batch:
+                    try:
+                        self._run([request])
+                    except Exception as e:
+                        request.future.set_exception(e)
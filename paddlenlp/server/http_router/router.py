@@ -12,15 +12,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import hashlib
 import typing
 from typing import Optional
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Extra, create_model
 
 from ...utils.log import logger
 from ..base_router import BaseRouterManager
+from ..utils import ServerBusyError
 
 
 class ResponseBase(BaseModel):
@@ -32,6 +34,29 @@ class RequestBase(BaseModel, extra=Extra.forbid):
 
 
 class HttpRouterManager(BaseRouterManager):
+    def _create_predict_endpoint(self, get_manager, req_model):
+        executor = self._app._predict_executor
+        if executor is None:
+
+            def predict(request: Request, inference_request: req_model):
+                result = get_manager().predict(inference_request.data, inference_request.parameters)
+                return {"result": result}
+
+            return predict
+
+        async def async_predict(request: Request, inference_request: req_model):
+            try:
+                result = await executor.run(
+                    get_manager().predict, inference_request.data, inference_request.parameters
+                )
+            except ServerBusyError as e:
+                raise HTTPException(status_code=429, detail=str(e))
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="The request timed out.")
+            return {"result": result}
+
+        return async_predict
+
     def register_models_router(self, task_name):
 
         # Url path to register the model
@@ -57,9 +82,7 @@ class HttpRouterManager(BaseRouterManager):
         )
 
         # Template predict endpoint function to dynamically serve different models
-        def predict(request: Request, inference_request: req_model):
-            result = self._app._model_manager.predict(inference_request.data, inference_request.parameters)
-            return {"result": result}
+        predict = self._create_predict_endpoint(lambda: self._app._model_manager, req_model)
 
         # Register the route and add to the app
         router = APIRouter()
@@ -73,6 +96,15 @@ class HttpRouterManager(BaseRouterManager):
                 response_model_exclude_unset=True,
                 response_model_exclude_none=True,
             )
+
+        def metrics():
+            metrics = self._app._model_manager.metrics()
+            if self._app._predict_executor is not None:
+                metrics["executor"] = self._app._predict_executor.metrics()
+            return metrics
+
+        for path in paths:
+            router.add_api_route(path + "/metrics", metrics, methods=["get"], summary=f"{task_name.title()} Metrics")
         self._app.include_router(router)
 
     def register_taskflow_router(self, task_name):
@@ -100,9 +132,7 @@ class HttpRouterManager(BaseRouterManager):
         )
 
         # Template predict endpoint function to dynamically serve different models
-        def predict(request: Request, inference_request: req_model):
-            result = self._app._taskflow_manager.predict(inference_request.data, inference_request.parameters)
-            return {"result": result}
+        predict = self._create_predict_endpoint(lambda: self._app._taskflow_manager, req_model)
 
         # Register the route and add to the app
         router = APIRouter()
@@ -13,18 +13,43 @@
 # see the license for the specific language governing permissions and
 # limitations under the license.
 
-import time
+import json
+import math
+from multiprocessing import cpu_count
+
+import numpy as np
 
 from ..transformers import AutoTokenizer
 from ..utils.log import logger
 from ..utils.tools import get_env_device
+from .batcher import DynamicBatcher
 from .handlers import BaseModelHandler, BasePostHandler
 from .predictor import Predictor
-from .utils import lock_predictor
+from .utils import PredictorPool
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
 
 
 class ModelManager:
-    def __init__(self, task_name, model_path, tokenizer_name, model_handler, post_handler, precision, device_id):
+    def __init__(
+        self,
+        task_name,
+        model_path,
+        tokenizer_name,
+        model_handler,
+        post_handler,
+        precision,
+        device_id,
+        batching=False,
+        max_batch_size=32,
+        max_wait_time=0.005,
+        max_batch_tokens=None,
+        dispatch_policy="least_outstanding",
+    ):
         self._task_name = task_name
         self._model_path = model_path
         self._tokenizer_name = tokenizer_name
@@ -32,8 +57,20 @@ class ModelManager:
         self._post_handler = post_handler
         self._precision = precision
         self._device_id = device_id
+        self._dispatch_policy = dispatch_policy
         self._tokenizer = None
+        self._batcher = None
         self._register()
+        if batching:
+            self._batcher = DynamicBatcher(
+                self._predict_batch,
+                key_fn=self._get_batch_key,
+                size_fn=self._get_batch_size,
+                max_batch_size=max_batch_size,
+                max_wait_time=max_wait_time,
+                max_batch_tokens=max_batch_tokens,
+                num_workers=len(self._predictor_list),
+            )
 
     def _register(self):
         # Get the model handler
@@ -49,26 +86,22 @@ class ModelManager:
             )
         self._post_handler = self._post_handler.process
 
-        # Create the model predictor
-        device = get_env_device()
+        # Create the model predictors, `device_id` can list several devices and -1 stands for a CPU instance
+        device_ids = self._device_id if isinstance(self._device_id, list) else [self._device_id]
+        if get_env_device() == "cpu":
+            device_ids = [-1] * len(device_ids)
+        num_cpu_instances = device_ids.count(-1)
         predictor_list = []
-        if device == "cpu" or self._device_id == -1:
-            predictor = Predictor(self._model_path, self._precision, "cpu")
-            predictor_list.append(predictor)
-        elif isinstance(self._device_id, int):
-            predictor = Predictor(self._model_path, self._precision, "gpu:" + str(self._device_id))
+        for device_id in device_ids:
+            if device_id == -1:
+                # The CPU instances share the math library threads
+                num_threads = max(math.ceil(cpu_count() / 2) // num_cpu_instances, 1)
+                predictor = Predictor(self._model_path, self._precision, "cpu", num_threads=num_threads)
+            else:
+                predictor = Predictor(self._model_path, self._precision, "gpu:" + str(device_id))
             predictor_list.append(predictor)
-        elif isinstance(self._device_id, list):
-            for device in self._device_id:
-                predictor = Predictor(
-                    self._model_path,
-                    self._model_class_or_name,
-                    self._input_spec,
-                    self._precision,
-                    "gpu:" + str(device),
-                )
-                predictor_list.append(predictor)
         self._predictor_list = predictor_list
+        self._predictor_pool = PredictorPool(predictor_list, policy=self._dispatch_policy)
 
         # Get the tokenize of model
         self._get_tokenizer()
@@ -81,16 +114,83 @@ class ModelManager:
                 logger.error("The argrument of `tokenizer_name`  must be the name of tokenizer.")
         assert self._tokenizer is not None, "The tokenizer must be not register, you could set the class of Tokenizer"
 
-    def _get_predict_id(self):
-        t = time.time()
-        t = int(round(t * 1000))
-        predictor_id = t % len(self._predictor_list)
-        logger.info("The predictor id: {} is selected by running the model.".format(predictor_id))
-        return predictor_id
+    def _run_model_handler(self, data, parameters):
+        with self._predictor_pool.acquire() as (_, predictor):
+            return self._model_handler(predictor, self._tokenizer, data, parameters)
+
+    @staticmethod
+    def _get_batch_key(data, parameters):
+        """Requests can be batched together if they carry the same text fields and the same parameters."""
+        if not isinstance(data, dict) or not isinstance(data.get("text", None), (str, list)):
+            return None
+        if not all(value is None or isinstance(value, (str, list)) for value in data.values()):
+            return None
+        try:
+            parameters_key = json.dumps(parameters, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return tuple(sorted(key for key, value in data.items() if value is not None)), parameters_key
+
+    @staticmethod
+    def _get_batch_size(data):
+        """The number of examples and an estimate of the number of tokens (number of characters) of a request."""
+        if not isinstance(data, dict):
+            return 1, 0
+        texts = _as_list(data.get("text", None))
+        num_tokens = sum(len(text) for text in texts + _as_list(data.get("text_pair", None)))
+        return max(len(texts), 1), num_tokens
+
+    @staticmethod
+    def _split_model_output(model_output, batch_data, batch_sizes):
+        """Splits the model handler output of a merged batch back to the requests, or returns None if an output
+        field is not aligned with the examples."""
+        offsets = np.cumsum([0] + batch_sizes)
+        outputs = [{} for _ in batch_data]
+        for key, value in model_output.items():
+            if key == "data":
+                for output, data in zip(outputs, batch_data):
+                    output["data"] = data
+                continue
+            if not isinstance(value, (list, np.ndarray)) or len(value) != offsets[-1]:
+                return None
+            for i, output in enumerate(outputs):
+                output[key] = value[offsets[i] : offsets[i + 1]]
+        return outputs
+
+    def _predict_batch(self, requests):
+        if len(requests) == 1:
+            return [self._predict(*requests[0])]
+        batch_data = [data for data, _ in requests]
+        parameters = requests[0][1]
+        merged_data = {}
+        for data in batch_data:
+            for key, value in data.items():
+                if value is not None:
+                    merged_data.setdefault(key, []).extend(_as_list(value))
+        batch_sizes = [len(_as_list(data["text"])) for data in batch_data]
+
+        model_output = self._run_model_handler(merged_data, parameters)
+        outputs = self._split_model_output(model_output, batch_data, batch_sizes)
+        if outputs is None:
+            logger.warning(
+                "The model handler output can not be split by request, the batch is predicted again request by request."
+            )
+            return [self._predict(data, parameters) for data in batch_data]
+        return [self._post_handler(output, parameters) for output in outputs]
+
+    def _predict(self, data, parameters):
+        model_output = self._run_model_handler(data, parameters)
+        return self._post_handler(model_output, parameters)
 
     def predict(self, data, parameters):
-        predictor_id = self._get_predict_id()
-        with lock_predictor(self._predictor_list[predictor_id]._lock):
-            model_output = self._model_handler(self._predictor_list[predictor_id], self._tokenizer, data, parameters)
-            final_output = self._post_handler(model_output, parameters)
-            return final_output
+        if self._batcher is not None:
+            return self._batcher.predict(data, parameters)
+        return self._predict(data, parameters)
+
+    def metrics(self):
+        metrics = {"num_predictors": len(self._predictor_list), "predictors": self._predictor_pool.metrics()}
+        for predictor, predictor_metrics in zip(self._predictor_list, metrics["predictors"]):
+            predictor_metrics["device"] = predictor._device
+        if self._batcher is not None:
+            metrics["batching"] = self._batcher.metrics()
+        return metrics
@@ -25,14 +25,14 @@ from ..utils.log import logger
 
 
 class Predictor:
-    def __init__(self, model_path, precision, device):
+    def __init__(self, model_path, precision, device, num_threads=None):
         self._model_path = model_path
         self._default_static_model_path = "auto_static"
         self._precision = precision
         self._cpu_thread = 8
         self._config = None
         self._device = device
-        self._num_threads = math.ceil(cpu_count() / 2)
+        self._num_threads = num_threads if num_threads is not None else math.ceil(cpu_count() / 2)
         self._output_num = 1
         paddle.set_device(device)
         self._create_predictor()
@@ -17,15 +17,30 @@ from fastapi import FastAPI
 from .http_router import HttpRouterManager
 from .model_manager import ModelManager
 from .taskflow_manager import TaskflowManager
+from .utils import AsyncPredictExecutor
 from ..taskflow import Taskflow
 
 
 class SimpleServer(FastAPI):
-    def __init__(self, **kwargs):
+    def __init__(self, async_mode=False, max_workers=4, max_queue_size=64, request_timeout=None, **kwargs):
         """
         Initial function for the PaddleNLP SimpleServer.
+
+        Args:
+            async_mode (bool, optional): Whether the routes are async handlers awaiting a bounded worker pool
+                instead of sync handlers run in the default threadpool of FastAPI. Defaults to False.
+            max_workers (int, optional): Number of worker threads running the predictions in async mode.
+            max_queue_size (int, optional): Number of requests allowed to wait for a worker in async mode, further
+                requests are answered with 429 right away.
+            request_timeout (float, optional): Timeout in seconds of a request in async mode, answered with 504.
         """
         super().__init__(**kwargs)
+        self._predict_executor = None
+        if async_mode:
+            self._predict_executor = AsyncPredictExecutor(
+                max_workers=max_workers, max_queue_size=max_queue_size, timeout=request_timeout
+            )
+            self.add_event_handler("shutdown", self._predict_executor.shutdown)
         self._router_manager = HttpRouterManager(self)
         self._taskflow_manager = None
         self._model_manager = None
@@ -33,7 +48,19 @@ class SimpleServer(FastAPI):
         self._service_type = None
 
     def register(
-        self, task_name, model_path, tokenizer_name, model_handler, post_handler, precision="fp32", device_id=0
+        self,
+        task_name,
+        model_path,
+        tokenizer_name,
+        model_handler,
+        post_handler,
+        precision="fp32",
+        device_id=0,
+        batching=False,
+        max_batch_size=32,
+        max_wait_time=0.005,
+        max_batch_tokens=None,
+        dispatch_policy="least_outstanding",
     ):
         """
         The register function for the SimpleServer, the main register argrument as follows:
@@ -43,16 +70,34 @@ class SimpleServer(FastAPI):
             model_path (str):
             handler(str):
             device (int|list|str, optional):
+            batching (bool, optional): Whether to coalesce concurrent requests with the same parameters into one
+                call of the model handler. The outputs of the model handler must be aligned with the input texts.
+            max_batch_size (int, optional): Maximum number of texts in a coalesced batch.
+            max_wait_time (float, optional): Maximum time in seconds a request waits for others to be batched with.
+            max_batch_tokens (int, optional): Maximum number of characters in a coalesced batch, None means no limit.
+            dispatch_policy (str, optional): How requests are dispatched over the predictors of `device_id`,
+                "least_outstanding" or "power_of_two".
         """
         self._server_type = "models"
         model_manager = ModelManager(
-            task_name, model_path, tokenizer_name, model_handler, post_handler, precision, device_id
+            task_name,
+            model_path,
+            tokenizer_name,
+            model_handler,
+            post_handler,
+            precision,
+            device_id,
+            batching=batching,
+            max_batch_size=max_batch_size,
+            max_wait_time=max_wait_time,
+            max_batch_tokens=max_batch_tokens,
+            dispatch_policy=dispatch_policy,
         )
         self._model_manager = model_manager
         # Register transformers model server router
         self._router_manager.register_models_router(task_name)
 
-    def register_taskflow(self, task_name, task, taskflow_handler=None):
+    def register_taskflow(self, task_name, task, taskflow_handler=None, dispatch_policy="least_outstanding"):
         """
         The register function for the SimpleServer, the main register argrument as follows:
 
@@ -61,6 +106,8 @@ class SimpleServer(FastAPI):
             model_or_path (str):
             handler(str):
             device (int|list|str, optional):
+            dispatch_policy (str, optional): How requests are dispatched over the Taskflow instances,
+                "least_outstanding" or "power_of_two".
         """
         self._server_type = "server"
         check_flag = True
@@ -78,6 +125,6 @@ class SimpleServer(FastAPI):
             )
 
         # Register Taskflow server router
-        taskflow_manager = TaskflowManager(task, taskflow_handler)
+        taskflow_manager = TaskflowManager(task, taskflow_handler, dispatch_policy=dispatch_policy)
         self._taskflow_manager = taskflow_manager
         self._router_manager.register_taskflow_router(task_name)
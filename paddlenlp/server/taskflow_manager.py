@@ -13,10 +13,8 @@
 # see the license for the specific language governing permissions and
 # limitations under the license.
 
-import time
 from .handlers import TaskflowHandler
-from .utils import lock_predictor
-from ..utils.log import logger
+from .utils import PredictorPool
 
 
 class TaskflowManager:
@@ -24,17 +22,14 @@ class TaskflowManager:
     The TaskflowManager could predict the raw text.
     """
 
-    def __init__(self, task, taskflow_handler=None):
+    def __init__(self, task, taskflow_handler=None, dispatch_policy="least_outstanding"):
         self._task = task
+        self._task_pool = PredictorPool(task, policy=dispatch_policy)
         if taskflow_handler is None:
             self._handler_func = TaskflowHandler.process
         else:
             self._handler_func = taskflow_handler.process
 
     def predict(self, data, parameters):
-        t = time.time()
-        t = int(round(t * 1000))
-        task_index = t % len(self._task)
-        logger.info("The predictor id: {} is selected by running the taskflow.".format(task_index))
-        with lock_predictor(self._task[task_index]._lock):
-            return self._handler_func(self._task[task_index], data, parameters)
+        with self._task_pool.acquire() as (_, task):
+            return self._handler_func(task, data, parameters)
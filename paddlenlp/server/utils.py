@@ -13,13 +13,153 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import contextlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
-@contextlib.contextmanager
-def lock_predictor(lock):
-    lock.acquire()
-    try:
-        yield
-    finally:
-        lock.release()
+class PredictorPool:
+    """
+    Dispatches requests over predictor replicas, each guarded by its own `_lock`.
+
+    The replicas are tried from the least loaded one (fewest in-flight requests) with a non-blocking acquire, and
+    the request only waits on the lock of the least loaded replica when all of them are busy. With the
+    "power_of_two" policy only two random replicas are considered, which keeps the choice cheap and avoids herding
+    on large pools.
+
+    Args:
+        predictors (list): Objects exposing a `threading.Lock` as `_lock`.
+        policy (str, optional): "least_outstanding" or "power_of_two". Defaults to "least_outstanding".
+    """
+
+    POLICIES = ["least_outstanding", "power_of_two"]
+
+    def __init__(self, predictors, policy="least_outstanding"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported dispatch policy {policy}, it must be one of {self.POLICIES}.")
+        if len(predictors) == 0:
+            raise ValueError("The predictor pool needs at least one predictor.")
+        self._predictors = list(predictors)
+        self._policy = policy
+        self._in_flight = [0] * len(self._predictors)
+        self._num_requests = [0] * len(self._predictors)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._predictors)
+
+    def __getitem__(self, index):
+        return self._predictors[index]
+
+    def _select(self):
+        """Returns the ids of the candidate predictors sorted from the least loaded one, ties in random order. The
+        request is counted by `acquire` on the predictor it gets."""
+        with self._lock:
+            if self._policy == "power_of_two" and len(self._predictors) > 2:
+                candidates = random.sample(range(len(self._predictors)), 2)
+            else:
+                candidates = list(range(len(self._predictors)))
+            # Shuffle before the stable sort so that ties are broken randomly
+            random.shuffle(candidates)
+            candidates.sort(key=lambda i: self._in_flight[i])
+            return candidates
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """Context manager yielding `(predictor_id, predictor)` with the predictor lock held."""
+        candidates = self._select()
+        predictor_id = None
+        for candidate in candidates:
+            if self._predictors[candidate]._lock.acquire(blocking=False):
+                predictor_id = candidate
+                break
+        with self._lock:
+            blocking = predictor_id is None
+            if blocking:
+                predictor_id = min(candidates, key=lambda i: self._in_flight[i])
+            self._in_flight[predictor_id] += 1
+            self._num_requests[predictor_id] += 1
+        predictor = self._predictors[predictor_id]
+        try:
+            if blocking:
+                predictor._lock.acquire()
+            try:
+                yield predictor_id, predictor
+            finally:
+                predictor._lock.release()
+        finally:
+            with self._lock:
+                self._in_flight[predictor_id] -= 1
+
+    def metrics(self):
+        with self._lock:
+            return [
+                {"in_flight": in_flight, "num_requests": num_requests}
+                for in_flight, num_requests in zip(self._in_flight, self._num_requests)
+            ]
+
+
+class ServerBusyError(RuntimeError):
+    pass
+
+
+class AsyncPredictExecutor:
+    """
+    Runs blocking predict calls from async handlers on a bounded thread pool.
+
+    At most `max_workers` calls run at once and at most `max_queue_size` more wait for a worker; further calls are
+    rejected with `ServerBusyError` right away, so an overloaded server answers quickly instead of piling up
+    threads. A call waiting longer than `timeout` seconds raises `asyncio.TimeoutError`; calls that timed out or
+    whose request was cancelled are dropped if they have not started yet.
+
+    Args:
+        max_workers (int, optional): Number of worker threads. Defaults to 4.
+        max_queue_size (int, optional): Number of calls allowed to wait for a worker. Defaults to 64.
+        timeout (float, optional): Per call timeout in seconds, None means no timeout.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=64, timeout=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="SimpleServer")
+        self._max_pending = max_workers + max_queue_size
+        self._timeout = timeout
+        self._num_pending = 0
+        self._num_rejected = 0
+        self._num_timeout = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _):
+        with self._lock:
+            self._num_pending -= 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._num_pending >= self._max_pending:
+                self._num_rejected += 1
+                raise ServerBusyError(f"The server is busy, {self._num_pending} requests are pending.")
+            self._num_pending += 1
+        # The slot is released when the call finishes or is cancelled before running, not when the caller gives up
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._num_timeout += 1
+            future.cancel()
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "num_pending": self._num_pending,
+                "num_rejected": self._num_rejected,
+                "num_timeout": self._num_timeout,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -656,6 +656,31 @@ class UIETask(Task):
         return input_list
 
     def _single_stage_predict(self, inputs):
+        return self._batch_single_stage_predict([inputs])[0]
+
+    def _batch_single_stage_predict(self, inputs_list):
+        """
+        Predicts several groups of examples, e.g. the prompts of every schema node at the same depth, with one
+        inference pass. The long texts are still split per group, as when the groups are predicted one by one.
+        """
+        groups = [self._split_inputs(inputs) for inputs in inputs_list]
+        sentence_ids, probs = self._infer_short_inputs([x for short_inputs, _, _ in groups for x in short_inputs])
+
+        results = []
+        offset = 0
+        for short_inputs, short_input_texts, input_mapping in groups:
+            if len(short_inputs) == 0:
+                results.append([])
+                continue
+            end = offset + len(short_inputs)
+            group_results = self._convert_ids_to_results(short_inputs, sentence_ids[offset:end], probs[offset:end])
+            results.append(self._auto_joiner(group_results, short_input_texts, input_mapping))
+            offset = end
+        return results
+
+    def _split_inputs(self, inputs):
+        if len(inputs) == 0:
+            return [], [], {}
         input_texts = [d["text"] for d in inputs]
         prompts = [d["prompt"] for d in inputs]
 
@@ -692,6 +717,11 @@ class UIETask(Task):
             short_inputs = [
                 {"text": short_input_texts[i], "prompt": short_texts_prompts[i]} for i in range(len(short_input_texts))
             ]
+        return short_inputs, short_input_texts, input_mapping
+
+    def _infer_short_inputs(self, short_inputs):
+        if len(short_inputs) == 0:
+            return [], []
 
         def text_reader(inputs):
             for example in inputs:
@@ -941,8 +971,17 @@ class UIETask(Task):
                 assert len(bbox_list) == self._max_seq_len
                 yield tuple(return_list)
 
+        # Sort the text inputs by length so that every batch only needs to be padded to its own longest input
+        trim_padding = self._init_class not in ["UIEX"]
+        if trim_padding:
+            order = sorted(
+                range(len(short_inputs)), key=lambda i: len(short_inputs[i]["prompt"]) + len(short_inputs[i]["text"])
+            )
+        else:
+            order = list(range(len(short_inputs)))
+
         reader = doc_reader if self._init_class in ["UIEX"] else text_reader
-        infer_ds = load_dataset(reader, inputs=short_inputs, lazy=self._lazy_load)
+        infer_ds = load_dataset(reader, inputs=[short_inputs[i] for i in order], lazy=self._lazy_load)
         batch_sampler = paddle.io.BatchSampler(dataset=infer_ds, batch_size=self._batch_size, shuffle=False)
 
         infer_data_loader = paddle.io.DataLoader(
@@ -958,6 +997,15 @@ class UIETask(Task):
                 input_ids, pos_ids, offset_maps = batch
             else:
                 input_ids, token_type_ids, pos_ids, att_mask, offset_maps = batch
+            if trim_padding:
+                if self._init_class in ["UIEM"]:
+                    seq_len = int((input_ids != self._tokenizer.pad_token_id).astype("int64").sum(axis=-1).max())
+                    input_ids, pos_ids, offset_maps = [x[:, :seq_len] for x in (input_ids, pos_ids, offset_maps)]
+                else:
+                    seq_len = int(att_mask.sum(axis=-1).max())
+                    input_ids, token_type_ids, pos_ids, att_mask, offset_maps = [
+                        x[:, :seq_len] for x in (input_ids, token_type_ids, pos_ids, att_mask, offset_maps)
+                    ]
             if self._predictor_type == "paddle-inference":
                 if self._init_class in ["UIEX"]:
                     self.input_handles[0].copy_from_cpu(input_ids.numpy())
@@ -1010,9 +1058,13 @@ class UIETask(Task):
                 sentence_id, prob = get_id_and_prob(span_set, offset_map)
                 sentence_ids.append(sentence_id)
                 probs.append(prob)
-        results = self._convert_ids_to_results(short_inputs, sentence_ids, probs)
-        results = self._auto_joiner(results, short_input_texts, input_mapping)
-        return results
+
+        sorted_sentence_ids, sorted_probs = sentence_ids, probs
+        sentence_ids, probs = [None] * len(order), [None] * len(order)
+        for i, idx in enumerate(order):
+            sentence_ids[idx] = sorted_sentence_ids[i]
+            probs[idx] = sorted_probs[i]
+        return sentence_ids, probs
 
     def _auto_joiner(self, short_results, short_inputs, input_mapping):
         concat_results = []
@@ -1094,6 +1146,54 @@ class UIETask(Task):
                 _inputs.append({"text": d, "bbox": None, "image": None})
         return _inputs
 
+    def _build_node_examples(self, node, data):
+        """Builds the prompts of a schema node for every input, `input_map` maps an input to its examples."""
+        examples = []
+        input_map = {}
+        cnt = 0
+        idx = 0
+        if not node.prefix:
+            for one_data in data:
+                examples.append(
+                    {
+                        "text": one_data["text"],
+                        "bbox": one_data["bbox"],
+                        "image": one_data["image"],
+                        "prompt": dbc2sbc(node.name),
+                    }
+                )
+                input_map[cnt] = [idx]
+                idx += 1
+                cnt += 1
+        else:
+            for pre, one_data in zip(node.prefix, data):
+                if len(pre) == 0:
+                    input_map[cnt] = []
+                else:
+                    for p in pre:
+                        if self._is_en:
+                            if re.search(r"\[.*?\]$", node.name):
+                                prompt_prefix = node.name[: node.name.find("[", 1)].strip()
+                                cls_options = re.search(r"\[.*?\]$", node.name).group()
+                                # Sentiment classification of xxx [positive, negative]
+                                prompt = prompt_prefix + p + " " + cls_options
+                            else:
+                                prompt = node.name + p
+                        else:
+                            prompt = p + node.name
+                        examples.append(
+                            {
+                                "text": one_data["text"],
+                                "bbox": one_data["bbox"],
+                                "image": one_data["image"],
+                                "prompt": dbc2sbc(prompt),
+                            }
+                        )
+                    input_map[cnt] = [i + idx for i in range(len(pre))]
+                    idx += len(pre)
+                cnt += 1
+        return examples, input_map
+
     def _multi_stage_predict(self, data):
         """
         Traversal the schema tree and do multi-stage prediction.
@@ -1110,104 +1210,63 @@ class UIETask(Task):
         if len(data) < 1 or self._schema_tree is None:
             return results
 
-        # Copy to stay `self._schema_tree` unchanged
+        # Traverse the schema tree level by level, the nodes of a level only depend on their parents so that all
+        # of their prompts are predicted together. Copy to stay `self._schema_tree` unchanged
         schema_list = self._schema_tree.children[:]
         while len(schema_list) > 0:
-            node = schema_list.pop(0)
-            examples = []
-            input_map = {}
-            cnt = 0
-            idx = 0
-            if not node.prefix:
-                for one_data in data:
-                    examples.append(
-                        {
-                            "text": one_data["text"],
-                            "bbox": one_data["bbox"],
-                            "image": one_data["image"],
-                            "prompt": dbc2sbc(node.name),
-                        }
-                    )
-                    input_map[cnt] = [idx]
-                    idx += 1
-                    cnt += 1
-            else:
-                for pre, one_data in zip(node.prefix, data):
-                    if len(pre) == 0:
-                        input_map[cnt] = []
-                    else:
-                        for p in pre:
-                            if self._is_en:
-                                if re.search(r"\[.*?\]$", node.name):
-                                    prompt_prefix = node.name[: node.name.find("[", 1)].strip()
-                                    cls_options = re.search(r"\[.*?\]$", node.name).group()
-                                    # Sentiment classification of xxx [positive, negative]
-                                    prompt = prompt_prefix + p + " " + cls_options
-                                else:
-                                    prompt = node.name + p
+            node_examples = [self._build_node_examples(node, data) for node in schema_list]
+            node_results = self._batch_single_stage_predict([examples for examples, _ in node_examples])
+            next_schema_list = []
+            for node, (_, input_map), result_list in zip(schema_list, node_examples, node_results):
+                if not node.parent_relations:
+                    relations = [[] for i in range(len(data))]
+                    for k, v in input_map.items():
+                        for idx in v:
+                            if len(result_list[idx]) == 0:
+                                continue
+                            if node.name not in results[k].keys():
+                                results[k][node.name] = result_list[idx]
                             else:
-                                prompt = p + node.name
-                            examples.append(
-                                {
-                                    "text": one_data["text"],
-                                    "bbox": one_data["bbox"],
-                                    "image": one_data["image"],
-                                    "prompt": dbc2sbc(prompt),
-                                }
-                            )
-                        input_map[cnt] = [i + idx for i in range(len(pre))]
-                        idx += len(pre)
-                    cnt += 1
-            if len(examples) == 0:
-                result_list = []
-            else:
-                result_list = self._single_stage_predict(examples)
-
-            if not node.parent_relations:
-                relations = [[] for i in range(len(data))]
+                                results[k][node.name].extend(result_list[idx])
+                        if node.name in results[k].keys():
+                            relations[k].extend(results[k][node.name])
+                else:
+                    relations = node.parent_relations
+                    for k, v in input_map.items():
+                        for i in range(len(v)):
+                            if len(result_list[v[i]]) == 0:
+                                continue
+                            if "relations" not in relations[k][i].keys():
+                                relations[k][i]["relations"] = {node.name: result_list[v[i]]}
+                            elif node.name not in relations[k][i]["relations"].keys():
+                                relations[k][i]["relations"][node.name] = result_list[v[i]]
+                            else:
+                                relations[k][i]["relations"][node.name].extend(result_list[v[i]])
+                    new_relations = [[] for i in range(len(data))]
+                    for i in range(len(relations)):
+                        for j in range(len(relations[i])):
+                            if (
+                                "relations" in relations[i][j].keys()
+                                and node.name in relations[i][j]["relations"].keys()
+                            ):
+                                for k in range(len(relations[i][j]["relations"][node.name])):
+                                    new_relations[i].append(relations[i][j]["relations"][node.name][k])
+                    relations = new_relations
+
+                prefix = [[] for _ in range(len(data))]
                 for k, v in input_map.items():
                     for idx in v:
-                        if len(result_list[idx]) == 0:
-                            continue
-                        if node.name not in results[k].keys():
-                            results[k][node.name] = result_list[idx]
-                        else:
-                            results[k][node.name].extend(result_list[idx])
-                    if node.name in results[k].keys():
-                        relations[k].extend(results[k][node.name])
-            else:
-                relations = node.parent_relations
-                for k, v in input_map.items():
-                    for i in range(len(v)):
-                        if len(result_list[v[i]]) == 0:
-                            continue
-                        if "relations" not in relations[k][i].keys():
-                            relations[k][i]["relations"] = {node.name: result_list[v[i]]}
-                        elif node.name not in relations[k][i]["relations"].keys():
-                            relations[k][i]["relations"][node.name] = result_list[v[i]]
-                        else:
-                            relations[k][i]["relations"][node.name].extend(result_list[v[i]])
-                new_relations = [[] for i in range(len(data))]
-                for i in range(len(relations)):
-                    for j in range(len(relations[i])):
-                        if "relations" in relations[i][j].keys() and node.name in relations[i][j]["relations"].keys():
-                            for k in range(len(relations[i][j]["relations"][node.name])):
-                                new_relations[i].append(relations[i][j]["relations"][node.name][k])
-                relations = new_relations
-
-            prefix = [[] for _ in range(len(data))]
-            for k, v in input_map.items():
-                for idx in v:
-                    for i in range(len(result_list[idx])):
-                        if self._is_en:
-                            prefix[k].append(" of " + result_list[idx][i]["text"])
-                        else:
-                            prefix[k].append(result_list[idx][i]["text"] + "的")
+                        for i in range(len(result_list[idx])):
+                            if self._is_en:
+                                prefix[k].append(" of " + result_list[idx][i]["text"])
+                            else:
+                                prefix[k].append(result_list[idx][i]["text"] + "的")
 
-            for child in node.children:
-                child.prefix = prefix
-                child.parent_relations = relations
-                schema_list.append(child)
+                for child in node.children:
+                    child.prefix = prefix
+                    child.parent_relations = relations
+                    next_schema_list.append(child)
+            schema_list = next_schema_list
         results = self._add_bbox_info(results, data)
         return results
 
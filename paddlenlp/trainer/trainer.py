@@ -159,15 +159,16 @@ from .unified_checkpoint import UnifiedCheckpointHandler
 from .utils import reshard as reshard_util
 from .utils.async_save import AsyncSaver
 from .utils.helper import (  # nested_truncate,
+    NestedArrayAccumulator,
     broadcast_dataset_rank0_model,
     broadcast_dp_optimizer,
     broadcast_moe_optimizer,
     distributed_concat,
     distributed_file,
     distributed_isfile,
-    nested_concat,
     nested_detach,
     nested_numpify,
+    nested_reduce_logits,
     nested_truncate,
 )
 from .utils.sharding_io import ShardingIO
@@ -3185,14 +3186,14 @@ class Trainer:
             self._past = None
 
         # Initialize containers
-        # losses/preds/labels on GPU (accumulated for eval_accumulation_steps)
-        losses_host = None
-        preds_host = None
-        labels_host = None
-        # losses/preds/labels on CPU (final containers)
-        all_losses = None
-        all_preds = None
-        all_labels = None
+        # losses/preds/labels on GPU, one chunk per step (accumulated for eval_accumulation_steps)
+        losses_host = []
+        preds_host = []
+        labels_host = []
+        # losses/preds/labels on CPU (final containers), copied once into preallocated arrays after the loop
+        all_losses = NestedArrayAccumulator()
+        all_preds = NestedArrayAccumulator(memmap_dir=args.eval_accumulation_memmap_dir)
+        all_labels = NestedArrayAccumulator(memmap_dir=args.eval_accumulation_memmap_dir)
         # Will be useful when we have an iterable dataset so don't know its length.
 
         observed_num_examples = 0
@@ -3213,50 +3214,45 @@ class Trainer:
             if loss is not None:
                 # losses = self._nested_gather(loss.repeat(batch_size))
                 losses = self._nested_gather(paddle.tile(loss, repeat_times=[batch_size, 1]))
-                losses_host = losses if losses_host is None else paddle.concat((losses_host, losses), axis=0)
+                losses_host.append(losses)
             if labels is not None:
                 labels = self._pad_across_processes(labels)
                 labels = self._nested_gather(labels)
-                labels_host = labels if labels_host is None else nested_concat(labels_host, labels, padding_index=-100)
+                labels_host.append(labels)
             if logits is not None:
+                if args.eval_logits_reduction is not None:
+                    # Reduce before gathering, so that only the indices are communicated and kept
+                    logits = nested_reduce_logits(logits, args.eval_logits_reduction, topk=args.eval_logits_topk)
                 logits = self._pad_across_processes(logits)
                 logits = self._nested_gather(logits)
                 if self.preprocess_logits_for_metrics is not None:
                     logits = self.preprocess_logits_for_metrics(logits, labels)
-                preds_host = logits if preds_host is None else nested_concat(preds_host, logits, padding_index=-100)
+                preds_host.append(logits)
             self.control = self.callback_handler.on_prediction_step(args, self.state, self.control)
 
             # Gather all tensors and put them back on the CPU if we have done enough accumulation steps.
             if args.eval_accumulation_steps is not None and (step + 1) % args.eval_accumulation_steps == 0:
-                if losses_host is not None:
-                    losses = nested_numpify(losses_host)
-                    all_losses = losses if all_losses is None else np.concatenate((all_losses, losses), axis=0)
-                if preds_host is not None:
-                    logits = nested_numpify(preds_host)
-                    all_preds = logits if all_preds is None else nested_concat(all_preds, logits, padding_index=-100)
-
-                if labels_host is not None:
-                    labels = nested_numpify(labels_host)
-                    all_labels = (
-                        labels if all_labels is None else nested_concat(all_labels, labels, padding_index=-100)
-                    )
-
-                # Set back to None to begin a new accumulation
-                losses_host, preds_host, labels_host = None, None, None
+                for chunks, accumulator in [
+                    (losses_host, all_losses),
+                    (preds_host, all_preds),
+                    (labels_host, all_labels),
+                ]:
+                    for tensors in chunks:
+                        accumulator.add(nested_numpify(tensors))
+                    # Clear to begin a new accumulation
+                    chunks.clear()
 
             if max_eval_iters > 0 and step >= max_eval_iters - 1:
                 break
 
         # Gather all remaining tensors and put them back on the CPU
-        if losses_host is not None:
-            losses = nested_numpify(losses_host)
-            all_losses = losses if all_losses is None else np.concatenate((all_losses, losses), axis=0)
-        if preds_host is not None:
-            logits = nested_numpify(preds_host)
-            all_preds = logits if all_preds is None else nested_concat(all_preds, logits, padding_index=-100)
-        if labels_host is not None:
-            labels = nested_numpify(labels_host)
-            all_labels = labels if all_labels is None else nested_concat(all_labels, labels, padding_index=-100)
+        for chunks, accumulator in [(losses_host, all_losses), (preds_host, all_preds), (labels_host, all_labels)]:
+            for tensors in chunks:
+                accumulator.add(nested_numpify(tensors))
+            chunks.clear()
+        all_losses = all_losses.get_arrays()
+        all_preds = all_preds.get_arrays()
+        all_labels = all_labels.get_arrays()
 
         # Number of samples
         if num_samples is not None:
@@ -128,6 +128,15 @@ class TrainingArguments:
             Number of predictions steps to accumulate the output tensors for, before moving the results to the CPU. If
             left unset, the whole predictions are accumulated on GPU/TPU before being moved to the CPU (faster but
             requires more memory).
+        eval_accumulation_memmap_dir (`str`, *optional*):
+            If set, the predictions and labels moved to the CPU are spilled to memory-mapped files in this directory
+            instead of being kept in memory, which bounds the host memory of evaluation on large datasets.
+        eval_logits_reduction (`str`, *optional*):
+            Reduce the floating point logits to the indices of their greatest values on the last axis before they
+            are gathered across devices, `"argmax"` or `"topk"` (keeping `eval_logits_topk` indices). The
+            predictions seen by `preprocess_logits_for_metrics` and `compute_metrics` are then these indices.
+        eval_logits_topk (`int`, *optional*, defaults to 5):
+            Number of indices kept by `eval_logits_reduction="topk"`.
         learning_rate (`float`, *optional*, defaults to 5e-5):
             The initial learning rate for [`AdamW`] optimizer.
         weight_decay (`float`, *optional*, defaults to 0):
@@ -436,6 +445,18 @@ class TrainingArguments:
         default=None,
         metadata={"help": "Number of predictions steps to accumulate before moving the tensors to the CPU."},
     )
+    eval_accumulation_memmap_dir: Optional[str] = field(
+        default=None,
+        metadata={"help": "Directory to spill the predictions moved to the CPU to memory-mapped files."},
+    )
+    eval_logits_reduction: Optional[str] = field(
+        default=None,
+        metadata={"help": "Reduce the logits on device before gathering them during evaluation, `argmax` or `topk`."},
+    )
+    eval_logits_topk: int = field(
+        default=5,
+        metadata={"help": "Number of indices kept by `eval_logits_reduction=topk`."},
+    )
 
     learning_rate: float = field(default=5e-5, metadata={"help": "The initial learning rate for AdamW."})
     weight_decay: float = field(default=0.0, metadata={"help": "Weight decay for AdamW if we apply some."})
@@ -1072,6 +1093,11 @@ class TrainingArguments:
         if self.fp16_full_eval and self.bf16_full_eval:
             raise ValueError("At most one of fp16 and bf16 can be True for full eval, but not both")
 
+        if self.eval_logits_reduction not in [None, "argmax", "topk"]:
+            raise ValueError(
+                f"Unsupported eval_logits_reduction: {self.eval_logits_reduction}, expected `argmax` or `topk`."
+            )
+
         self.optim = OptimizerNames(self.optim)
         if self.optim == OptimizerNames.ADAMW_MINI and self.tensor_parallel_degree > 1:
             raise ValueError("AdamW Mini currently doesn't support tensor parallelism.")
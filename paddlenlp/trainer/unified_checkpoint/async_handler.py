@@ -13,6 +13,7 @@
 # limitations under the License.
 """Asynchronous unified checkpoint handler."""
 
+import collections
 import multiprocessing
 import os
 import time
@@ -25,7 +26,7 @@ from paddlenlp.transformers.utils import is_safetensors_available
 from paddlenlp.utils.log import logger
 
 if is_safetensors_available():
-    from safetensors.numpy import save_file as safe_save_file
+    from paddlenlp.utils.safetensors import fast_save_file
 
 from paddlenlp.quantization.unified_checkpoint_quantization import (
     quant_unified_optimizer,
@@ -40,229 +41,199 @@ from .shared_memory_utils import (
 __all__ = ["AsyncCheckpointHandler"]
 
 
+def _save_file_async_in_process(meta_dict, task_queue, free_events, metrics, state_dict_type, global_rank):
+    """
+    Writes the state dicts staged in shared memory buffers, in the order they were submitted. The process blocks on
+    `task_queue` while there is nothing to save and sets the event of a buffer once it is written to disk.
+    """
+    shms = {}
+    while True:
+        task = task_queue.get()
+        if task is None:  # stop process
+            break
+        buffer_id, shm_name, path, signal_path, ckpt_quant_stage = task
+        if shm_name not in shms:
+            shms[shm_name] = shared_memory.SharedMemory(name=shm_name)
+        logger.info(f"Start to async save {path}")
+        start_time = time.time()
+        state_dict = _read_state_dict_from_shm(meta_dict, shms[shm_name])  # numpy array
+        if state_dict_type == "optimizer_weight" and ckpt_quant_stage != "O0":
+            state_dict = quant_unified_optimizer(
+                state_dict, state_dict_type, ckpt_quant_stage, async_save=True
+            )  # ckpt quantization
+        fast_save_file(state_dict, path, {"format": "np"})
+        del state_dict
+        saved_signal_path = os.path.join(signal_path, f".{state_dict_type}.done.{global_rank}")
+        paddle.save(global_rank, saved_signal_path)
+        write_time = time.time() - start_time
+        num_bytes = os.path.getsize(path)
+        with metrics.get_lock():
+            metrics[0] += 1
+            metrics[1] += write_time
+            metrics[2] += num_bytes
+        logger.info(f"Async saved {path} in {write_time:.2f}s ({num_bytes / max(write_time, 1e-6) / 2**20:.2f} MB/s)")
+        free_events[buffer_id].set()
+    for shm in shms.values():
+        shm.close()
+
+
+class _AsyncWeightSaver:
+    """
+    Stages the state dicts of one weight type into shared memory and writes them in a subprocess.
+
+    A second buffer is only allocated when a new state dict is staged while the previous one is still being
+    written, so a checkpoint can be staged without waiting for the previous write to finish.
+    """
+
+    def __init__(self, state_dict_type, saved_state_dict_type, global_rank, num_buffers=2):
+        self.state_dict_type = state_dict_type
+        self._saved_state_dict_type = saved_state_dict_type
+        self._global_rank = global_rank
+        self._num_buffers = num_buffers
+        self._meta_dict = None
+        self._buffer_size = 0
+        self._buffers = []
+        self._free_events = [multiprocessing.Event() for _ in range(num_buffers)]
+        for event in self._free_events:
+            event.set()
+        # Buffers submitted to the subprocess, oldest first
+        self._in_flight = collections.deque()
+        self._task_queue = multiprocessing.Queue()
+        # number of saves, total write time, total written bytes
+        self._write_metrics = multiprocessing.Array("d", 3)
+        self._num_staged = 0
+        self._stage_time = 0.0
+        self._process = None
+
+    def _wait_for_buffer(self, buffer_id):
+        logged = False
+        while not self._free_events[buffer_id].wait(timeout=1.0):
+            if not self._process.is_alive():
+                raise RuntimeError(f"The process that saves {self.state_dict_type} has been killed unexpectedly.")
+            if not logged:
+                logger.info(f"Wait for the previous save process to finish saving {self.state_dict_type}")
+                logged = True
+
+    def _acquire_buffer(self):
+        while self._in_flight and self._free_events[self._in_flight[0]].is_set():
+            self._in_flight.popleft()
+        for buffer_id in range(len(self._buffers)):
+            if buffer_id not in self._in_flight:
+                return buffer_id
+        if len(self._buffers) < self._num_buffers:
+            self._buffers.append(shared_memory.SharedMemory(create=True, size=self._buffer_size))
+            return len(self._buffers) - 1
+        buffer_id = self._in_flight.popleft()
+        self._wait_for_buffer(buffer_id)
+        return buffer_id
+
+    def save(self, state_dict, path, signal_path, ckpt_quant_stage="O0"):
+        start_time = time.time()
+        if self._meta_dict is None:
+            self._meta_dict, self._buffer_size = create_meta_dict(state_dict)
+        if self._process is None:
+            self._process = multiprocessing.Process(
+                target=_save_file_async_in_process,
+                args=(
+                    self._meta_dict,
+                    self._task_queue,
+                    self._free_events,
+                    self._write_metrics,
+                    self._saved_state_dict_type,
+                    self._global_rank,
+                ),
+            )
+            self._process.start()
+
+        buffer_id = self._acquire_buffer()
+        self._free_events[buffer_id].clear()
+        _traverse_copy_to_shm(state_dict, self._meta_dict, self._buffers[buffer_id].buf)
+        self._in_flight.append(buffer_id)
+        self._task_queue.put((buffer_id, self._buffers[buffer_id].name, path, signal_path, ckpt_quant_stage))
+        self._num_staged += 1
+        self._stage_time += time.time() - start_time
+
+    def wait(self):
+        """Blocks until every staged state dict is written."""
+        while self._in_flight:
+            self._wait_for_buffer(self._in_flight.popleft())
+
+    def metrics(self):
+        with self._write_metrics.get_lock():
+            num_saves, write_time, num_bytes = self._write_metrics[:]
+        return {
+            "num_staged": self._num_staged,
+            "stage_time": self._stage_time,
+            "num_saves": int(num_saves),
+            "write_time": write_time,
+            "bytes": int(num_bytes),
+            "bytes_per_second": num_bytes / write_time if write_time > 0 else 0.0,
+        }
+
+    def close(self):
+        self.wait()
+        if self._process is not None:
+            self._task_queue.put(None)
+            self._process.join()
+            self._process = None
+        for shm in self._buffers:
+            shm.close()
+            shm.unlink()
+        self._buffers = []
+
+
 class AsyncCheckpointHandler:
     def __init__(self, args):
         # Mainly for asynchronous saving.
         self.args = args
         self.global_rank = paddle.distributed.get_rank() if paddle.distributed.get_world_size() > 1 else -1
+        self._savers = {}
 
-        self._shm_model_weight = None
-        self._shm_master_weight = None
-        self._shm_optimizer_weight = None
-        self._meta_dict_model = None
-        self._meta_dict_master_weight = None
-        self._meta_dict_optim = None
-        self._process_model_weight = None
-        self._process_master_weight = None
-        self._process_optimizer_weight = None
-        self._lock = None
-        self._shared_save_model_flag = None
-        self._shared_save_master_weight_flag = None
-        self._shared_save_optimizer_flag = None
-
-        if "async_save" in self.args.unified_checkpoint_config:
-            self._lock = multiprocessing.Lock()
-            self._shared_save_model_path = multiprocessing.Array("c", 100000)
-            self._shared_save_model_signal_path = multiprocessing.Array("c", 100000)
-            self._shared_save_master_weight_path = multiprocessing.Array("c", 100000)
-            self._shared_save_master_weight_signal_path = multiprocessing.Array("c", 100000)
-            self._shared_save_optimizer_path = multiprocessing.Array("c", 100000)
-            self._shared_save_optimizer_signal_path = multiprocessing.Array("c", 100000)
-            self._shared_save_model_flag = multiprocessing.Array("i", 1)
-            self._shared_save_master_weight_flag = multiprocessing.Array("i", 1)
-            self._shared_save_optimizer_flag = multiprocessing.Array("i", 1)
+    def _get_saver(self, state_dict_type):
+        if state_dict_type not in self._savers:
+            saved_state_dict_type = state_dict_type
+            if state_dict_type == "master_weight" and "skip_save_model_weight" in self.args.unified_checkpoint_config:
+                saved_state_dict_type = "model_weight"
+            self._savers[state_dict_type] = _AsyncWeightSaver(state_dict_type, saved_state_dict_type, self.global_rank)
+        return self._savers[state_dict_type]
 
     def _file_save_async_or_sync(
         self, state_dict, path, signal_path=None, is_sync=True, state_dict_type="model_weight", ckpt_quant_stage="O0"
     ):
         if is_sync:
-            for k in list(state_dict.keys()):
-                if isinstance(state_dict[k], paddle.Tensor):
-                    state_dict[k] = state_dict.pop(k).cpu().numpy()
-
             if state_dict_type == "optimizer_weight" and ckpt_quant_stage != "O0":
+                for k in list(state_dict.keys()):
+                    if isinstance(state_dict[k], paddle.Tensor):
+                        state_dict[k] = state_dict.pop(k).cpu().numpy()
                 state_dict = quant_unified_optimizer(state_dict, state_dict_type, ckpt_quant_stage)
-            safe_save_file(state_dict, path, metadata={"format": "np"})
+            # paddle tensors are copied to host chunk by chunk while being written
+            fast_save_file(state_dict, path, metadata={"format": "np"})
         else:
             if len(state_dict.keys()) == 0:
                 saved_signal_path = os.path.join(signal_path, f".{state_dict_type}.done.{self.global_rank}")
                 paddle.save(self.global_rank, saved_signal_path)
                 return
 
-            if state_dict_type == "model_weight":
-                if self._shm_model_weight is None:
-                    self._meta_dict_model, buffer_size = create_meta_dict(state_dict)
-                    self._shm_model_weight = shared_memory.SharedMemory(create=True, size=buffer_size)
-                shm_state_dict = self._shm_model_weight
-                meta_dict = self._meta_dict_model
-                shared_save_flag = self._shared_save_model_flag
-                shared_save_path = self._shared_save_model_path
-                shared_save_signal_path = self._shared_save_model_signal_path
-                if self._process_model_weight is None:
-                    self._process_model_weight = multiprocessing.Process(
-                        target=self._save_file_async_in_process,
-                        args=(
-                            meta_dict,
-                            self._shm_model_weight.name,
-                            self._shared_save_model_flag,
-                            self._shared_save_model_path,
-                            self._shared_save_model_signal_path,
-                            self._lock,
-                            state_dict_type,
-                            self.global_rank,
-                        ),
-                    )
-                    self._process_model_weight.start()
-                process = self._process_model_weight
-            elif state_dict_type == "master_weight":
-                if self._shm_master_weight is None:
-                    self._meta_dict_master_weight, buffer_size = create_meta_dict(state_dict)
-                    self._shm_master_weight = shared_memory.SharedMemory(create=True, size=buffer_size)
-                shm_state_dict = self._shm_master_weight
-                meta_dict = self._meta_dict_master_weight
-                shared_save_flag = self._shared_save_master_weight_flag
-                shared_save_path = self._shared_save_master_weight_path
-                shared_save_signal_path = self._shared_save_master_weight_signal_path
-                if self._process_master_weight is None:
-                    self._process_master_weight = multiprocessing.Process(
-                        target=self._save_file_async_in_process,
-                        args=(
-                            meta_dict,
-                            self._shm_master_weight.name,
-                            self._shared_save_master_weight_flag,
-                            self._shared_save_master_weight_path,
-                            self._shared_save_master_weight_signal_path,
-                            self._lock,
-                            "model_weight"
-                            if "skip_save_model_weight" in self.args.unified_checkpoint_config
-                            else state_dict_type,
-                            self.global_rank,
-                        ),
-                    )
-                    self._process_master_weight.start()
-                process = self._process_master_weight
-            elif state_dict_type == "optimizer_weight":
-                if self._shm_optimizer_weight is None:
-                    self._meta_dict_optim, buffer_size = create_meta_dict(state_dict)
-                    self._shm_optimizer_weight = shared_memory.SharedMemory(create=True, size=buffer_size)
-                shm_state_dict = self._shm_optimizer_weight
-                meta_dict = self._meta_dict_optim
-                shared_save_flag = self._shared_save_optimizer_flag
-                shared_save_path = self._shared_save_optimizer_path
-                shared_save_signal_path = self._shared_save_optimizer_signal_path
-                if self._process_optimizer_weight is None:
-                    self._process_optimizer_weight = multiprocessing.Process(
-                        target=self._save_file_async_in_process,
-                        args=(
-                            meta_dict,
-                            self._shm_optimizer_weight.name,
-                            self._shared_save_optimizer_flag,
-                            self._shared_save_optimizer_path,
-                            self._shared_save_optimizer_signal_path,
-                            self._lock,
-                            state_dict_type,
-                            self.global_rank,
-                            ckpt_quant_stage,
-                        ),
-                    )
-                    self._process_optimizer_weight.start()
-                process = self._process_optimizer_weight
-
-            while True:  # wait until no process is saving.
-                flag_value = shared_save_flag[0]
-                if flag_value == 0:
-                    break
-                if not process.is_alive():
-                    raise RuntimeError(f"The process that saves {state_dict_type} has been killed unexpectedly.")
-                time.sleep(0.5)
-                logger.info(f"Wait for the previous save process to finish saving {state_dict_type}")
-            # only save model weight or save master weight, we enter this loop.
-            self._reset_and_update(shared_save_path, path)
-            self._reset_and_update(shared_save_signal_path, signal_path)
-            _traverse_copy_to_shm(state_dict, meta_dict, shm_state_dict.buf)
-            with self._lock:
-                shared_save_flag[0] = 1
-
-    def _save_file_async_in_process(
-        self,
-        meta_dict,
-        shm_name,
-        shared_save_flag,
-        shared_save_path,
-        shared_save_signal_path,
-        lock,
-        state_dict_type,
-        global_rank,
-        ckpt_quant_stage="O0",
-    ):
-        shm = shared_memory.SharedMemory(name=shm_name)
-        while True:
-            flag_value = shared_save_flag[0]  # if process uses `spawn`, cannot read this value.
-            if flag_value == -1:  # stop process
-                break
-            if flag_value == 0:  # nothing to save
-                continue
-            if flag_value == 1:  # need to save
-                path = shared_save_path[:].decode("utf-8").rstrip("\x00")
-                signal_path = shared_save_signal_path[:].decode("utf-8").rstrip("\x00")
-                logger.info(f"Start to async save {path}")
-                state_dict = _read_state_dict_from_shm(meta_dict, shm)  # numpy array
-                if state_dict_type == "optimizer_weight" and ckpt_quant_stage != "O0":
-                    state_dict = quant_unified_optimizer(
-                        state_dict, state_dict_type, ckpt_quant_stage, async_save=True
-                    )  # ckpt quantization
-                safe_save_file(state_dict, path, {"format": "np"})
-                del state_dict
-                saved_signal_path = os.path.join(signal_path, f".{state_dict_type}.done.{global_rank}")
-                paddle.save(global_rank, saved_signal_path)
-                with lock:
-                    shared_save_flag[0] = 0
-            time.sleep(0.5)
-        shm.close()
+            if state_dict_type not in ["model_weight", "master_weight", "optimizer_weight"]:
+                raise ValueError(f"Unsupported state_dict_type {state_dict_type} for async save.")
+            self._get_saver(state_dict_type).save(state_dict, path, signal_path, ckpt_quant_stage)
 
-    def _reset_and_update(self, shared_array, new_value):
-        # clear array
-        for i in range(len(shared_array)):
-            shared_array[i] = b"\0"
-        # update array
-        encoded_value = new_value.encode("utf-8")
-        shared_array[: len(encoded_value)] = encoded_value
+    def get_async_save_metrics(self):
+        """Per weight type staging and writing statistics of the asynchronous saves."""
+        return {state_dict_type: saver.metrics() for state_dict_type, saver in self._savers.items()}
 
     def unlink_shared_memory(self):
         if not ("async_save" in self.args.unified_checkpoint_config):
             return
 
-        if self._shared_save_model_flag is not None:
-            while self._shared_save_model_flag[0] > 0:  # async process is saving
-                if not self._process_model_weight.is_alive():
-                    raise RuntimeError("The process that saves model_weight has been killed unexpectedly.")
-                time.sleep(0.5)
-            self._shared_save_model_flag[0] = -1
-        if self._shared_save_master_weight_flag is not None:
-            while self._shared_save_master_weight_flag[0] > 0:
-                if not self._process_master_weight.is_alive():
-                    raise RuntimeError("The process that saves master_weight has been killed unexpectedly.")
-                time.sleep(0.5)
-            self._shared_save_master_weight_flag[0] = -1
-        if self._shared_save_optimizer_flag is not None:
-            while self._shared_save_optimizer_flag[0] > 0:
-                if not self._process_optimizer_weight.is_alive():
-                    raise RuntimeError("The process that saves optimizer_weight has been killed unexpectedly.")
-                time.sleep(0.5)
-            self._shared_save_optimizer_flag[0] = -1
-
-        if self._shm_model_weight is not None:
-            self._shm_model_weight.close()
-            self._shm_model_weight.unlink()
-            self._shm_model_weight = None
-        if self._shm_master_weight is not None:
-            self._shm_master_weight.close()
-            self._shm_master_weight.unlink()
-            self._shm_master_weight = None
-        if self._shm_optimizer_weight is not None:
-            self._shm_optimizer_weight.close()
-            self._shm_optimizer_weight.unlink()
-            self._shm_optimizer_weight = None
+        for state_dict_type, saver in self._savers.items():
+            saver.close()
+            metrics = saver.metrics()
+            logger.info(
+                f"Async saved {state_dict_type} {metrics['num_saves']} times, staging took {metrics['stage_time']:.2f}s, "
+                f"writing took {metrics['write_time']:.2f}s ({metrics['bytes_per_second'] / 2**20:.2f} MB/s)"
+            )
+        self._savers = {}
 
         if paddle.distributed.get_world_size() > 1:
             dist.barrier()
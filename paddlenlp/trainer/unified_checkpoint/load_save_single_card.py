@@ -39,7 +39,7 @@ from paddlenlp.utils.log import logger
 from paddlenlp.utils.nested import nested_copy
 
 if is_safetensors_available():
-    from safetensors.numpy import save_file as safe_save_file
+    from paddlenlp.utils.safetensors import fast_save_file
 
 from .utils import (
     FP32_MASTER,
@@ -58,10 +58,7 @@ __all__ = [
 
 
 def save_file_sync(state_dict, path):
-    for k in list(state_dict.keys()):
-        if isinstance(state_dict[k], paddle.Tensor):
-            state_dict[k] = state_dict.pop(k).cpu().numpy()
-    safe_save_file(state_dict, path, metadata={"format": "np"})
+    fast_save_file(state_dict, path, metadata={"format": "np"})
 
 
 def save_single_card_checkpoint(model_to_save, output_dir):
@@ -17,6 +17,7 @@
 #  https://github.com/huggingface/transformers/blob/main/src/transformers
 
 import os
+import tempfile
 from typing import Any, Optional
 
 import numpy as np
@@ -40,6 +41,8 @@ __all__ = [
     "nested_detach",
     "nested_numpify",
     "nested_truncate",
+    "nested_reduce_logits",
+    "NestedArrayAccumulator",
 ]
 
 
@@ -137,6 +140,149 @@ def nested_truncate(tensors, limit):
     return tensors[:limit]
 
 
+def nested_reduce_logits(tensors, reduction, topk=1):
+    """
+    Reduce the floating point logits in `tensors` (even if it's a nested list/tuple of tensors) to the indices of
+    their greatest values on the last axis, `argmax` keeping one index per position and `topk` keeping `topk` of
+    them. Other tensors, like integer labels, are returned unchanged.
+    """
+    if isinstance(tensors, (list, tuple)):
+        return type(tensors)(nested_reduce_logits(t, reduction, topk=topk) for t in tensors)
+    if not isinstance(tensors, paddle.Tensor) or not paddle.is_floating_point(tensors):
+        return tensors
+    if reduction == "argmax":
+        return paddle.argmax(tensors, axis=-1)
+    elif reduction == "topk":
+        return paddle.topk(tensors, k=topk, axis=-1)[1]
+    else:
+        raise ValueError(f"Unsupported logits reduction: {reduction}, expected `argmax` or `topk`.")
+
+
+class NestedArrayAccumulator:
+    """
+    Accumulates nested list/tuples of numpy arrays on the first dim, padding them on the second with
+    `padding_index` if needed, like repeated calls of `nested_concat` but with a linear copy cost: the added arrays
+    are kept as chunks and copied once into a preallocated array by `get_arrays`.
+
+    Args:
+        padding_index (int, optional): The value used to pad the second dim. Defaults to -100.
+        memmap_dir (str, optional): If set, the chunks are spilled to files in a temporary directory under
+            `memmap_dir` as soon as they are added, and `get_arrays` returns memory-mapped arrays, so that the host
+            memory does not grow with the number of accumulated examples. Defaults to None.
+    """
+
+    def __init__(self, padding_index=-100, memmap_dir=None):
+        self.padding_index = padding_index
+        self.memmap_dir = memmap_dir
+        self._tmp_dir = None
+        # structure of the nested arrays, with the index of its leaf in place of every array
+        self._structure = None
+        # chunks (or (offset, shape, dtype) of the spilled chunks) and spill file of every leaf
+        self._chunks = []
+        self._files = []
+
+    def add(self, arrays):
+        """Add the nested `arrays` after the ones already accumulated."""
+        leaves = []
+        structure = self._flatten(arrays, leaves)
+        if self._structure is None:
+            self._structure = structure
+            self._chunks = [[] for _ in leaves]
+            if self.memmap_dir is not None:
+                os.makedirs(self.memmap_dir, exist_ok=True)
+                self._tmp_dir = tempfile.mkdtemp(prefix="eval_predictions_", dir=self.memmap_dir)
+                self._files = [open(os.path.join(self._tmp_dir, f"chunks_{i}.bin"), "wb") for i in range(len(leaves))]
+        elif structure != self._structure:
+            raise TypeError(
+                f"Expected the arrays to have the same structure as the accumulated ones, but found {structure} "
+                f"and {self._structure}."
+            )
+        for i, array in enumerate(leaves):
+            if array.ndim == 0:
+                array = array.reshape([-1])
+            if self.memmap_dir is None:
+                self._chunks[i].append(array)
+            else:
+                array = np.ascontiguousarray(array)
+                self._chunks[i].append((self._files[i].tell(), array.shape, array.dtype))
+                self._files[i].write(array.tobytes())
+
+    def get_arrays(self):
+        """Returns the accumulated nested arrays, or None if nothing has been added."""
+        if self._structure is None:
+            return None
+        for f in self._files:
+            f.close()
+        structure = self._structure
+        leaves = [self._concat_leaf(i) for i in range(len(self._chunks))]
+        if self._tmp_dir is not None:
+            # The memory-mapped arrays stay valid once their files are removed (except on Windows).
+            for path in os.listdir(self._tmp_dir):
+                try:
+                    os.remove(os.path.join(self._tmp_dir, path))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(self._tmp_dir)
+            except OSError:
+                pass
+        self._structure, self._chunks, self._files, self._tmp_dir = None, [], [], None
+        return self._unflatten(structure, leaves)
+
+    def _flatten(self, arrays, leaves):
+        if isinstance(arrays, (list, tuple)):
+            return type(arrays), tuple(self._flatten(a, leaves) for a in arrays)
+        if not isinstance(arrays, np.ndarray):
+            raise TypeError(f"Unsupported type for concatenation: got {type(arrays)}")
+        leaves.append(arrays)
+        return len(leaves) - 1
+
+    def _unflatten(self, structure, leaves):
+        if isinstance(structure, int):
+            return leaves[structure]
+        container_type, children = structure
+        return container_type(self._unflatten(child, leaves) for child in children)
+
+    def _concat_leaf(self, index):
+        chunks = self._chunks[index]
+        spilled = self.memmap_dir is not None
+        shapes = [chunk[1] for chunk in chunks] if spilled else [chunk.shape for chunk in chunks]
+        dtype = chunks[0][2] if spilled else chunks[0].dtype
+        num_rows = sum(shape[0] for shape in shapes)
+        shape = (num_rows,) + tuple(shapes[0][1:])
+        needs_padding = len(shape) > 1 and any(s[1] != shape[1] for s in shapes)
+        if needs_padding:
+            shape = (num_rows, max(s[1] for s in shapes)) + shape[2:]
+
+        if spilled:
+            result = np.lib.format.open_memmap(
+                os.path.join(self._tmp_dir, f"predictions_{index}.npy"), mode="w+", dtype=dtype, shape=shape
+            )
+            chunk_file = os.path.join(self._tmp_dir, f"chunks_{index}.bin")
+        else:
+            result = np.empty(shape, dtype=dtype)
+        if needs_padding:
+            result.fill(self.padding_index)
+
+        row = 0
+        for chunk, chunk_shape in zip(chunks, shapes):
+            if spilled:
+                offset, _, chunk_dtype = chunk
+                if 0 in chunk_shape:
+                    # np.memmap cannot map an empty chunk, its rows are still counted below
+                    chunk = np.empty(chunk_shape, dtype=chunk_dtype)
+                else:
+                    chunk = np.memmap(chunk_file, dtype=chunk_dtype, mode="r", offset=offset, shape=chunk_shape)
+            if needs_padding:
+                result[row : row + chunk_shape[0], : chunk_shape[1]] = chunk
+            else:
+                result[row : row + chunk_shape[0]] = chunk
+            row += chunk_shape[0]
+        if spilled:
+            result.flush()
+        return result
+
+
 def distributed_isfile(filename):
     """Check all machine nodes. return False if no machine have such file."""
     trainers_num = int(os.getenv("PADDLE_TRAINERS_NUM", "1"))
@@ -21,6 +21,7 @@ from functools import lru_cache
 from paddle.utils import try_import
 
 from .. import AddedToken, PretrainedTokenizer
+from ..tokenizer_utils import LRUCache
 
 __all__ = ["BartTokenizer"]
 
@@ -201,7 +202,7 @@ class BartTokenizer(PretrainedTokenizer):
 
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         re = try_import("regex")
         self.pat = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""")
 
@@ -270,8 +271,9 @@ class BartTokenizer(PretrainedTokenizer):
         return self.convert_tokens_to_ids(self.eol_token)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
@@ -17,6 +17,8 @@ import os
 import unicodedata
 
 from ..tokenizer_utils import (
+    WORD_CACHE_SIZE,
+    LRUCache,
     PretrainedTokenizer,
     _is_control,
     _is_punctuation,
@@ -210,12 +212,17 @@ class WordpieceTokenizer(object):
             If a word's length is more than
             max_input_chars_per_word, it will be dealt as unknown word.
             Defaults to 100.
+        cache_size (int, optional):
+            The number of words whose word pieces are kept in a LRU cache,
+            0 disables the cache.
+            Defaults to `WORD_CACHE_SIZE`.
     """
 
-    def __init__(self, vocab, unk_token, max_input_chars_per_word=100):
+    def __init__(self, vocab, unk_token, max_input_chars_per_word=100, cache_size=WORD_CACHE_SIZE):
         self.vocab = vocab
         self.unk_token = unk_token
         self.max_input_chars_per_word = max_input_chars_per_word
+        self.cache = LRUCache(cache_size)
 
     def tokenize(self, text):
         """
@@ -249,9 +256,15 @@ class WordpieceTokenizer(object):
 
         output_tokens = []
         for token in whitespace_tokenize(text):
+            cached = self.cache.get(token)
+            if cached is not None:
+                output_tokens.extend(cached)
+                continue
+
             chars = list(token)
             if len(chars) > self.max_input_chars_per_word:
                 output_tokens.append(self.unk_token)
+                self.cache[token] = (self.unk_token,)
                 continue
 
             is_bad = False
@@ -275,9 +288,9 @@ class WordpieceTokenizer(object):
                 start = end
 
             if is_bad:
-                output_tokens.append(self.unk_token)
-            else:
-                output_tokens.extend(sub_tokens)
+                sub_tokens = [self.unk_token]
+            output_tokens.extend(sub_tokens)
+            self.cache[token] = tuple(sub_tokens)
         return output_tokens
 
 
@@ -23,6 +23,7 @@ from paddle.utils import try_import
 
 from paddlenlp.transformers import AddedToken, PretrainedTokenizer
 
+from ..tokenizer_utils import LRUCache
 from .configuration import (
     BLOOM_PRETRAINED_MODEL_ARCHIVE_LIST,
     _construct_resource_file_url,
@@ -197,7 +198,7 @@ class BloomTokenizer(PretrainedTokenizer):
 
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         self.add_prefix_space = add_prefix_space
         self.add_bos_token = add_bos_token
 
@@ -223,8 +224,9 @@ class BloomTokenizer(PretrainedTokenizer):
         return self.convert_tokens_to_ids(self.eol_token)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
@@ -20,6 +20,7 @@ from functools import lru_cache
 import regex as re
 
 from .. import AddedToken, PretrainedTokenizer
+from ..tokenizer_utils import LRUCache
 
 __all__ = [
     "DebertaTokenizer",
@@ -175,7 +176,7 @@ class DebertaTokenizer(PretrainedTokenizer):
             bpe_data = f.read().split("\n")[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         self.add_prefix_space = add_prefix_space
         self.add_bos_token = add_bos_token
 
@@ -194,8 +195,9 @@ class DebertaTokenizer(PretrainedTokenizer):
         return len(self.encoder)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
@@ -28,6 +28,7 @@ import warnings
 from itertools import repeat
 
 from ..roberta.tokenizer import RobertaBPETokenizer
+from ..tokenizer_utils import LRUCache
 
 try:
     from functools import lru_cache
@@ -188,7 +189,7 @@ class LukeTokenizer(RobertaBPETokenizer):
             bpe_merges = merges_handle.read().split("\n")[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_merges]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         self.added_tokens_encoder = {}
         self.added_tokens_decoder = {}
 
@@ -552,8 +553,9 @@ class LukeTokenizer(RobertaBPETokenizer):
         return tokenized_text
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
@@ -22,6 +22,7 @@ from functools import lru_cache
 from paddle.utils import try_import
 
 from .. import AddedToken, PretrainedTokenizer
+from ..tokenizer_utils import LRUCache
 
 __all__ = ["MambaTokenizer"]
 
@@ -134,7 +135,7 @@ class MambaTokenizer(PretrainedTokenizer):
 
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         self.add_prefix_space = add_prefix_space
         self.add_bos_token = add_bos_token
         self.add_eos_token = add_eos_token
@@ -162,8 +163,9 @@ class MambaTokenizer(PretrainedTokenizer):
         return len(dict(self.encoder, **self.added_tokens_encoder))
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
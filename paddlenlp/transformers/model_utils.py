@@ -23,6 +23,7 @@ import os
 import re
 import sys
 import tempfile
+import time
 import warnings
 from contextlib import contextmanager
 from functools import partial
@@ -116,9 +117,8 @@ def unwrap_optimizer(optimizer, optimizer_instances=()):
 
 
 if is_safetensors_available():
-    from safetensors.numpy import save_file as safe_save_file
-
     from paddlenlp.utils.safetensors import fast_load_file as safe_load_file
+    from paddlenlp.utils.safetensors import fast_save_files
 
     if sys.platform.startswith("win"):
         from safetensors import safe_open
@@ -351,7 +351,12 @@ def _split_keys_evenly(keys: list, n: int) -> list:
 
 
 def _load_part_state_dict(
-    keys, checkpoint_file: Union[str, os.PathLike], tensor_parallel_split_mapping, fliter_dict_keys, device
+    keys,
+    checkpoint_file: Union[str, os.PathLike],
+    tensor_parallel_split_mapping,
+    fliter_dict_keys,
+    device,
+    safe_file=None,
 ):
     """load part state dict from checkpoint file.
 
@@ -360,6 +365,7 @@ def _load_part_state_dict(
         checkpoint_file (str): the path of checkpoint file
         tensor_parallel_split_mapping (dict): mapping from key to function
         fliter_dict_keys (list): filter keys in state dict
+        safe_file (optional): an opened handle of `checkpoint_file` shared with the other parts, opens the file if None
 
     Returns:
         part_state_dict (dict): the part state dict
@@ -367,7 +373,12 @@ def _load_part_state_dict(
     """
     part_state_dict = {}
     scale_dict = {}
-    with safe_open(checkpoint_file, framework="np") as f:
+    if safe_file is None:
+        safe_file = safe_open(checkpoint_file, framework="np")
+        context = safe_file
+    else:
+        context = contextlib.nullcontext(safe_file)
+    with context as f:
         for key in keys:
             # 1. non-merge ckpt loading dont have filter key.
             # 2. merge ckpt will skip quant scale by `fliter_dict_keys`
@@ -405,24 +416,29 @@ def _load_part_state_dict(
     return part_state_dict, scale_dict
 
 
-def load_state_dict(
+def _get_load_state_dict_thread_num():
+    return int(os.environ.get("LOAD_STATE_DICT_THREAD_NUM", "1"))
+
+
+def _read_safetensors_state_dict(
     checkpoint_file: Union[str, os.PathLike],
-    tensor_parallel_split_mapping=None,
-    fliter_dict_keys=None,
-    device="cpu",
-    ckpt_quant_stage="O0",
+    tensor_parallel_split_mapping,
+    fliter_dict_keys,
+    device,
+    executor=None,
+    thread_num=1,
 ):
     """
-    Reads a PaddlePaddle checkpoint file, returning properly formatted errors if they arise.
-    """
-
-    if tensor_parallel_split_mapping is None:
-        tensor_parallel_split_mapping = {}
+    Reads the tensors of a safetensors checkpoint. The file is opened once and the handle is shared by all the
+    reads; with an `executor`, the keys are split into `thread_num` groups read concurrently on it.
 
-    if checkpoint_file.endswith(".safetensors") and is_safetensors_available():
+    Returns:
+        tuple: the state dict of numpy arrays (or expected-place tensors if `device` is "expected") and the dict of
+            quantization scales.
+    """
+    with safe_open(checkpoint_file, framework="np") as f:
         # Check format of the archive
-        with safe_open(checkpoint_file, framework="np") as f:
-            metadata = f.metadata()
+        metadata = f.metadata()
         if metadata is None:
             metadata = {"format": "np"}
 
@@ -433,57 +449,156 @@ def load_state_dict(
             )
         if metadata.get("format", "np") == "pd":
             raise ValueError("Currently unsupport paddle weights file, use numpy instead.")
-        if metadata.get("format", "np") == "np":
-            thread_num = int(os.environ.get("LOAD_STATE_DICT_THREAD_NUM", "1"))
-            if thread_num > 1:
-                logger.info(f"Set loading state_dict thread num to {thread_num}")
-            state_dict, scale_dict = {}, {}
-            if thread_num <= 1:
-                with safe_open(checkpoint_file, framework="np") as f:
-                    state_dict, scale_dict = _load_part_state_dict(
-                        list(f.keys()),
-                        checkpoint_file,
-                        tensor_parallel_split_mapping,
-                        fliter_dict_keys,
-                        device,
-                    )
-            else:
-                # Load state dict in multi-thread to speed up loading
-                with safe_open(checkpoint_file, framework="np") as f:
-                    keys_groups = _split_keys_evenly(list(f.keys()), thread_num)
-                with concurrent.futures.ThreadPoolExecutor(max_workers=thread_num) as executor:
-                    future_to_key = {
-                        executor.submit(
-                            _load_part_state_dict,
-                            keys,
-                            checkpoint_file,
-                            tensor_parallel_split_mapping,
-                            fliter_dict_keys,
-                            device,
-                        ): keys
-                        for keys in keys_groups
-                    }
-                    for future in concurrent.futures.as_completed(future_to_key):
-                        res_state_dict, res_scale_dict = future.result()
-                        state_dict.update(res_state_dict)
-                        scale_dict.update(res_scale_dict)
-
-            if device == "cpu":
-                for k in list(state_dict.keys()):
-                    with device_guard():
-                        state_dict[k] = paddle.Tensor(state_dict.pop(k), zero_copy=True)
 
-            if len(scale_dict) != 0:
-                if ckpt_quant_stage == "O0":
-                    raise ValueError('optimizer weight has quantization scales but `ckpt_quant_stage` is set to "O0"')
-                state_dict = dequant_unified_optimizer(state_dict, ckpt_quant_stage, scale_dict, use_pd=True)
+        keys = list(f.keys())
+        if executor is None or thread_num <= 1:
+            return _load_part_state_dict(
+                keys, checkpoint_file, tensor_parallel_split_mapping, fliter_dict_keys, device, safe_file=f
+            )
+
+        state_dict, scale_dict = {}, {}
+        futures = [
+            executor.submit(
+                _load_part_state_dict,
+                keys_group,
+                checkpoint_file,
+                tensor_parallel_split_mapping,
+                fliter_dict_keys,
+                device,
+                safe_file=f,
+            )
+            for keys_group in _split_keys_evenly(keys, thread_num)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            res_state_dict, res_scale_dict = future.result()
+            state_dict.update(res_state_dict)
+            scale_dict.update(res_scale_dict)
+    return state_dict, scale_dict
+
+
+def _convert_state_dict_to_tensors(state_dict, scale_dict, device="cpu", ckpt_quant_stage="O0"):
+    if device == "cpu":
+        for k in list(state_dict.keys()):
+            with device_guard():
+                state_dict[k] = paddle.Tensor(state_dict.pop(k), zero_copy=True)
+
+    if len(scale_dict) != 0:
+        if ckpt_quant_stage == "O0":
+            raise ValueError('optimizer weight has quantization scales but `ckpt_quant_stage` is set to "O0"')
+        state_dict = dequant_unified_optimizer(state_dict, ckpt_quant_stage, scale_dict, use_pd=True)
+    return state_dict
 
-            return state_dict
+
+def load_state_dict(
+    checkpoint_file: Union[str, os.PathLike],
+    tensor_parallel_split_mapping=None,
+    fliter_dict_keys=None,
+    device="cpu",
+    ckpt_quant_stage="O0",
+    executor=None,
+):
+    """
+    Reads a PaddlePaddle checkpoint file, returning properly formatted errors if they arise.
+
+    Safetensors files are read with `LOAD_STATE_DICT_THREAD_NUM` threads, on `executor` if it is given.
+    """
+
+    if tensor_parallel_split_mapping is None:
+        tensor_parallel_split_mapping = {}
+
+    if checkpoint_file.endswith(".safetensors") and is_safetensors_available():
+        thread_num = _get_load_state_dict_thread_num()
+        with contextlib.ExitStack() as stack:
+            if executor is None and thread_num > 1:
+                logger.info(f"Set loading state_dict thread num to {thread_num}")
+                executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=thread_num))
+            state_dict, scale_dict = _read_safetensors_state_dict(
+                checkpoint_file,
+                tensor_parallel_split_mapping,
+                fliter_dict_keys,
+                device,
+                executor=executor,
+                thread_num=thread_num,
+            )
+        return _convert_state_dict_to_tensors(state_dict, scale_dict, device, ckpt_quant_stage)
 
     state_dict = paddlenlp_load(checkpoint_file, map_location="cpu")
     return state_dict
 
 
+def load_shard_state_dicts(shard_files, load_kwargs=None, prefetch=True):
+    """
+    Loads the shards of a checkpoint in order, yielding `(shard_file, state_dict)` for every shard.
+
+    The tensors of all the shards are read on one pool of `LOAD_STATE_DICT_THREAD_NUM` threads. For safetensors
+    shards with `prefetch`, shard N+1 is read in the background while the caller loads shard N into the model, so
+    disk reads overlap with the host-to-device copies. This holds up to two shards in host memory.
+
+    Args:
+        shard_files (list): the paths of the shards.
+        load_kwargs (list, optional): the `tensor_parallel_split_mapping` and `fliter_dict_keys` arguments of
+            `load_state_dict` for every shard.
+        prefetch (bool, optional): whether to read the next shard in the background. Defaults to True.
+    """
+    if load_kwargs is None:
+        load_kwargs = [{} for _ in shard_files]
+    thread_num = _get_load_state_dict_thread_num()
+    if thread_num > 1:
+        logger.info(f"Set loading state_dict thread num to {thread_num}")
+
+    with contextlib.ExitStack() as stack:
+        executor = None
+        if thread_num > 1:
+            executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=thread_num))
+
+        if not is_safetensors_available() or not all(str(f).endswith(".safetensors") for f in shard_files):
+            for shard_file, kwargs in zip(shard_files, load_kwargs):
+                yield shard_file, load_state_dict(shard_file, executor=executor, **kwargs)
+            return
+
+        def read_shard(index):
+            start_time = time.time()
+            kwargs = load_kwargs[index]
+            state_dict, scale_dict = _read_safetensors_state_dict(
+                shard_files[index],
+                kwargs.get("tensor_parallel_split_mapping") or {},
+                kwargs.get("fliter_dict_keys"),
+                "cpu",
+                executor=executor,
+                thread_num=thread_num,
+            )
+            return state_dict, scale_dict, time.time() - start_time
+
+        prefetcher = None
+        if prefetch and len(shard_files) > 1:
+            prefetcher = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=1))
+            pending = prefetcher.submit(read_shard, 0)
+
+        total_bytes, total_start_time = 0, time.time()
+        for index, shard_file in enumerate(shard_files):
+            if prefetcher is not None:
+                state_dict, scale_dict, read_time = pending.result()
+                if index + 1 < len(shard_files):
+                    pending = prefetcher.submit(read_shard, index + 1)
+            else:
+                state_dict, scale_dict, read_time = read_shard(index)
+
+            shard_bytes = sum(weight.nbytes for weight in state_dict.values())
+            total_bytes += shard_bytes
+            logger.debug(
+                f"Read {os.path.basename(shard_file)}: {shard_bytes / 2**20:.1f} MB in {read_time:.2f}s "
+                f"({shard_bytes / 2**20 / max(read_time, 1e-6):.1f} MB/s)"
+            )
+            yield shard_file, _convert_state_dict_to_tensors(state_dict, scale_dict)
+            del state_dict, scale_dict
+
+        total_time = time.time() - total_start_time
+        logger.info(
+            f"Loaded {len(shard_files)} checkpoint shard(s), {total_bytes / 2**30:.2f} GB in {total_time:.2f}s "
+            f"({total_bytes / 2**20 / max(total_time, 1e-6):.1f} MB/s)"
+        )
+
+
 def resolve_weight_file_from_hf_hub(
     repo_id: str, cache_dir: str, convert_from_torch: bool, subfolder=None, use_safetensors=False
 ):
@@ -2111,11 +2226,10 @@ class PretrainedModel(Layer, GenerationMixin, ConversionMixin):
             error_msgs = []
             mismatched_keys = []
             resume_state_dict = {}
-            if len(resolved_archive_file) > 1:
-                resolved_archive_file = tqdm(resolved_archive_file, desc="Loading checkpoint shards")
 
-            for shard_file in resolved_archive_file:
+            def get_shard_load_args(shard_file):
                 pre_tensor_parallel_split = False
+                tp_actions = None
                 if (
                     shard_file.endswith(".safetensors")
                     and config.tensor_parallel_degree > 1
@@ -2153,12 +2267,24 @@ class PretrainedModel(Layer, GenerationMixin, ConversionMixin):
 
                 if config.quantization_config.is_weight_quantize():
                     filter_dict_keys = None
-                state_dict = load_state_dict(
-                    shard_file,
-                    tp_actions if pre_tensor_parallel_split else None,
-                    filter_dict_keys,
+                return pre_tensor_parallel_split, {
+                    "tensor_parallel_split_mapping": tp_actions if pre_tensor_parallel_split else None,
+                    "fliter_dict_keys": filter_dict_keys,
+                }
+
+            shard_load_args = [get_shard_load_args(shard_file) for shard_file in resolved_archive_file]
+            # Prefetching the next shard holds two shards in host memory, skip it when memory is the constraint
+            shard_state_dicts = load_shard_state_dicts(
+                resolved_archive_file,
+                [load_kwargs for _, load_kwargs in shard_load_args],
+                prefetch=not low_cpu_mem_usage,
+            )
+            if len(resolved_archive_file) > 1:
+                shard_state_dicts = tqdm(
+                    shard_state_dicts, total=len(resolved_archive_file), desc="Loading checkpoint shards"
                 )
 
+            for (shard_file, state_dict), (pre_tensor_parallel_split, _) in zip(shard_state_dicts, shard_load_args):
                 # convert for fusing or splitting weights
                 state_dict, resume_state_dict, fused_keys, new_keys = _fuse_or_split_keys(
                     state_dict,
@@ -2714,15 +2840,18 @@ class PretrainedModel(Layer, GenerationMixin, ConversionMixin):
                 os.remove(full_filename)
 
         # Save the model
-        for shard_file, shard in shards.items():
-            if safe_serialization:
-                # At some point we will need to deal better with save_function (used for TPU and other distributed
-                # joyfulness), but for now this enough.
-                for k in list(shard.keys()):
-                    if isinstance(shard[k], paddle.Tensor):
-                        shard[k] = shard.pop(k).cpu().numpy()
-                safe_save_file(shard, os.path.join(save_directory, shard_file), metadata={"format": "np"})
-            else:
+        if safe_serialization:
+            # At some point we will need to deal better with save_function (used for TPU and other distributed
+            # joyfulness), but for now this enough. The tensors are streamed to the files chunk by chunk and the
+            # shards are written concurrently.
+            fast_save_files(
+                [
+                    (shard, os.path.join(save_directory, shard_file), {"format": "np"})
+                    for shard_file, shard in shards.items()
+                ]
+            )
+        else:
+            for shard_file, shard in shards.items():
                 save_function(shard, os.path.join(save_directory, shard_file))
 
         if index is None:
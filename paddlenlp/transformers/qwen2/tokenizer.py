@@ -25,6 +25,7 @@ import regex as re
 
 from ...utils.log import logger
 from .. import AddedToken, PretrainedTokenizer
+from ..tokenizer_utils import LRUCache
 
 VOCAB_FILES_NAMES = {
     "vocab_file": "vocab.json",
@@ -196,7 +197,7 @@ class Qwen2Tokenizer(PretrainedTokenizer):
         # (esp. for texts of language that do not use space between word, e.g. Chinese); technically
         # not a memory leak but appears as one.
         # GPT2Tokenizer has the same problem, so let's be consistent.
-        self.cache = {}
+        self.cache = LRUCache()
 
         self.pat = re.compile(PRETOKENIZE_REGEX)
 
@@ -224,8 +225,9 @@ class Qwen2Tokenizer(PretrainedTokenizer):
         return dict(self.encoder, **self.added_tokens_encoder)
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
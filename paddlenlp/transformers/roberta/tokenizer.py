@@ -23,7 +23,7 @@ from paddlenlp.utils.download import resolve_file_path
 
 from ..bert.tokenizer import BasicTokenizer, WordpieceTokenizer
 from ..gpt.tokenizer import GPTTokenizer, bytes_to_unicode
-from ..tokenizer_utils import AddedToken, PretrainedTokenizer
+from ..tokenizer_utils import AddedToken, LRUCache, PretrainedTokenizer
 
 __all__ = ["RobertaTokenizer", "RobertaChineseTokenizer", "RobertaBPETokenizer"]
 
@@ -433,7 +433,7 @@ class RobertaBPETokenizer(GPTTokenizer):
             bpe_data = merges_handle.read().split("\n")[1:-1]
         bpe_merges = [tuple(merge.split()) for merge in bpe_data]
         self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-        self.cache = {}
+        self.cache = LRUCache()
         self.add_prefix_space = add_prefix_space
 
         re = try_import("regex")
@@ -26,6 +26,8 @@ from paddlenlp.transformers import (
     WordpieceTokenizer,
 )
 
+from ..tokenizer_utils import LRUCache
+
 __all__ = [
     "SkepTokenizer",
 ]
@@ -85,7 +87,7 @@ class BpeEncoder(object):
         self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
         self.bpe_ranks = self.__get_bpe_ranks(vocab_bpe_file)
         self.unk_token = unk_token
-        self.cache = {}
+        self.cache = LRUCache()
         re = try_import("regex")
         self.pat = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""")
 
@@ -105,8 +107,9 @@ class BpeEncoder(object):
         """
         bpe
         """
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         word = tuple(token)
         pairs = get_pairs(word)
 
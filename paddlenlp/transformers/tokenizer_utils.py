@@ -20,10 +20,15 @@ import bisect
 import io
 import itertools
 import json
+import math
+import multiprocessing
 import os
+import pickle
 import re
 import unicodedata
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import asdict, dataclass
 from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
@@ -69,6 +74,7 @@ else:
 __all__ = [
     "PretrainedTokenizer",
     "BPETokenizer",
+    "LRUCache",
     "tokenize_chinese_chars",
     "is_chinese_char",
     "normalize_chars",
@@ -279,6 +285,78 @@ def tokenize_special_chars(text):
     return "".join(output)
 
 
+WORD_CACHE_SIZE = 2**16
+
+
+class LRUCache:
+    """
+    A bounded mapping which evicts the least recently used entries first. The slow tokenizers use it to memoize the
+    sub-words of the words they have already tokenized, and it counts hits and misses to report its hit rate.
+
+    Args:
+        maxsize (int, optional):
+            The maximum number of entries, `None` means unbounded and 0 disables the cache.
+            Defaults to `WORD_CACHE_SIZE`.
+    """
+
+    def __init__(self, maxsize: Optional[int] = WORD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, self._data)
+        if value is self._data:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data.pop(key, None)
+        self._data[key] = value
+        while self.maxsize is not None and len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of entries, hits and misses, and the hit rate of the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+        }
+
+
 class Trie:
     """
     Trie in Python. Creates a Trie out of a list of words. The trie is used to split on `added_tokens` in one pass
@@ -884,6 +962,19 @@ class ChatTemplateMixin:
             logger.info("Chat-template config file saved in " + chat_template_file)
 
 
+# tokenizer of the worker processes of `PretrainedTokenizer._parallel_get_batch_input_ids`
+_encode_worker_tokenizer = None
+
+
+def _init_encode_worker(tokenizer_bytes):
+    global _encode_worker_tokenizer
+    _encode_worker_tokenizer = pickle.loads(tokenizer_bytes)
+
+
+def _encode_worker_get_batch_input_ids(batch_text_or_text_pairs, is_split_into_words, kwargs):
+    return _encode_worker_tokenizer._get_batch_input_ids(batch_text_or_text_pairs, is_split_into_words, **kwargs)
+
+
 @six.add_metaclass(InitTrackerMeta)
 class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
     """
@@ -929,6 +1020,9 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
     added_tokens_decoder: Dict[int, str] = {}
     unique_no_split_tokens: List[str] = []
     tokens_trie = Trie()
+    _special_tokens_cache = None
+    # smaller batches are encoded in-process even if `num_proc` is given, the worker startup would cost more
+    parallel_encode_min_batch_size: int = 10000
 
     _decode_use_source_tokenizer = False
 
@@ -948,6 +1042,7 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
 
         self.unique_no_split_tokens: List[str] = []
         self.tokens_trie = Trie()
+        self._special_tokens_cache = None
 
         self._decode_use_source_tokenizer = False
 
@@ -1054,6 +1149,8 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
             else:
                 self.unique_no_split_tokens = sorted(set(self.unique_no_split_tokens).union(set(tokens_to_add)))
         self._create_trie(self.unique_no_split_tokens)
+        # the special tokens used by `tokenize` are built again on the next call
+        self._special_tokens_cache = None
 
         return len(tokens_to_add)
 
@@ -1066,6 +1163,43 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
                 trie.add(token)
         self.tokens_trie = trie
 
+    def _get_special_tokens_cache(self):
+        """
+        Returns the special tokens structures used by `tokenize`. They are built once and rebuilt after `_add_tokens`
+        or after a special token is set, instead of on every call.
+        """
+        if self._special_tokens_cache is None:
+            self._special_tokens_cache = {
+                # Simple mapping string => AddedToken for special tokens with specific tokenization behaviors
+                "all_special_tokens_extended": dict(
+                    (str(t), t) for t in self.all_special_tokens_extended if isinstance(t, AddedToken)
+                ),
+                "no_split_token": set(self.unique_no_split_tokens),
+            }
+        return self._special_tokens_cache
+
+    def _lower_non_special_tokens(self, text):
+        """
+        Lowercases `text` except the special tokens. Every character is lowercased on its own, as `str.lower` would
+        turn a word-final sigma into its final form.
+        """
+        special_tokens_cache = self._get_special_tokens_cache()
+        if "lower_case_pattern" not in special_tokens_cache:
+            escaped_special_toks = [
+                re.escape(s_tok) for s_tok in (self.unique_no_split_tokens + self.all_special_tokens) if s_tok
+            ]
+            special_tokens_cache["lower_case_pattern"] = (
+                re.compile(r"(" + r"|".join(escaped_special_toks) + r")") if escaped_special_toks else None
+            )
+        pattern = special_tokens_cache["lower_case_pattern"]
+
+        pieces = pattern.split(text) if pattern is not None else [text]
+        # the special tokens are the odd pieces
+        for i in range(0, len(pieces), 2):
+            piece = pieces[i]
+            pieces[i] = piece.lower() if "\u03a3" not in piece else "".join(char.lower() for char in piece)
+        return "".join(pieces)
+
     def prepare_for_tokenization(self, text, is_split_into_words=False, **kwargs):
         """
         Performs any necessary transformations before tokenization.
@@ -1108,27 +1242,21 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
 
         split_special_tokens = kwargs.pop("split_special_tokens", self.split_special_tokens)
 
-        # Simple mapping string => AddedToken for special tokens with specific tokenization behaviors
-        all_special_tokens_extended = dict(
-            (str(t), t) for t in self.all_special_tokens_extended if isinstance(t, AddedToken)
-        )
+        special_tokens_cache = self._get_special_tokens_cache()
+        all_special_tokens_extended = special_tokens_cache["all_special_tokens_extended"]
 
         text, kwargs = self.prepare_for_tokenization(text, **kwargs)
 
         # TODO: should this be in the base class?
         if hasattr(self, "do_lower_case") and self.do_lower_case:
             # convert non-special tokens to lowercase
-            escaped_special_toks = [
-                re.escape(s_tok) for s_tok in (self.unique_no_split_tokens + self.all_special_tokens)
-            ]
-            pattern = r"(" + r"|".join(escaped_special_toks) + r")|" + r"(.+?)"
-            text = re.sub(pattern, lambda m: m.groups()[0] or m.groups()[1].lower(), text)
+            text = self._lower_non_special_tokens(text)
 
         if split_special_tokens:
             no_split_token = []
             tokens = [text]
         else:
-            no_split_token = set(self.unique_no_split_tokens)  # don't split on any of the added tokens
+            no_split_token = special_tokens_cache["no_split_token"]  # don't split on any of the added tokens
             # "This is something<special_token_1>  else"
             tokens = self.tokens_trie.split(text)
 
@@ -1434,39 +1562,20 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
         return_offsets_mapping: bool = False,
         return_length: bool = False,
         verbose: bool = True,
+        num_proc: Optional[int] = None,
         **kwargs
     ) -> BatchEncoding:
-        def get_input_ids(text):
-            if isinstance(text, str):
-                tokens = self.tokenize(text, **kwargs)
-                return self.convert_tokens_to_ids(tokens)
-            elif isinstance(text, (list, tuple)) and len(text) > 0 and isinstance(text[0], str):
-                if is_split_into_words:
-                    tokens = list(
-                        itertools.chain(*(self.tokenize(t, is_split_into_words=True, **kwargs) for t in text))
-                    )
-                    return self.convert_tokens_to_ids(tokens)
-                else:
-                    return self.convert_tokens_to_ids(text)
-            elif isinstance(text, (list, tuple)) and len(text) > 0 and isinstance(text[0], int):
-                return text
-            else:
-                raise ValueError(
-                    "Input is not valid. Should be a string, a list/tuple of strings or a list/tuple of integers."
-                )
-
-        input_ids = []
-        for ids_or_pair_ids in batch_text_or_text_pairs:
-            if not isinstance(ids_or_pair_ids, (list, tuple)):
-                ids, pair_ids = ids_or_pair_ids, None
-            elif is_split_into_words and not isinstance(ids_or_pair_ids[0], (list, tuple)):
-                ids, pair_ids = ids_or_pair_ids, None
-            else:
-                ids, pair_ids = ids_or_pair_ids
-
-            first_ids = get_input_ids(ids)
-            second_ids = get_input_ids(pair_ids) if pair_ids is not None else None
-            input_ids.append((first_ids, second_ids))
+        if (
+            num_proc is not None
+            and num_proc > 1
+            and len(batch_text_or_text_pairs) >= self.parallel_encode_min_batch_size
+        ):
+            input_ids = self._parallel_get_batch_input_ids(
+                batch_text_or_text_pairs, is_split_into_words, num_proc, **kwargs
+            )
+        else:
+            input_ids = self._get_batch_input_ids(batch_text_or_text_pairs, is_split_into_words, **kwargs)
+        second_ids = input_ids[-1][1] if input_ids else None
 
         if stride > 0 and second_ids is not None:
             kwargs["batch_text_or_text_pairs"] = batch_text_or_text_pairs
@@ -1508,6 +1617,81 @@ class PretrainedTokenizer(ChatTemplateMixin, PretrainedTokenizerBase):
 
         return batch_outputs
 
+    def _get_batch_input_ids(self, batch_text_or_text_pairs, is_split_into_words: bool = False, **kwargs):
+        """
+        Tokenizes every example of the batch and returns the list of `(first_ids, second_ids)`.
+        """
+
+        def get_input_ids(text):
+            if isinstance(text, str):
+                tokens = self.tokenize(text, **kwargs)
+                return self.convert_tokens_to_ids(tokens)
+            elif isinstance(text, (list, tuple)) and len(text) > 0 and isinstance(text[0], str):
+                if is_split_into_words:
+                    tokens = list(
+                        itertools.chain(*(self.tokenize(t, is_split_into_words=True, **kwargs) for t in text))
+                    )
+                    return self.convert_tokens_to_ids(tokens)
+                else:
+                    return self.convert_tokens_to_ids(text)
+            elif isinstance(text, (list, tuple)) and len(text) > 0 and isinstance(text[0], int):
+                return text
+            else:
+                raise ValueError(
+                    "Input is not valid. Should be a string, a list/tuple of strings or a list/tuple of integers."
+                )
+
+        input_ids = []
+        for ids_or_pair_ids in batch_text_or_text_pairs:
+            if not isinstance(ids_or_pair_ids, (list, tuple)):
+                ids, pair_ids = ids_or_pair_ids, None
+            elif is_split_into_words and not isinstance(ids_or_pair_ids[0], (list, tuple)):
+                ids, pair_ids = ids_or_pair_ids, None
+            else:
+                ids, pair_ids = ids_or_pair_ids
+
+            first_ids = get_input_ids(ids)
+            second_ids = get_input_ids(pair_ids) if pair_ids is not None else None
+            input_ids.append((first_ids, second_ids))
+        return input_ids
+
+    def _parallel_get_batch_input_ids(
+        self, batch_text_or_text_pairs, is_split_into_words: bool = False, num_proc: int = 2, **kwargs
+    ):
+        """
+        Same as `_get_batch_input_ids`, with the batch split in shards tokenized by a pool of `num_proc` processes.
+        The tokenizer is pickled once and loaded once by every worker, and the order of the examples is preserved.
+        """
+        try:
+            tokenizer_bytes = pickle.dumps(self)
+        except Exception as e:
+            logger.warning(f"The tokenizer can not be pickled ({e}), the batch is encoded in a single process.")
+            return self._get_batch_input_ids(batch_text_or_text_pairs, is_split_into_words, **kwargs)
+
+        # several shards per process to balance the load between them
+        shard_size = math.ceil(len(batch_text_or_text_pairs) / (num_proc * 4))
+        shards = [
+            batch_text_or_text_pairs[i : i + shard_size] for i in range(0, len(batch_text_or_text_pairs), shard_size)
+        ]
+        try:
+            with ProcessPoolExecutor(
+                max_workers=num_proc,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_encode_worker,
+                initargs=(tokenizer_bytes,),
+            ) as executor:
+                results = executor.map(
+                    _encode_worker_get_batch_input_ids,
+                    shards,
+                    itertools.repeat(is_split_into_words),
+                    itertools.repeat(kwargs),
+                )
+                return list(itertools.chain.from_iterable(results))
+        except BrokenProcessPool as e:
+            # e.g. a worker killed by the OOM killer or failing to load the tokenizer
+            logger.warning(f"The encoding process pool broke ({e}), the batch is encoded in a single process.")
+            return self._get_batch_input_ids(batch_text_or_text_pairs, is_split_into_words, **kwargs)
+
     def _batch_prepare_for_model(
         self,
         batch_ids_pairs: List[Union[PreTokenizedInputPair, Tuple[List[int], None]]],
@@ -1920,7 +2104,7 @@ class BPETokenizer(PretrainedTokenizer):
             self.byte_encoder = self._bytes_to_unicode()
             self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
             self.bpe_ranks = dict(zip(bpe_merges, range(len(bpe_merges))))
-            self.cache = {}
+            self.cache = LRUCache()
             self.re = try_import("regex")
             self.special_tokens = special_tokens
 
@@ -1971,8 +2155,9 @@ class BPETokenizer(PretrainedTokenizer):
             return pairs
 
         def bpe(self, token):
-            if token in self.cache:
-                return self.cache[token]
+            cached = self.cache.get(token)
+            if cached is not None:
+                return cached
             word = tuple(token)
             pairs = self._get_pairs(word)
 
@@ -772,6 +772,9 @@ class SpecialTokensMixin:
             A tuple or a list of additional special tokens.
     """
 
+    # the special tokens structures cached by the slow tokenizers, reset by the setters of the special tokens
+    _special_tokens_cache = None
+
     SPECIAL_TOKENS_ATTRIBUTES = [
         "bos_token",
         "eos_token",
@@ -1062,34 +1065,42 @@ class SpecialTokensMixin:
     @bos_token.setter
     def bos_token(self, value):
         self._bos_token = value
+        self._special_tokens_cache = None
 
     @eos_token.setter
     def eos_token(self, value):
         self._eos_token = value
+        self._special_tokens_cache = None
 
     @unk_token.setter
     def unk_token(self, value):
         self._unk_token = value
+        self._special_tokens_cache = None
 
     @sep_token.setter
     def sep_token(self, value):
         self._sep_token = value
+        self._special_tokens_cache = None
 
     @pad_token.setter
     def pad_token(self, value):
         self._pad_token = value
+        self._special_tokens_cache = None
 
     @cls_token.setter
     def cls_token(self, value):
         self._cls_token = value
+        self._special_tokens_cache = None
 
     @mask_token.setter
     def mask_token(self, value):
         self._mask_token = value
+        self._special_tokens_cache = None
 
     @additional_special_tokens.setter
     def additional_special_tokens(self, value):
         self._additional_special_tokens = value
+        self._special_tokens_cache = None
 
     @property
     def bos_token_id(self) -> Optional[int]:
@@ -1179,34 +1190,42 @@ class SpecialTokensMixin:
     @bos_token_id.setter
     def bos_token_id(self, value):
         self._bos_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @eos_token_id.setter
     def eos_token_id(self, value):
         self._eos_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @unk_token_id.setter
     def unk_token_id(self, value):
         self._unk_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @sep_token_id.setter
     def sep_token_id(self, value):
         self._sep_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @pad_token_id.setter
     def pad_token_id(self, value):
         self._pad_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @cls_token_id.setter
     def cls_token_id(self, value):
         self._cls_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @mask_token_id.setter
     def mask_token_id(self, value):
         self._mask_token = self.convert_ids_to_tokens(value) if value is not None else None
+        self._special_tokens_cache = None
 
     @additional_special_tokens_ids.setter
     def additional_special_tokens_ids(self, values):
         self._additional_special_tokens = [self.convert_ids_to_tokens(value) for value in values]
+        self._special_tokens_cache = None
 
     @property
     def special_tokens_map(self) -> Dict[str, Union[str, List[str]]]:
@@ -2227,6 +2246,7 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
         padding_side: Optional[Literal["right", "left"]] = None,
         return_tensors: Optional[Union[str, TensorType]] = None,
         verbose: bool = True,
+        num_proc: Optional[int] = None,
         **kwargs
     ):
         """
@@ -2345,6 +2365,9 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
                 Defaults to `None`.
             verbose (bool, optional):
                 Whether or not to print more information and warnings. Defaults to True.
+            num_proc (int, optional):
+                The number of processes tokenizing a batch input with a slow tokenizer. Batches smaller than the
+                tokenizer's `parallel_encode_min_batch_size` are tokenized in-process. Defaults to `None`.
 
         Returns:
             dict or list[dict] (for batch input):
@@ -2452,6 +2475,7 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
                 padding_side=padding_side,
                 return_tensors=return_tensors,
                 verbose=verbose,
+                num_proc=num_proc,
                 **kwargs,
             )
         else:
@@ -2685,6 +2709,7 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
         padding_side: Optional[Literal["right", "left"]] = None,
         return_tensors: Optional[Union[str, TensorType]] = None,
         verbose: bool = True,
+        num_proc: Optional[int] = None,
         **kwargs
     ) -> BatchEncoding:
         """
@@ -2698,6 +2723,10 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
                 it has been pretokenized. If each sequence is provided as a list
                 of strings (pretokenized), you must set `is_split_into_words` as
                 `True` to disambiguate with a sequence pair.
+            num_proc (int, optional):
+                The number of processes tokenizing the batch with a slow tokenizer. The batch is split in shards
+                tokenized in parallel and the results keep the order of the batch. Batches smaller than the
+                tokenizer's `parallel_encode_min_batch_size` are tokenized in-process. Defaults to `None`.
 
         Returns:
             dict or list[dict]:
@@ -2744,6 +2773,7 @@ class PretrainedTokenizerBase(SpecialTokensMixin):
             return_offsets_mapping=return_offsets_mapping,
             return_length=return_length,
             verbose=verbose,
+            num_proc=num_proc,
             **kwargs,
         )
 
@@ -25,7 +25,7 @@ from paddle.utils import try_import
 
 from ...utils.log import logger
 from .. import PretrainedTokenizer
-from ..tokenizer_utils import AddedToken, TextInput
+from ..tokenizer_utils import AddedToken, LRUCache, TextInput
 
 __all__ = ["XLMTokenizer"]
 
@@ -650,7 +650,7 @@ class XLMTokenizer(PretrainedTokenizer):
             merges = merges_handle.read().split("\n")[:-1]
         merges = [tuple(merge.split()[:2]) for merge in merges]
         self.bpe_ranks = dict(zip(merges, range(len(merges))))
-        self.cache = {}
+        self.cache = LRUCache()
 
     @property
     def do_lower_case(self):
@@ -711,8 +711,9 @@ class XLMTokenizer(PretrainedTokenizer):
 
     def bpe(self, token):
         word = tuple(token[:-1]) + (token[-1] + "</w>",)
-        if token in self.cache:
-            return self.cache[token]
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
         pairs = get_pairs(word)
 
         if not pairs:
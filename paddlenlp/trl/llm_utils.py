@@ -614,7 +614,45 @@ def get_model_max_position_embeddings(config: PretrainedConfig) -> Optional[int]
     return None
 
 
-def read_res(model_name_or_path: str, tensor_queue: mp.Queue, result_queue: mp.Queue, done_event: mp.Event):
+def schedule_prefill_chunks(prompt_lens: List[int], chunk_size: int, step_token_num: int = 0):
+    """
+    Schedules the chunks of the prompts longer than `chunk_size`, which are prefilled in successive steps. In each step
+    the prompts get their next chunk in batch order as long as the chunks of the step stay within `step_token_num`
+    tokens, the other prompts wait for a later step. The first chunk of a step is always scheduled.
+
+    Args:
+        prompt_lens (List[int]): the prompt length of each batch id.
+        chunk_size (int): the number of tokens of a chunk.
+        step_token_num (int, optional): the maximum number of chunk tokens prefilled in a step, 0 means no limit.
+
+    Returns:
+        List[List[Tuple[int, int, int]]]: the (batch id, offset, length) of the chunks prefilled in each step.
+    """
+    offsets = {i: 0 for i, length in enumerate(prompt_lens) if length > chunk_size}
+    steps = []
+    while offsets:
+        chunks, token_num = [], 0
+        for i, offset in list(offsets.items()):
+            chunk_len = min(chunk_size, prompt_lens[i] - offset)
+            if step_token_num > 0 and chunks and token_num + chunk_len > step_token_num:
+                continue
+            chunks.append((i, offset, chunk_len))
+            token_num += chunk_len
+            if offset + chunk_len >= prompt_lens[i]:
+                del offsets[i]
+            else:
+                offsets[i] = offset + chunk_len
+        steps.append(chunks)
+    return steps
+
+
+def read_res(
+    model_name_or_path: str,
+    tensor_queue: mp.Queue,
+    result_queue: mp.Queue,
+    done_event: mp.Event,
+    skip_token_nums: Optional[List[int]] = None,
+):
     from paddlenlp.utils.env import USE_FAST_TOKENIZER
 
     tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, padding_side="left", use_fast=USE_FAST_TOKENIZER)
@@ -640,6 +678,10 @@ def read_res(model_name_or_path: str, tensor_queue: mp.Queue, result_queue: mp.Q
         if int(output_tensor[0, 0]) == -1:
             break
     output = np.concatenate(outputs, axis=1).tolist()
+    if skip_token_nums is not None:
+        # drop the tokens of the steps before the last prompt chunk, sampled after an earlier chunk or
+        # -1 (read as eos) while the prompt waits for its next chunk
+        output = [out[skip_num:] for out, skip_num in zip(output, skip_token_nums)]
     seqs = tokenizer.batch_decode(output, skip_special_tokens=True, clean_up_tokenization_spaces=False)
     for i, (out, seq) in enumerate(zip(output, seqs)):
         result_queue.put([i, out, seq])
@@ -29,6 +29,20 @@ class DataConfig:
             "help": "Whether to use Greedy Zero Padding data stream, should be used together with `zero_padding=True`."
         },
     )
+    packing_strategy: str = field(
+        default="worst_fit",
+        metadata={
+            "help": "Packing strategy of Greedy Zero Padding, one of `worst_fit`, `first_fit_decreasing` and `best_fit`."
+        },
+    )
+    dense_attention_mask: bool = field(
+        default=True,
+        metadata={
+            "help": "Whether the Zero Padding data stream outputs the causal masks of the packed sequences as a dense "
+            "`attention_mask`. Set it to False to output the compact `attn_mask_startend_row_indices` instead, for "
+            "models which support it."
+        },
+    )
     pad_to_multiple_of: int = field(
         default=None, metadata={"help": "If set will pad the sequence to a multiple of the provided value."}
     )
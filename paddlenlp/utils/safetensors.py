@@ -15,13 +15,20 @@
 import copy
 import json
 import mmap
+import os
+import struct
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 __all__ = [
     "fast_safe_open",
     "fast_load_file",
+    "fast_save_file",
+    "fast_save_files",
+    "fast_safe_writer",
 ]
 
 
@@ -64,6 +71,27 @@ numpy_dtype = {
 }
 
 
+# numpy dtype -> safetensors dtype, bfloat16 tensors are converted to uint16 by `paddle.Tensor.numpy`
+safetensors_dtype = {np.dtype(v): k for k, v in numpy_dtype.items() if not isinstance(v, int)}
+
+paddle_numpy_dtype = {
+    "paddle.bool": np.bool_,
+    "paddle.uint8": np.uint8,
+    "paddle.int8": np.int8,
+    "paddle.int16": np.int16,
+    "paddle.int32": np.int32,
+    "paddle.int64": np.int64,
+    "paddle.float16": np.float16,
+    "paddle.bfloat16": np.uint16,
+    "paddle.float32": np.float32,
+    "paddle.float64": np.float64,
+}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+_read_lock = threading.Lock()
+
+
 def getSize(fileobject):
     fileobject.seek(0, 2)  # move the cursor to the end of the file
     size = fileobject.tell()
@@ -108,6 +136,23 @@ def read_metadata(buffer):
     return stop, tensors, metadata
 
 
+def pread_into(fileobject, view, offset):
+    """Reads `len(view)` bytes at `offset` without moving the file cursor, so that threads can share one file."""
+    if not hasattr(os, "preadv"):
+        with _read_lock:
+            fileobject.seek(offset)
+            fileobject.readinto(view)
+        return
+    fd = fileobject.fileno()
+    while len(view) > 0:
+        # preadv may return fewer bytes than requested for large reads
+        n = os.preadv(fd, [view], offset)
+        if n == 0:
+            raise ValueError("SafeTensorError::MetadataIncompleteBuffer")
+        view = view[n:]
+        offset += n
+
+
 def readinto_numpy(meta, buffer, base_ptr):
     def create_empty(info):
         return np.empty(shape=info["shape"], dtype=numpy_dtype[info["dtype"]])
@@ -230,17 +275,15 @@ class PySafeSlice:
             # Use file read for sequence access
             for start, end in merge_indices:
                 data_len = end - start
-                self.bufferfile.seek(self.start_offset + start)
                 view = tensor_view[curr_data_ptr : curr_data_ptr + data_len]
-                self.bufferfile.readinto(view)
+                pread_into(self.bufferfile, view, self.start_offset + start)
                 curr_data_ptr += data_len
 
         return tensor.reshape(target_shape)
 
     def get(self, *args, **kwargs):
         tensor = np.empty(shape=self.shape, dtype=self.dtype)
-        self.bufferfile.seek(self.start_offset)
-        self.bufferfile.readinto(memoryview(tensor))
+        pread_into(self.bufferfile, memoryview(tensor.reshape(-1).view(np.uint8)), self.start_offset)
         return tensor
 
     @property
@@ -310,3 +353,160 @@ def fast_load_file(filename):
         for k in f.keys():
             result[k] = f.get_tensor(k)
     return result
+
+
+def _get_numpy_dtype(tensor):
+    if isinstance(tensor, np.ndarray):
+        return tensor.dtype
+    dtype = paddle_numpy_dtype.get(str(tensor.dtype), None)
+    if dtype is None:
+        raise ValueError(f"SafeTensorError::UnsupportedDtype({tensor.dtype})")
+    return np.dtype(dtype)
+
+
+def _iter_tensor_chunks(tensor, chunk_size):
+    """
+    Yields the bytes of a numpy array or a paddle Tensor in chunks of about `chunk_size` bytes. Paddle tensors are
+    copied to host one chunk at a time, so at most one chunk of a tensor lives in host memory.
+    """
+    if isinstance(tensor, np.ndarray):
+        data = memoryview(np.ascontiguousarray(tensor).reshape(-1).view(np.uint8))
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size]
+        return
+
+    numel = int(np.prod(tensor.shape))
+    step = max(chunk_size // _get_numpy_dtype(tensor).itemsize, 1)
+    flat_tensor = tensor.reshape([-1])
+    for start in range(0, numel, step):
+        chunk = np.ascontiguousarray(flat_tensor[start : start + step].numpy())
+        yield memoryview(chunk.reshape(-1).view(np.uint8))
+
+
+def _build_header(tensor_infos, metadata=None):
+    """Builds the header from a dict mapping the tensor names to their `(numpy dtype, shape)`."""
+    header = OrderedDict()
+    if metadata is not None:
+        header["__metadata__"] = metadata
+    offset = 0
+    for name, (dtype, shape) in tensor_infos.items():
+        shape = [int(dim) for dim in shape]
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        header[name] = {"dtype": safetensors_dtype[dtype], "shape": shape, "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # the data buffer is aligned to 8 bytes, as the reference implementation does
+    return header + b" " * (-len(header) % 8)
+
+
+def fast_save_file(tensors, filename, metadata=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Saves a dict of numpy arrays or paddle Tensors in the safetensors format. The header is written first and the
+    tensors are then streamed to the file in chunks, so the host memory used is bounded by `chunk_size` instead of
+    the size of the whole state dict.
+
+    Args:
+        tensors (dict): The tensors to save.
+        filename (str): The file to write.
+        metadata (dict, optional): Text metadata stored in the header.
+        chunk_size (int, optional): Size in bytes of the chunks copied to host and written at once.
+    """
+    header = _build_header(
+        OrderedDict((name, (_get_numpy_dtype(tensor), tensor.shape)) for name, tensor in tensors.items()), metadata
+    )
+    # a buffered file writes all the data of `write`, large chunks still go to the raw file without a copy
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for tensor in tensors.values():
+            for chunk in _iter_tensor_chunks(tensor, chunk_size):
+                f.write(chunk)
+
+
+def fast_save_files(files, num_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Saves several safetensors files concurrently with `fast_save_file`.
+
+    Args:
+        files (list): A list of `(tensors, filename, metadata)`.
+        num_workers (int, optional): Number of files written at once. Defaults to min(len(files), 4).
+    """
+    files = list(files)
+    if len(files) == 0:
+        return
+    num_workers = num_workers or min(len(files), 4)
+    if num_workers <= 1:
+        for tensors, filename, metadata in files:
+            fast_save_file(tensors, filename, metadata, chunk_size)
+        return
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(fast_save_file, tensors, filename, metadata, chunk_size)
+            for tensors, filename, metadata in files
+        ]
+        for future in futures:
+            future.result()
+
+
+class fast_safe_writer:
+    """
+    Writes a safetensors file tensor by tensor. The header is built from the dtypes and shapes given up front, then
+    the data of the tensors is appended in the same order with `write`, one piece of a tensor at a time if needed,
+    so no tensor has to be fully materialized in host memory.
+
+    Args:
+        filename (str): The file to write.
+        tensor_infos (dict): Ordered mapping from the tensor names to their `(numpy dtype, shape)`.
+        metadata (dict, optional): Text metadata stored in the header.
+    """
+
+    def __init__(self, filename, tensor_infos, metadata=None):
+        self.filename = filename
+        self.tensor_infos = OrderedDict(
+            (name, (np.dtype(dtype), [int(dim) for dim in shape])) for name, (dtype, shape) in tensor_infos.items()
+        )
+        self.names = list(self.tensor_infos.keys())
+        self.position = -1
+        self.remaining = 0
+        header = _build_header(self.tensor_infos, metadata)
+        self.file = open(filename, "wb")
+        self.file.write(struct.pack("<Q", len(header)))
+        self.file.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        self.close(check=exc_type is None)
+
+    def _next_tensor(self):
+        self.position += 1
+        dtype, shape = self.tensor_infos[self.names[self.position]]
+        self.remaining = int(np.prod(shape)) * dtype.itemsize
+
+    def write(self, name, array):
+        """Appends `array`, the next rows (or the whole data) of the tensor `name`."""
+        while self.remaining == 0 and self.position + 1 < len(self.names):
+            if self.position >= 0 and self.names[self.position] == name:
+                break
+            self._next_tensor()
+        if self.position < 0 or self.names[self.position] != name:
+            raise ValueError(f"SafeTensorError::InvalidOffset({name})")
+        dtype, _ = self.tensor_infos[name]
+        if array.dtype != dtype:
+            raise ValueError(f"SafeTensorError::TensorInvalidInfo({name}): expected {dtype}, but got {array.dtype}")
+        data = memoryview(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+        if len(data) > self.remaining:
+            raise ValueError(f"SafeTensorError::TensorInvalidInfo({name}): data exceeds the tensor size")
+        self.file.write(data)
+        self.remaining -= len(data)
+
+    def close(self, check=True):
+        if self.file.closed:
+            return
+        self.file.close()
+        incomplete = self.remaining > 0 or any(
+            int(np.prod(shape)) > 0 for _, shape in list(self.tensor_infos.values())[self.position + 1 :]
+        )
+        if check and incomplete:
+            raise ValueError(f"SafeTensorError::MetadataIncompleteBuffer({self.filename})")
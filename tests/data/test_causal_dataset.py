@@ -0,0 +1,166 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+from paddlenlp.data.causal_dataset import (
+    GPTDataset,
+    _build_sample_idx,
+    _build_sample_idx_fast,
+    _num_epochs,
+    build_sample_idx,
+)
+from paddlenlp.data.indexed_dataset import (
+    MMapIndexedDataset,
+    MMapIndexedDatasetBuilder,
+    data_file_path,
+    index_file_path,
+    loss_mask_file_path,
+)
+from tests.testing_utils import slow
+
+
+def build_doc_idx(num_docs, num_samples, seq_length, max_doc_length, seed=42):
+    np_rng = np.random.RandomState(seed)
+    sizes = np_rng.randint(0, max_doc_length, size=num_docs).astype(np.int32)
+    sizes[0] = max(sizes[0], 2)
+    tokens_per_epoch = int(np.sum(sizes))
+    num_epochs = _num_epochs(tokens_per_epoch, seq_length, num_samples)
+    doc_idx = np.tile(np.arange(num_docs, dtype=np.int32), num_epochs)
+    np_rng.shuffle(doc_idx)
+    return sizes, doc_idx, num_epochs, tokens_per_epoch
+
+
+class TestBuildSampleIdx(unittest.TestCase):
+    @parameterized.expand(
+        [
+            (1, 10, 8, 16),
+            (100, 500, 32, 20),
+            (100, 500, 1, 5),
+            (1000, 4096, 128, 300),
+        ]
+    )
+    def test_fast_matches_python(self, num_docs, num_samples, seq_length, max_doc_length):
+        sizes, doc_idx, num_epochs, tokens_per_epoch = build_doc_idx(num_docs, num_samples, seq_length, max_doc_length)
+        expected = _build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch)
+
+        for chunk_size, num_workers in [(None, 1), (7, 1), (64, 4)]:
+            sample_idx = _build_sample_idx_fast(
+                sizes,
+                doc_idx,
+                seq_length,
+                num_epochs,
+                tokens_per_epoch,
+                chunk_size=chunk_size,
+                num_workers=num_workers,
+            )
+            self.assertEqual(sample_idx.dtype, expected.dtype)
+            np.testing.assert_array_equal(sample_idx, expected)
+
+    def test_empty_first_document(self):
+        sizes = np.array([0, 5, 0, 7, 3], dtype=np.int32)
+        doc_idx = np.arange(5, dtype=np.int32)
+        tokens_per_epoch = int(np.sum(sizes))
+        expected = _build_sample_idx(sizes, doc_idx, 4, 1, tokens_per_epoch)
+        np.testing.assert_array_equal(_build_sample_idx_fast(sizes, doc_idx, 4, 1, tokens_per_epoch), expected)
+
+    def test_build_sample_idx(self):
+        sizes, doc_idx, num_epochs, tokens_per_epoch = build_doc_idx(200, 1000, 64, 100)
+        expected = _build_sample_idx(sizes, doc_idx, 64, num_epochs, tokens_per_epoch)
+        np.testing.assert_array_equal(build_sample_idx(sizes, doc_idx, 64, num_epochs, tokens_per_epoch), expected)
+
+    @slow
+    def test_benchmark(self):
+        sizes, doc_idx, num_epochs, tokens_per_epoch = build_doc_idx(1000000, 2000000, 1024, 4096)
+
+        start_time = time.time()
+        expected = _build_sample_idx(sizes, doc_idx, 1024, num_epochs, tokens_per_epoch)
+        python_time = time.time() - start_time
+
+        start_time = time.time()
+        sample_idx = _build_sample_idx_fast(
+            sizes, doc_idx, 1024, num_epochs, tokens_per_epoch, chunk_size=2**20, num_workers=4
+        )
+        numpy_time = time.time() - start_time
+        np.testing.assert_array_equal(sample_idx, expected)
+        print(f"build sample-idx: python {python_time:.3f}s, numpy {numpy_time:.3f}s")
+
+        try:
+            from fast_dataindex import helpers
+        except ImportError:
+            return
+        start_time = time.time()
+        sample_idx = helpers.build_sample_idx(sizes, doc_idx, 1024, num_epochs, tokens_per_epoch)
+        print(f"build sample-idx: fast_dataindex {time.time() - start_time:.3f}s")
+        np.testing.assert_array_equal(sample_idx, expected)
+
+
+class TestGPTDatasetGetBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_prefix = os.path.join(self.tmp_dir.name, "corpus")
+        np_rng = np.random.RandomState(42)
+        builder = MMapIndexedDatasetBuilder(
+            data_file_path(self.data_prefix), dtype=np.uint16, loss_mask_file=loss_mask_file_path(self.data_prefix)
+        )
+        self.docs = []
+        for _ in range(64):
+            doc = np_rng.randint(0, 30000, size=np_rng.randint(1, 50))
+            self.docs.append(doc)
+            builder.add_item(doc)
+            builder.flush_loss_mask_item([doc % 2])
+            builder.end_document()
+        builder.finalize(index_file_path(self.data_prefix))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_batch(self):
+        indexed_dataset = MMapIndexedDataset(self.data_prefix, skip_warmup=True)
+        dataset = GPTDataset(
+            "train",
+            self.data_prefix,
+            np.arange(len(self.docs), dtype=np.int32),
+            indexed_dataset,
+            "1,0,0",
+            num_samples=100,
+            seq_length=32,
+            seed=1234,
+            return_doc_ids=True,
+            data_cache_path=os.path.join(self.tmp_dir.name, "cache"),
+        )
+
+        tokens = np.concatenate([self.docs[doc_id] for doc_id in dataset.doc_idx])
+        sample = dataset[0]
+        start = dataset.shuffle_idx[0] * 32
+        np.testing.assert_array_equal(sample["text"], tokens[start : start + 33])
+        np.testing.assert_array_equal(sample["mask"], tokens[start : start + 33] % 2)
+
+        indices = [5, 0, 17, 3]
+        for keep_dtype in [False, True]:
+            batch = dataset.get_batch(indices, keep_dtype=keep_dtype)
+            self.assertEqual(batch["text"].shape, (4, 33))
+            self.assertEqual(batch["text"].dtype, np.uint16 if keep_dtype else np.int64)
+            self.assertEqual(batch["mask"].dtype, np.uint8 if keep_dtype else np.int64)
+            for row, idx in enumerate(indices):
+                sample = dataset[idx]
+                np.testing.assert_array_equal(batch["text"][row], sample["text"])
+                np.testing.assert_array_equal(batch["mask"][row], sample["mask"])
+                np.testing.assert_array_equal(batch["doc_ids"][row], sample["doc_ids"])
@@ -0,0 +1,109 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from paddlenlp.data.index_cache import (
+    build_index_cache,
+    check_index_cache,
+    index_cache_done_path,
+    index_cache_failed_path,
+    is_index_cache_complete,
+    save_npy_atomic,
+    wait_index_cache,
+)
+
+
+class TestIndexCache(unittest.TestCase):
+    def test_build_once(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_prefix = os.path.join(tmp_dir, "cache", "hash")
+            path = path_prefix + "_idx.npy"
+            calls = []
+
+            def build_fn():
+                calls.append(1)
+                save_npy_atomic(path, np.arange(10))
+
+            self.assertTrue(build_index_cache(path_prefix, [path], build_fn))
+            self.assertFalse(build_index_cache(path_prefix, [path], build_fn))
+
+            self.assertEqual(len(calls), 1)
+            self.assertTrue(os.path.isfile(index_cache_done_path(path_prefix)))
+            np.testing.assert_array_equal(np.load(path), np.arange(10))
+            self.assertEqual(sorted(os.listdir(os.path.dirname(path))), ["hash.done", "hash_idx.npy"])
+
+    def test_wait_for_builder(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_prefix = os.path.join(tmp_dir, "hash")
+            path = path_prefix + "_idx.npy"
+            loaded = []
+
+            def wait_and_load():
+                wait_index_cache(path_prefix, interval=0.01)
+                loaded.append(np.load(path))
+
+            waiter = threading.Thread(target=wait_and_load)
+            waiter.start()
+            time.sleep(0.05)
+            self.assertTrue(waiter.is_alive())
+            build_index_cache(path_prefix, [path], lambda: save_npy_atomic(path, np.arange(10)))
+            waiter.join()
+            np.testing.assert_array_equal(loaded[0], np.arange(10))
+
+    def test_build_failure(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_prefix = os.path.join(tmp_dir, "hash")
+            path = path_prefix + "_idx.npy"
+
+            def build_fn():
+                raise OSError("disk full")
+
+            with self.assertRaises(OSError):
+                build_index_cache(path_prefix, [path], build_fn)
+            self.assertFalse(os.path.isfile(index_cache_done_path(path_prefix)))
+            with self.assertRaisesRegex(RuntimeError, "disk full"):
+                wait_index_cache(path_prefix, interval=0.01)
+            with self.assertRaisesRegex(RuntimeError, "disk full"):
+                check_index_cache(path_prefix, [path])
+
+            # a successful rebuild clears the failure
+            build_index_cache(path_prefix, [path], lambda: save_npy_atomic(path, np.arange(3)))
+            self.assertFalse(os.path.exists(index_cache_failed_path(path_prefix)))
+            check_index_cache(path_prefix, [path])
+            wait_index_cache(path_prefix, interval=0.01)
+
+    def test_wait_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_prefix = os.path.join(tmp_dir, "hash")
+            with self.assertRaises(TimeoutError):
+                wait_index_cache(path_prefix, timeout=0.05, interval=0.01)
+            with self.assertRaisesRegex(RuntimeError, "was not built"):
+                check_index_cache(path_prefix, [path_prefix + "_idx.npy"])
+
+    def test_legacy_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_prefix = os.path.join(tmp_dir, "hash")
+            path = path_prefix + "_idx.npy"
+            self.assertFalse(is_index_cache_complete(path_prefix, [path]))
+            np.save(path, np.arange(3))
+            self.assertTrue(is_index_cache_complete(path_prefix, [path]))
+            self.assertFalse(build_index_cache(path_prefix, [path], lambda: self.fail("should not rebuild")))
+            self.assertTrue(os.path.isfile(index_cache_done_path(path_prefix)))
@@ -23,6 +23,7 @@ from paddlenlp.datasets import (
     ZeroPaddingIterableDataset,
     ZeroPaddingMapDataset,
     load_dataset,
+    pack_sequences,
 )
 from paddlenlp.transformers import AutoTokenizer
 from tests.testing_utils import get_tests_dir
@@ -62,6 +63,7 @@ class ZeroPaddingTestCommon:
             ]
         ),
         "position_ids_2d": [[0, 1, 2, 3, 4, 5, 6, 0, 1, 2, 3, 4, 5, 6], [0, 1, 2, 3, 4, 5, 6, 0, 1, 2, 3, 4, 5, 6]],
+        "attn_mask_startend_row_indices": [7, 7, 7, 7, 7, 7, 7, 14, 14, 14, 14, 14, 14, 14],
     }
 
     def preprocess_fn(
@@ -143,6 +145,41 @@ class TestZeroPaddingMapDataset(ZeroPaddingTestCommon, unittest.TestCase):
             (inData_input_labels_only[0]["attention_mask"] == self.expected_output["attention_mask"]).all()
         )
 
+        inData_compact = ZeroPaddingMapDataset(
+            self.dataset_input_labels_only, self.tokenizer, max_length=16, dense_attention_mask=False
+        )
+        self.assertNotIn("attention_mask", inData_compact[0])
+        self.assertEqual(
+            inData_compact[0]["attn_mask_startend_row_indices"], self.expected_output["attn_mask_startend_row_indices"]
+        )
+
+        # the masks given by the records are kept as they are
+        dataset_startend_row_indices = [
+            dict(record, attn_mask_startend_row_indices=[len(record["input_ids"])] * len(record["input_ids"]))
+            for record in self.dataset_input_labels_only
+        ]
+        inData_startend_row_indices = ZeroPaddingMapDataset(
+            dataset_startend_row_indices, self.tokenizer, max_length=16
+        )
+        self.assertNotIn("attention_mask", inData_startend_row_indices[0])
+        self.assertEqual(
+            inData_startend_row_indices[0]["attn_mask_startend_row_indices"],
+            self.expected_output["attn_mask_startend_row_indices"],
+        )
+
+    def test_greedy_packing_strategies(self):
+        for packing_strategy in ["worst_fit", "first_fit_decreasing", "best_fit"]:
+            inData = ZeroPaddingMapDataset(
+                self.dataset,
+                self.tokenizer,
+                max_length=16,
+                greedy_zero_padding=True,
+                packing_strategy=packing_strategy,
+            )
+            self.assertTrue(all(len(item["input_ids"]) <= 16 for item in inData))
+            self.assertEqual(inData.num_packed_tokens, sum(len(item["input_ids"]) for item in self.dataset))
+            self.assertEqual(inData.packing_efficiency, inData.num_packed_tokens / (len(inData) * 16))
+
     def test_2d_position_id(self):
         inData_2d = ZeroPaddingMapDataset(self.dataset_position_2d, self.tokenizer, max_length=16)
         self.assertTrue(inData_2d[0]["position_ids"] == self.expected_output["position_ids_2d"])
@@ -204,6 +241,14 @@ class TestZeroPaddingIterableDataset(ZeroPaddingTestCommon, unittest.TestCase):
         self.assertEqual(example["labels"], self.expected_output["labels"])
         self.assertTrue((example["attention_mask"] == self.expected_output["attention_mask"]).all())
 
+        inData_compact = ZeroPaddingIterableDataset(
+            self.dataset_input_labels_only, self.tokenizer, max_length=16, dense_attention_mask=False
+        )
+        example = next(iter(inData_compact))
+        self.assertEqual(
+            example["attn_mask_startend_row_indices"], self.expected_output["attn_mask_startend_row_indices"]
+        )
+
     def test_2d_position_id(self):
         inData_2d = ZeroPaddingIterableDataset(self.dataset_position_2d, self.tokenizer, max_length=16)
         example = next(iter(inData_2d))
@@ -215,3 +260,34 @@ class TestZeroPaddingIterableDataset(ZeroPaddingTestCommon, unittest.TestCase):
         inData = ZeroPaddingIterableDataset(self.dataset, self.tokenizer, max_length=128)
         tgt_input_ids = [item["input_ids"] for item in inData]
         self.assertEqual(orginal_input_ids, tgt_input_ids)
+
+    def test_streaming_best_fit(self):
+        num_tokens = sum(len(item["input_ids"]) for item in self.dataset)
+        inData = ZeroPaddingIterableDataset(
+            self.dataset,
+            self.tokenizer,
+            max_length=16,
+            greedy_zero_padding=True,
+            packing_strategy="best_fit",
+            packing_buffer_size=2,
+        )
+        packs = list(inData)
+        self.assertTrue(all(len(item["input_ids"]) <= 16 for item in packs))
+        self.assertEqual(sum(len(item["input_ids"]) for item in packs), num_tokens)
+        self.assertEqual(inData.num_packs, len(packs))
+
+
+class TestPackSequences(unittest.TestCase):
+    def test_worst_fit(self):
+        self.assertEqual(pack_sequences([5, 3, 4, 2, 6], 8), [[0, 1], [2, 3], [4]])
+        self.assertEqual(pack_sequences([2, 3, 4, 1], 8), [[0, 1], [2, 3]])
+
+    def test_first_fit_decreasing(self):
+        self.assertEqual(pack_sequences([5, 3, 4, 2, 6], 8, "first_fit_decreasing"), [[4, 3], [0, 1], [2]])
+
+    def test_best_fit(self):
+        self.assertEqual(pack_sequences([5, 3, 4, 2, 6], 8, "best_fit"), [[0, 1], [2, 3], [4]])
+
+    def test_unsupported_strategy(self):
+        with self.assertRaises(ValueError):
+            pack_sequences([1, 2], 8, "next_fit")
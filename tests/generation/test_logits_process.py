@@ -49,6 +49,7 @@ from paddlenlp.generation.logits_process import (
     TemperatureLogitsWarper,
     TopKProcess,
     TopPProcess,
+    _calc_banned_ngram_tokens,
 )
 
 
@@ -209,6 +210,31 @@ class LogitsProcessorTest(unittest.TestCase):
             [[False, False, False], [True, False, False]],
         )
 
+    def test_no_repeat_ngram_incremental(self):
+        vocab_size = 4
+        batch_size = 6
+        rng = random.Random(42)
+
+        for ngram_size in [1, 2, 3]:
+            incremental_proc = NoRepeatNGramLogitsProcessor(ngram_size, incremental=True)
+            input_ids = ids_tensor((batch_size, 2), vocab_size=vocab_size, rng=rng)
+            for step in range(12):
+                scores = self._get_uniform_logits(batch_size, vocab_size)
+                expected = _calc_banned_ngram_tokens(ngram_size, input_ids, batch_size, input_ids.shape[-1])
+                filtered_scores = incremental_proc(input_ids, scores.clone())
+                self.assertListEqual(
+                    (filtered_scores == paddle.finfo(scores.dtype).min).tolist(),
+                    [[token in banned for token in range(vocab_size)] for banned in expected],
+                )
+                stateless_scores = NoRepeatNGramLogitsProcessor(ngram_size)(input_ids, scores.clone())
+                self.assertListEqual(filtered_scores.tolist(), stateless_scores.tolist())
+
+                # reselect hypotheses like beam search does every step
+                beam_idx = paddle.to_tensor([rng.randint(0, batch_size - 1) for _ in range(batch_size)])
+                LogitsProcessorList([incremental_proc]).reorder_state(beam_idx)
+                next_tokens = ids_tensor((batch_size, 1), vocab_size=vocab_size, rng=rng)
+                input_ids = paddle.concat([paddle.index_select(input_ids, beam_idx), next_tokens], axis=-1)
+
     def test_processor_list(self):
         batch_size = 4
         sequence_length = 10
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import unittest
 from queue import Empty
 from threading import Thread
 
 import paddle
 
-from paddlenlp.generation import TextIteratorStreamer, TextStreamer
+from paddlenlp.generation import (
+    AsyncTextIteratorStreamer,
+    TextIteratorStreamer,
+    TextStreamer,
+)
 from paddlenlp.transformers import AutoModelForCausalLM, AutoTokenizer
 from paddlenlp.transformers.utils import CaptureStd
 from tests.testing_utils import slow
@@ -26,8 +31,8 @@ from tests.transformers.test_modeling_common import ids_tensor
 
 
 class StreamerTester(unittest.TestCase):
-    def get_inputs(self, model):
-        input_ids = ids_tensor([1, 5], vocab_size=model.config.vocab_size, dtype="int64")
+    def get_inputs(self, model, batch_size=1):
+        input_ids = ids_tensor([batch_size, 5], vocab_size=model.config.vocab_size, dtype="int64")
         attention_mask = paddle.ones_like(input_ids, dtype="bool")
         return {
             "input_ids": input_ids,
@@ -72,6 +77,67 @@ class StreamerTester(unittest.TestCase):
 
         self.assertEqual(streamer_text, greedy_text)
 
+    def test_batch_iterator_streamer_matches_non_streaming(self):
+        tokenizer = AutoTokenizer.from_pretrained("__internal_testing__/tiny-random-llama")
+        model = AutoModelForCausalLM.from_pretrained("__internal_testing__/tiny-random-llama")
+        model.config.eos_token_id = -1
+
+        input_kwargs = self.get_inputs(model, batch_size=3)
+        greedy_ids = model.generate(**input_kwargs)
+        greedy_texts = tokenizer.batch_decode(greedy_ids[0])
+
+        streamer = TextIteratorStreamer(tokenizer)
+        generation_kwargs = {**input_kwargs, "streamer": streamer}
+        thread = Thread(target=model.generate, kwargs=generation_kwargs)
+        thread.start()
+        streamer_texts = ["", "", ""]
+        for new_texts in streamer:
+            self.assertEqual(len(new_texts), 3)
+            for i, new_text in enumerate(new_texts):
+                streamer_texts[i] += new_text
+
+        self.assertEqual(streamer_texts, greedy_texts)
+
+    def test_streamer_ignores_tokens_after_eos(self):
+        tokenizer = AutoTokenizer.from_pretrained("__internal_testing__/tiny-random-llama")
+        eos_token_id = tokenizer.eos_token_id
+        streamer = TextIteratorStreamer(tokenizer, eos_token_id=eos_token_id)
+        # the first sequence finishes at the second step, then receives padding
+        streamer.put(paddle.to_tensor([[100], [200]]))
+        streamer.put(paddle.to_tensor([[eos_token_id], [300]]))
+        streamer.put(paddle.to_tensor([[0], [400]]))
+        streamer.end()
+
+        streamer_texts = ["", ""]
+        for new_texts in streamer:
+            for i, new_text in enumerate(new_texts):
+                streamer_texts[i] += new_text
+
+        self.assertEqual(streamer_texts[0], tokenizer.decode([100, eos_token_id]))
+        self.assertEqual(streamer_texts[1], tokenizer.decode([200, 300, 400]))
+
+    def test_async_iterator_streamer_matches_non_streaming(self):
+        tokenizer = AutoTokenizer.from_pretrained("__internal_testing__/tiny-random-llama")
+        model = AutoModelForCausalLM.from_pretrained("__internal_testing__/tiny-random-llama")
+        model.config.eos_token_id = -1
+
+        input_kwargs = self.get_inputs(model)
+        greedy_ids = model.generate(**input_kwargs)
+        greedy_text = tokenizer.decode(greedy_ids[0][0])
+
+        async def consume():
+            streamer = AsyncTextIteratorStreamer(tokenizer)
+            generation_kwargs = {**input_kwargs, "streamer": streamer}
+            thread = Thread(target=model.generate, kwargs=generation_kwargs)
+            thread.start()
+            streamer_text = ""
+            async for new_text in streamer:
+                streamer_text += new_text
+            thread.join()
+            return streamer_text
+
+        self.assertEqual(asyncio.run(consume()), greedy_text)
+
     @slow
     def test_text_streamer_decode_kwargs(self):
         # Tests that we can pass `decode_kwargs` to the streamer to control how the tokens are decoded. Must be tested
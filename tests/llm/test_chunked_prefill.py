@@ -0,0 +1,117 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+import paddle
+
+from paddlenlp.trl import llm_utils
+
+
+class FakeTokenizer:
+    eos_token_id = 0
+
+    def batch_decode(self, output, **kwargs):
+        return [" ".join(str(token) for token in tokens) for tokens in output]
+
+
+class SchedulePrefillChunksTest(unittest.TestCase):
+    def test_without_step_token_num(self):
+        # every prompt longer than the chunk size gets a chunk per step
+        self.assertEqual(
+            llm_utils.schedule_prefill_chunks([2, 10, 6], chunk_size=4),
+            [[(1, 0, 4), (2, 0, 4)], [(1, 4, 4), (2, 4, 2)], [(1, 8, 2)]],
+        )
+        self.assertEqual(llm_utils.schedule_prefill_chunks([2, 4], chunk_size=4), [])
+
+    def test_step_token_num(self):
+        steps = llm_utils.schedule_prefill_chunks([2, 10, 6], chunk_size=4, step_token_num=4)
+        self.assertEqual(steps, [[(1, 0, 4)], [(1, 4, 4)], [(1, 8, 2)], [(2, 0, 4)], [(2, 4, 2)]])
+
+        # a shorter last chunk fills the budget left in a step
+        steps = llm_utils.schedule_prefill_chunks([10, 10, 10], chunk_size=4, step_token_num=6)
+        self.assertEqual(
+            steps,
+            [
+                [(0, 0, 4)],
+                [(0, 4, 4)],
+                [(0, 8, 2), (1, 0, 4)],
+                [(1, 4, 4)],
+                [(1, 8, 2), (2, 0, 4)],
+                [(2, 4, 4)],
+                [(2, 8, 2)],
+            ],
+        )
+
+        # the first chunk of a step is scheduled even if it exceeds the budget
+        steps = llm_utils.schedule_prefill_chunks([8, 8], chunk_size=4, step_token_num=2)
+        self.assertEqual(steps, [[(0, 0, 4)], [(0, 4, 4)], [(1, 0, 4)], [(1, 4, 4)]])
+
+    def test_chunk_bookkeeping(self):
+        rng = np.random.RandomState(42)
+        for _ in range(20):
+            prompt_lens = rng.randint(1, 40, size=rng.randint(1, 8)).tolist()
+            chunk_size, step_token_num = 4 * rng.randint(1, 4), int(rng.randint(0, 20))
+            steps = llm_utils.schedule_prefill_chunks(prompt_lens, chunk_size, step_token_num)
+            prefilled = [0] * len(prompt_lens)
+            for chunks in steps:
+                self.assertGreater(len(chunks), 0)
+                if step_token_num > 0 and len(chunks) > 1:
+                    self.assertLessEqual(sum(chunk_len for _, _, chunk_len in chunks), step_token_num)
+                for i, offset, chunk_len in chunks:
+                    # the chunks of a prompt are consecutive and one per step at most
+                    self.assertEqual(offset, prefilled[i])
+                    self.assertLessEqual(chunk_len, chunk_size)
+                    prefilled[i] += chunk_len
+            self.assertEqual(
+                prefilled, [length if length > chunk_size else 0 for length in prompt_lens], (prompt_lens, chunk_size)
+            )
+
+
+class ReadResTest(unittest.TestCase):
+    def read_res(self, step_tokens, skip_token_nums):
+        """Runs read_res on the tokens output by the steps, one token per batch id in each step."""
+        messages = [[1, len(tokens)] + tokens for tokens in step_tokens]
+        messages[-1][0] = -1
+
+        def get_output(output_tensor, rank_id, wait_flag):
+            output_tensor[:] = paddle.to_tensor(np.array(messages.pop(0)).reshape(-1, 1))
+
+        tensor_queue, result_queue = queue.Queue(), queue.Queue()
+        tensor_queue.put(paddle.zeros([len(step_tokens[0]) + 2, 1], dtype="int64"))
+        with mock.patch.dict(sys.modules, {"paddlenlp_ops": types.SimpleNamespace(get_output=get_output)}):
+            with mock.patch.object(llm_utils.AutoTokenizer, "from_pretrained", return_value=FakeTokenizer()):
+                with mock.patch("paddle.device.set_device"):
+                    llm_utils.read_res("model", tensor_queue, result_queue, threading.Event(), skip_token_nums)
+        return [result_queue.get() for _ in step_tokens[0]]
+
+    def test_skip_token_nums(self):
+        # batch id 1 samples a token after its first chunk, batch id 2 waits stopped (-1) for its first chunk
+        step_tokens = [[5, 9, -1], [6, 7, -1], [0, 8, 3], [0, 0, 4]]
+        results = self.read_res(step_tokens, skip_token_nums=[0, 1, 2])
+        self.assertEqual(results, [[0, [5, 6, 0, 0], "5 6 0 0"], [1, [7, 8, 0], "7 8 0"], [2, [3, 4], "3 4"]])
+
+        results = self.read_res(step_tokens, skip_token_nums=None)
+        self.assertEqual([out for _, out, _ in results], [[5, 6, 0, 0], [9, 7, 8, 0], [0, 0, 3, 4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
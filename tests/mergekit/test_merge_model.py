@@ -20,6 +20,7 @@ from parameterized import parameterized
 
 from paddlenlp.mergekit import MergeConfig, MergeModel
 from paddlenlp.transformers import AutoModel
+from paddlenlp.utils.safetensors import fast_load_file
 
 
 class TestMergeModel(unittest.TestCase):
@@ -67,6 +68,38 @@ class TestMergeModel(unittest.TestCase):
             mergekit = MergeModel(merge_config)
             mergekit.merge_model()
 
+    @parameterized.expand([("linear",), ("ties",)])
+    def test_merge_model_np_chunked(self, merge_method):
+        with TemporaryDirectory() as tempdir:
+            model = AutoModel.from_pretrained("__internal_testing__/tiny-random-bert", dtype="bfloat16")
+            safe_path = os.path.join(tempdir, "safe_model")
+            model.save_pretrained(safe_path, safe_serialization="safetensors")
+            model = AutoModel.from_pretrained("__internal_testing__/tiny-random-bert", dtype="bfloat16")
+            for p in model.parameters():
+                p.set_value(p * 0.5)
+            safe_path_2 = os.path.join(tempdir, "safe_model_2")
+            model.save_pretrained(safe_path_2, safe_serialization="safetensors")
+
+            state_dicts = []
+            for max_tensor_mem in [0.5, 1e-6]:
+                output_path = os.path.join(tempdir, f"merge_{max_tensor_mem}")
+                merge_config = MergeConfig(
+                    merge_method=merge_method,
+                    model_path_list=[safe_path, safe_path_2],
+                    output_path=output_path,
+                    base_model_path=safe_path,
+                    max_tensor_mem=max_tensor_mem,
+                    max_merge_mem=4,
+                )
+                mergekit = MergeModel(merge_config)
+                mergekit.merge_model()
+                state_dicts.append(fast_load_file(os.path.join(output_path, "model-00001-of-00001.safetensors")))
+            # row-chunked merges are exact for linear and ties, dare masks are random
+            self.assertEqual(state_dicts[0].keys(), state_dicts[1].keys())
+            for key in state_dicts[0]:
+                self.assertEqual(state_dicts[0][key].dtype, state_dicts[1][key].dtype)
+                self.assertTrue((state_dicts[0][key] == state_dicts[1][key]).all())
+
     @parameterized.expand([("slerp",), ("della",), ("dare_linear",), ("ties",)])
     def test_merge_model_pd(self, merge_method):
         with TemporaryDirectory() as tempdir:
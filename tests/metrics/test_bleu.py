@@ -12,11 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import random
 import unittest
 
 from paddlenlp.metrics import BLEU
 
 
+def build_corpus(num_insts, seed=42):
+    rng = random.Random(seed)
+    vocab = ["the", "cat", "is", "on", "mat", "a", "dog"]
+    cand_list = [[rng.choice(vocab) for _ in range(rng.randint(0, 30))] for _ in range(num_insts)]
+    ref_lists = [
+        [[rng.choice(vocab) for _ in range(rng.randint(0, 30))] for _ in range(rng.randint(1, 3))]
+        for _ in range(num_insts)
+    ]
+    return cand_list, ref_lists
+
+
 class TestBLEU(unittest.TestCase):
     def test_metrics(self):
         bleu = BLEU()
@@ -25,3 +37,16 @@ class TestBLEU(unittest.TestCase):
         ref_list = [["The", "cat", "is", "on", "the", "mat"], ["There", "is", "a", "cat", "on", "the", "mat"]]
         bleu.add_inst(cand, ref_list)
         self.assertEqual(bleu.score(), 0.4671379777282001)
+
+    def test_add_insts(self):
+        cand_list, ref_lists = build_corpus(20)
+        expected = BLEU()
+        for cand, ref_list in zip(cand_list, ref_lists):
+            expected.add_inst(cand, ref_list)
+        for num_workers in [None, 2]:
+            bleu = BLEU()
+            bleu.add_insts(cand_list, ref_lists, num_workers=num_workers)
+            self.assertEqual(bleu.match_ngram, expected.match_ngram)
+            self.assertEqual(bleu.candi_ngram, expected.candi_ngram)
+            self.assertEqual((bleu.bp_c, bleu.bp_r), (expected.bp_c, expected.bp_r))
+            self.assertEqual(bleu.score(), expected.score())
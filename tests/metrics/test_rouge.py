@@ -12,11 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import random
 import unittest
 
+import numpy as np
+
 from paddlenlp.metrics import Rouge1, RougeL
 
 
+def lcs_dp(string, sub):
+    lengths = np.zeros((len(string) + 1, len(sub) + 1))
+    for i in range(1, len(string) + 1):
+        for j in range(1, len(sub) + 1):
+            if string[i - 1] == sub[j - 1]:
+                lengths[i][j] = lengths[i - 1][j - 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i - 1][j], lengths[i][j - 1])
+    return lengths[len(string)][len(sub)]
+
+
+def build_corpus(num_insts, seed=42):
+    rng = random.Random(seed)
+    vocab = ["the", "cat", "is", "on", "mat", "a", "dog"]
+    cand_list = [[rng.choice(vocab) for _ in range(rng.randint(1, 30))] for _ in range(num_insts)]
+    ref_lists = [
+        [[rng.choice(vocab) for _ in range(rng.randint(1, 30))] for _ in range(rng.randint(1, 3))]
+        for _ in range(num_insts)
+    ]
+    return cand_list, ref_lists
+
+
 class TestRouge(unittest.TestCase):
     def test_rogue1(self):
         rouge1 = Rouge1()
@@ -32,3 +57,24 @@ class TestRouge(unittest.TestCase):
         ref_list = [["The", "cat", "is", "on", "the", "mat"], ["There", "is", "a", "cat", "on", "the", "mat"]]
         rougel.add_inst(cand, ref_list)
         self.assertEqual(rougel.score(), 0.7800511508951408)
+
+    def test_lcs(self):
+        rougel = RougeL()
+        cand_list, ref_lists = build_corpus(50)
+        for cand, ref_list in zip(cand_list, ref_lists):
+            for ref in ref_list:
+                self.assertEqual(rougel.lcs(cand, ref), lcs_dp(cand, ref))
+        self.assertEqual(rougel.lcs([], ["the"]), 0.0)
+        # unhashable tokens
+        self.assertEqual(rougel.lcs([[1], [2], [1]], [[2], [1]]), 2.0)
+
+    def test_add_insts(self):
+        cand_list, ref_lists = build_corpus(20)
+        expected = RougeL()
+        for cand, ref_list in zip(cand_list, ref_lists):
+            expected.add_inst(cand, ref_list)
+        for num_workers in [None, 2]:
+            rougel = RougeL()
+            rougel.add_insts(cand_list, ref_lists, num_workers=num_workers)
+            self.assertEqual(rougel.inst_scores, expected.inst_scores)
+            self.assertEqual(rougel.score(), expected.score())
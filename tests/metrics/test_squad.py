@@ -0,0 +1,118 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from paddlenlp.metrics.squad import compute_prediction
+
+
+class Examples(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return [example[key] for example in self]
+        return super().__getitem__(key)
+
+
+def build_predictions(num_examples, seed=42):
+    rng = np.random.RandomState(seed)
+    examples, features, all_start_logits, all_end_logits = Examples(), [], [], []
+    for example_index in range(num_examples):
+        example_id = str(example_index)
+        examples.append({"id": example_id, "context": "".join(rng.choice(list("abcdefgh "), size=200))})
+        for _ in range(rng.randint(1, 4)):
+            seq_len = rng.randint(5, 60)
+            offset_mapping = []
+            for _ in range(seq_len):
+                start = rng.randint(0, 190)
+                offset_mapping.append(None if rng.rand() < 0.2 else (start, start + rng.randint(1, 10)))
+            feature = {"example_id": example_id, "offset_mapping": offset_mapping}
+            if rng.rand() < 0.5:
+                feature["token_is_max_context"] = {str(i): bool(rng.rand() < 0.8) for i in range(seq_len)}
+            features.append(feature)
+            all_start_logits.append(rng.randn(seq_len).astype(np.float32))
+            all_end_logits.append(rng.randn(seq_len).astype(np.float32))
+    return examples, features, (all_start_logits, all_end_logits)
+
+
+def best_spans(examples, features, predictions, n_best_size, max_answer_length):
+    """Scores every pair of start and end logits of the features of every example."""
+    spans = {example["id"]: [] for example in examples}
+    for feature, start_logits, end_logits in zip(features, *predictions):
+        offset_mapping = feature["offset_mapping"]
+        token_is_max_context = feature.get("token_is_max_context", {})
+        start_indexes = np.argsort(start_logits)[::-1][:n_best_size]
+        end_indexes = np.argsort(end_logits)[::-1][:n_best_size]
+        for start_index in start_indexes:
+            for end_index in end_indexes:
+                if offset_mapping[start_index] is None or offset_mapping[end_index] is None:
+                    continue
+                if not 0 <= end_index - start_index < max_answer_length:
+                    continue
+                if "token_is_max_context" in feature and not token_is_max_context[str(start_index)]:
+                    continue
+                offsets = (offset_mapping[start_index][0], offset_mapping[end_index][1])
+                spans[feature["example_id"]].append((start_logits[start_index] + end_logits[end_index], offsets))
+    return {
+        example["id"]: [
+            example["context"][start:end]
+            for _, (start, end) in sorted(spans[example["id"]], key=lambda x: x[0], reverse=True)[:n_best_size]
+        ]
+        for example in examples
+    }
+
+
+class TestComputePrediction(unittest.TestCase):
+    def test_n_best(self):
+        examples, features, predictions = build_predictions(20)
+        all_predictions, all_nbest_json, scores_diff_json = compute_prediction(
+            examples, features, predictions, n_best_size=5, max_answer_length=10
+        )
+        expected = best_spans(examples, features, predictions, n_best_size=5, max_answer_length=10)
+        self.assertEqual(len(scores_diff_json), 0)
+        for example in examples:
+            nbest = all_nbest_json[example["id"]]
+            if expected[example["id"]]:
+                self.assertEqual([pred["text"] for pred in nbest], expected[example["id"]])
+            self.assertEqual(all_predictions[example["id"]], nbest[0]["text"])
+            self.assertAlmostEqual(sum(pred["probability"] for pred in nbest), 1.0, places=5)
+
+    def test_version_2_with_negative(self):
+        examples, features, predictions = build_predictions(20)
+        all_predictions, all_nbest_json, scores_diff_json = compute_prediction(
+            examples, features, predictions, version_2_with_negative=True, null_score_diff_threshold=0.5
+        )
+        self.assertEqual(list(scores_diff_json.keys()), examples["id"])
+        for example in examples:
+            nbest = all_nbest_json[example["id"]]
+            # the null prediction is always kept
+            self.assertIn("", [pred["text"] for pred in nbest])
+            if scores_diff_json[example["id"]] > 0.5:
+                self.assertEqual(all_predictions[example["id"]], "")
+            else:
+                self.assertNotEqual(all_predictions[example["id"]], "")
+
+    def test_num_workers(self):
+        examples, features, predictions = build_predictions(20)
+        for version_2_with_negative in [False, True]:
+            expected = compute_prediction(
+                examples, features, predictions, version_2_with_negative=version_2_with_negative
+            )
+            self.assertEqual(
+                compute_prediction(
+                    examples, features, predictions, version_2_with_negative=version_2_with_negative, num_workers=2
+                ),
+                expected,
+            )
@@ -0,0 +1,63 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+
+from paddlenlp.server.utils import AsyncPredictExecutor, ServerBusyError
+
+
+class AsyncPredictExecutorTest(unittest.TestCase):
+    def test_run(self):
+        executor = AsyncPredictExecutor(max_workers=2, max_queue_size=2)
+
+        async def main():
+            return await asyncio.gather(*[executor.run(pow, i, 2) for i in range(4)])
+
+        self.assertListEqual(asyncio.run(main()), [0, 1, 4, 9])
+        self.assertEqual(executor.metrics()["num_pending"], 0)
+        executor.shutdown()
+
+    def test_backpressure(self):
+        executor = AsyncPredictExecutor(max_workers=1, max_queue_size=1)
+        gate = threading.Event()
+
+        async def main():
+            running = asyncio.ensure_future(executor.run(gate.wait))
+            queued = asyncio.ensure_future(executor.run(gate.wait))
+            await asyncio.sleep(0)
+            with self.assertRaises(ServerBusyError):
+                await executor.run(gate.wait)
+            gate.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(main())
+        metrics = executor.metrics()
+        self.assertEqual(metrics["num_rejected"], 1)
+        self.assertEqual(metrics["num_pending"], 0)
+        executor.shutdown()
+
+    def test_timeout(self):
+        executor = AsyncPredictExecutor(max_workers=1, max_queue_size=1, timeout=0.05)
+        gate = threading.Event()
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await executor.run(gate.wait)
+
+        asyncio.run(main())
+        self.assertEqual(executor.metrics()["num_timeout"], 1)
+        gate.set()
+        executor.shutdown()
@@ -0,0 +1,74 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from paddlenlp.server.batcher import DynamicBatcher
+
+
+class DynamicBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.gate = threading.Event()
+
+    def process_fn(self, requests):
+        self.gate.wait()
+        self.batches.append(requests)
+        for data, parameters in requests:
+            if data == "bad":
+                raise ValueError("bad request")
+        return [data * parameters for data, parameters in requests]
+
+    def test_coalesce_requests(self):
+        batcher = DynamicBatcher(
+            self.process_fn, key_fn=lambda data, parameters: parameters, max_batch_size=3, max_wait_time=0.5
+        )
+        # Requests are only batched with the requests of the same parameters
+        futures = [batcher.submit("a", 1)]
+        futures += [batcher.submit(data, parameters) for data, parameters in [("b", 2), ("c", 1), ("d", 2), ("e", 2)]]
+        self.gate.set()
+        self.assertListEqual([future.result() for future in futures], ["a", "bb", "c", "dd", "ee"])
+        batcher.close()
+
+        self.assertEqual(sum(len(batch) for batch in self.batches), 5)
+        for batch in self.batches:
+            self.assertLessEqual(len(batch), 3)
+            self.assertEqual(len({parameters for _, parameters in batch}), 1)
+        self.assertIn([("b", 2), ("d", 2), ("e", 2)], self.batches)
+        metrics = batcher.metrics()
+        self.assertEqual(metrics["num_requests"], 5)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["max_batch_size"], 3)
+
+    def test_failed_request_is_isolated(self):
+        batcher = DynamicBatcher(self.process_fn, max_batch_size=4, max_wait_time=0.5)
+        futures = [batcher.submit(data, 1) for data in ["a", "bad", "c"]]
+        self.gate.set()
+        self.assertEqual(futures[0].result(), "a")
+        self.assertEqual(futures[2].result(), "c")
+        with self.assertRaises(ValueError):
+            futures[1].result()
+        batcher.close()
+
+    def test_max_batch_tokens(self):
+        self.gate.set()
+        batcher = DynamicBatcher(
+            self.process_fn, size_fn=lambda data: (1, len(data)), max_batch_tokens=4, max_wait_time=0.5
+        )
+        futures = [batcher.submit(data, 1) for data in ["aa", "bb", "cc", "dddd"]]
+        self.assertListEqual([future.result() for future in futures], ["aa", "bb", "cc", "dddd"])
+        batcher.close()
+        for batch in self.batches:
+            self.assertLessEqual(sum(len(data) for data, _ in batch), 4)
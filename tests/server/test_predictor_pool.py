@@ -0,0 +1,73 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from parameterized import parameterized
+
+from paddlenlp.server.utils import PredictorPool
+
+
+class FakePredictor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def run(self):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        self.running -= 1
+
+
+class PredictorPoolTest(unittest.TestCase):
+    def test_idle_predictor_is_preferred(self):
+        predictors = [FakePredictor() for _ in range(3)]
+        pool = PredictorPool(predictors)
+        with pool.acquire() as (first_id, _):
+            with pool.acquire() as (second_id, _):
+                with pool.acquire() as (third_id, _):
+                    self.assertEqual(len({first_id, second_id, third_id}), 3)
+                    self.assertListEqual([m["in_flight"] for m in pool.metrics()], [1, 1, 1])
+        self.assertListEqual([m["in_flight"] for m in pool.metrics()], [0, 0, 0])
+
+    @parameterized.expand([("least_outstanding",), ("power_of_two",)])
+    def test_concurrent_requests(self, policy):
+        predictors = [FakePredictor() for _ in range(4)]
+        pool = PredictorPool(predictors, policy=policy)
+
+        def worker():
+            for _ in range(10):
+                with pool.acquire() as (_, predictor):
+                    predictor.run()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = pool.metrics()
+        self.assertEqual(sum(m["num_requests"] for m in metrics), 80)
+        self.assertTrue(all(m["in_flight"] == 0 for m in metrics))
+        self.assertTrue(all(m["num_requests"] > 0 for m in metrics))
+        # a predictor never runs two requests at once
+        self.assertTrue(all(predictor.max_running == 1 for predictor in predictors))
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            PredictorPool([FakePredictor()], policy="round_robin")
@@ -103,6 +103,24 @@ class TestUIETask(unittest.TestCase):
                         self.assertIn("text", relation)
                         self.assertIn("probability", relation)
 
+    def test_batch_single_stage_predict(self):
+        texts = ["《告别了》是孙耀威在专辑爱的故事里面的歌曲", "2月8日上午北京冬奥会自由式滑雪女子大跳台决赛中中国选手谷爱凌以188.25分获得金牌！"]
+        groups = [
+            [{"text": text, "bbox": None, "image": None, "prompt": prompt} for text in texts]
+            for prompt in ["歌曲名称", "时间", "孙耀威的所属专辑"]
+        ]
+        groups.insert(1, [])
+        for task in [self.uie, self.uie_m]:
+            batch_results = task.task_instance._batch_single_stage_predict(groups)
+            self.assertEqual(len(batch_results), len(groups))
+            for group, results in zip(groups, batch_results):
+                expected = task.task_instance._single_stage_predict(group) if group else []
+                self.assertEqual(len(results), len(expected))
+                for result, expected_result in zip(results, expected):
+                    self.assertListEqual([r["text"] for r in result], [r["text"] for r in expected_result])
+                    for r, expected_r in zip(result, expected_result):
+                        self.assertAlmostEqual(r["probability"], expected_r["probability"], places=4)
+
     @pytest.mark.skip(reason="todo, fix it")
     def test_doc_entity_extraction(self):
         doc_path = get_tests_dir("fixtures/tests_samples/OCR/custom.jpeg")
@@ -0,0 +1,60 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import paddle
+from safetensors.numpy import load_file
+
+from paddlenlp.trainer.unified_checkpoint.async_handler import AsyncCheckpointHandler
+
+
+class AsyncCheckpointHandlerTest(unittest.TestCase):
+    def test_double_buffered_save(self):
+        handler = AsyncCheckpointHandler(SimpleNamespace(unified_checkpoint_config=["async_save"]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            expected = []
+            for step in range(3):
+                state_dict = {
+                    "linear.weight": paddle.full([64, 32], step, dtype="float32"),
+                    "linear.bias": paddle.arange(32, dtype="float32") + step,
+                }
+                expected.append({k: v.numpy() for k, v in state_dict.items()})
+                handler._file_save_async_or_sync(
+                    state_dict,
+                    os.path.join(tmp_dir, f"model-{step}.safetensors"),
+                    signal_path=tmp_dir,
+                    is_sync=False,
+                    state_dict_type="model_weight",
+                )
+
+            saver = handler._savers["model_weight"]
+            saver.wait()
+            self.assertLessEqual(len(saver._buffers), 2)
+            for step in range(3):
+                state_dict = load_file(os.path.join(tmp_dir, f"model-{step}.safetensors"))
+                for key, value in expected[step].items():
+                    np.testing.assert_array_equal(state_dict[key], value)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, ".model_weight.done.-1")))
+
+            metrics = handler.get_async_save_metrics()["model_weight"]
+            self.assertEqual(metrics["num_staged"], 3)
+            self.assertEqual(metrics["num_saves"], 3)
+            self.assertGreater(metrics["bytes"], 0)
+            handler.unlink_shared_memory()
+            self.assertEqual(handler.get_async_save_metrics(), {})
@@ -0,0 +1,105 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+
+from paddlenlp.trainer.utils.helper import (
+    NestedArrayAccumulator,
+    nested_concat,
+    nested_reduce_logits,
+)
+
+
+def build_steps(num_steps, seed=42):
+    rng = np.random.RandomState(seed)
+    steps = []
+    for _ in range(num_steps):
+        batch_size, seq_len = rng.randint(1, 4), rng.randint(1, 6)
+        logits = rng.randn(batch_size, seq_len, 3).astype(np.float32)
+        steps.append((logits, [rng.randint(0, 9, (batch_size, seq_len)), rng.randn(batch_size)]))
+    return steps
+
+
+class NestedArrayAccumulatorTest(unittest.TestCase):
+    def assert_nested_equal(self, arrays, expected):
+        if isinstance(expected, (list, tuple)):
+            self.assertEqual(type(arrays), type(expected))
+            for a, e in zip(arrays, expected):
+                self.assert_nested_equal(a, e)
+        else:
+            # memmap results are ndarray subclasses
+            self.assertIsInstance(arrays, np.ndarray)
+            self.assertEqual(arrays.dtype, expected.dtype)
+            np.testing.assert_array_equal(arrays, expected)
+
+    def test_matches_nested_concat(self):
+        steps = build_steps(10)
+        expected = steps[0]
+        for arrays in steps[1:]:
+            expected = nested_concat(expected, arrays, padding_index=-100)
+
+        accumulator = NestedArrayAccumulator()
+        self.assertIsNone(accumulator.get_arrays())
+        for arrays in steps:
+            accumulator.add(arrays)
+        self.assert_nested_equal(accumulator.get_arrays(), expected)
+
+        with tempfile.TemporaryDirectory() as memmap_dir:
+            accumulator = NestedArrayAccumulator(memmap_dir=memmap_dir)
+            for arrays in steps:
+                accumulator.add(arrays)
+            arrays = accumulator.get_arrays()
+            self.assertIsInstance(arrays[0], np.memmap)
+            self.assert_nested_equal(arrays, expected)
+            self.assertEqual(os.listdir(memmap_dir), [])
+
+    def test_zero_length_sequences(self):
+        # batches whose sequences are empty still have rows, which are padded
+        steps = [np.ones([2, 3], dtype=np.int64), np.ones([2, 0], dtype=np.int64), np.ones([1, 2], dtype=np.int64)]
+        expected = np.full([5, 3], -100, dtype=np.int64)
+        expected[:2] = 1
+        expected[4, :2] = 1
+
+        with tempfile.TemporaryDirectory() as memmap_dir:
+            for accumulator in [NestedArrayAccumulator(), NestedArrayAccumulator(memmap_dir=memmap_dir)]:
+                for arrays in steps:
+                    accumulator.add(arrays)
+                self.assert_nested_equal(np.asarray(accumulator.get_arrays()), expected)
+
+    def test_structure_mismatch(self):
+        accumulator = NestedArrayAccumulator()
+        accumulator.add((np.zeros([2, 3]), np.zeros([2])))
+        with self.assertRaises(TypeError):
+            accumulator.add(np.zeros([2, 3]))
+
+
+class NestedReduceLogitsTest(unittest.TestCase):
+    def test_reduce_logits(self):
+        logits = paddle.randn([2, 5, 10])
+        labels = paddle.randint(0, 10, [2, 5])
+        preds, reduced_labels = nested_reduce_logits((logits, labels), "argmax")
+        np.testing.assert_array_equal(preds.numpy(), logits.numpy().argmax(-1))
+        self.assertIs(reduced_labels, labels)
+
+        preds = nested_reduce_logits(logits, "topk", topk=3)
+        self.assertEqual(preds.shape, [2, 5, 3])
+        np.testing.assert_array_equal(preds[..., 0].numpy(), logits.numpy().argmax(-1))
+
+        with self.assertRaises(ValueError):
+            nested_reduce_logits(logits, "mean")
@@ -15,6 +15,7 @@
 import os
 import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from safetensors.numpy import load_file, save_file
@@ -69,3 +70,18 @@ class FastSafetensors(unittest.TestCase):
                     np.testing.assert_equal(self.weigth_map[key][..., 1], safe_slice[..., 1])
                     np.testing.assert_equal(self.weigth_map[key][:2, ...], safe_slice[:2, ...])
                     np.testing.assert_equal(self.weigth_map[key][..., :4], safe_slice[..., :4])
+
+    @skip_platform("win32", "cygwin")
+    def test_safe_open_concurrent_read(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, "test.safetensors")
+            save_file(self.weigth_map, path, metadata={"format": "np"})
+
+            keys = list(self.weigth_map.keys()) * 20
+            with fast_safe_open(path, framework="np") as f:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    tensors = list(executor.map(lambda key: f.get_slice(key)[:], keys))
+                    slices = list(executor.map(lambda key: f.get_slice(key)[..., 1:], keys))
+            for key, tensor, tensor_slice in zip(keys, tensors, slices):
+                np.testing.assert_equal(self.weigth_map[key], tensor)
+                np.testing.assert_equal(self.weigth_map[key][..., 1:], tensor_slice)
@@ -16,7 +16,9 @@ import json
 import os
 import tempfile
 import unittest
+from unittest import mock
 
+import numpy as np
 import paddle
 
 from paddlenlp.transformers import (
@@ -26,7 +28,11 @@ from paddlenlp.transformers import (
     PretrainedModel,
     register_base_model,
 )
-from paddlenlp.transformers.model_utils import load_sharded_checkpoint, shard_checkpoint
+from paddlenlp.transformers.model_utils import (
+    load_shard_state_dicts,
+    load_sharded_checkpoint,
+    shard_checkpoint,
+)
 from paddlenlp.utils.env import (
     PADDLE_WEIGHTS_INDEX_NAME,
     PADDLE_WEIGHTS_NAME,
@@ -102,6 +108,30 @@ class TestFromPretrained(unittest.TestCase):
         for p1, p2 in zip(model.parameters(), model_load.parameters()):
             self.assertTrue(paddle.allclose(p1, p2))
 
+    @require_package("safetensors")
+    def test_load_shard_state_dicts(self):
+        from safetensors.numpy import save_file
+
+        shards = [
+            {f"shard_{i}.weight_{j}": np.random.rand(4, 8).astype("float32") for j in range(5)} for i in range(3)
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shard_files = []
+            for i, shard in enumerate(shards):
+                shard_files.append(os.path.join(tmp_dir, f"model-{i + 1:05d}-of-00003.safetensors"))
+                save_file(shard, shard_files[-1], metadata={"format": "np"})
+            load_kwargs = [{"fliter_dict_keys": {k for k in shard if not k.endswith("_4")}} for shard in shards]
+
+            for thread_num, prefetch in [("1", False), ("1", True), ("3", True)]:
+                with mock.patch.dict(os.environ, {"LOAD_STATE_DICT_THREAD_NUM": thread_num}):
+                    loaded = list(load_shard_state_dicts(shard_files, load_kwargs, prefetch=prefetch))
+                self.assertEqual([shard_file for shard_file, _ in loaded], shard_files)
+                for shard, (_, state_dict) in zip(shards, loaded):
+                    self.assertEqual(sorted(state_dict.keys()), sorted(k for k in shard if not k.endswith("_4")))
+                    for k, v in state_dict.items():
+                        self.assertIsInstance(v, paddle.Tensor)
+                        np.testing.assert_equal(v.numpy(), shard[k])
+
     @unittest.skipIf(not is_paddle_cuda_available(), "some op is missing in cpu mode")
     def test_load_from_torch_dtyp_cast(self):
         pass
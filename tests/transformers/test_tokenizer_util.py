@@ -15,12 +15,18 @@
 
 import json
 import os
+import random
+import re
 import tempfile
+import time
 import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-from paddlenlp.transformers import BertTokenizer
-from paddlenlp.transformers.tokenizer_utils import PretrainedTokenizer
+from paddlenlp.transformers import AddedToken, BertTokenizer, WordpieceTokenizer
+from paddlenlp.transformers.tokenizer_utils import LRUCache, PretrainedTokenizer
 from paddlenlp.utils.env import TOKENIZER_CONFIG_NAME
+from tests.testing_utils import slow
 
 
 class EmptyTokenizer(PretrainedTokenizer):
@@ -60,3 +66,155 @@ class TokenizerUtilsTest(unittest.TestCase):
             self.assertTrue(os.path.exists(os.path.join(tempdir, model_name, TOKENIZER_CONFIG_NAME)))
             # check against double appending model_name in cache_dir
             self.assertFalse(os.path.exists(os.path.join(tempdir, model_name, model_name)))
+
+
+def build_corpus(tokenizer, num_sentences=2000, sentence_length=32, seed=42):
+    """A fixed corpus of sentences sampled from the words of the vocabulary with a Zipf-like distribution."""
+    rng = random.Random(seed)
+    words = [token for token in tokenizer.vocab.token_to_idx.keys() if token.isalpha()]
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    return [" ".join(rng.choices(words, weights=weights, k=sentence_length)) for _ in range(num_sentences)]
+
+
+class ParallelBatchEncodeTest(unittest.TestCase):
+    def test_parallel_matches_sequential(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        corpus = build_corpus(tokenizer, num_sentences=64, sentence_length=8)
+        pairs = list(zip(corpus[::2], corpus[1::2]))
+
+        for batch, encode_kwargs in [(corpus, {"padding": True}), (pairs, {"max_length": 16, "truncation": True})]:
+            expected = tokenizer(batch, **encode_kwargs)
+            tokenizer.parallel_encode_min_batch_size = 1
+            outputs = tokenizer(batch, num_proc=2, **encode_kwargs)
+            del tokenizer.parallel_encode_min_batch_size
+            self.assertEqual(outputs.keys(), expected.keys())
+            for key in expected.keys():
+                self.assertEqual(outputs[key], expected[key])
+
+    def test_broken_pool_falls_back_to_sequential(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        corpus = build_corpus(tokenizer, num_sentences=16, sentence_length=8)
+        expected = tokenizer(corpus)
+
+        tokenizer.parallel_encode_min_batch_size = 1
+        with mock.patch("paddlenlp.transformers.tokenizer_utils.ProcessPoolExecutor") as executor_cls:
+            # as if a worker died while encoding
+            executor_cls.return_value.__enter__.return_value.map.side_effect = BrokenProcessPool
+            outputs = tokenizer(corpus, num_proc=2)
+        executor_cls.assert_called_once()
+        self.assertEqual(outputs["input_ids"], expected["input_ids"])
+
+    def test_small_batch_stays_in_process(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        tokenizer._parallel_get_batch_input_ids = None
+        # would fail if the batch was dispatched to the process pool
+        outputs = tokenizer(["hello world", "paddle"], num_proc=4)
+        self.assertEqual(len(outputs["input_ids"]), 2)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_eviction_order(self):
+        cache = LRUCache(2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        # "b" is the least recently used entry
+        cache["c"] = 3
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache["a"], 1)
+        self.assertEqual(cache["c"], 3)
+        self.assertIsNone(cache.get("b"))
+        with self.assertRaises(KeyError):
+            cache["b"]
+
+        stats = cache.stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 0.6)
+
+    def test_disabled_and_unbounded(self):
+        cache = LRUCache(0)
+        cache["a"] = 1
+        self.assertEqual(len(cache), 0)
+
+        cache = LRUCache(None)
+        for i in range(1000):
+            cache[i] = i
+        self.assertEqual(len(cache), 1000)
+        cache.clear()
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_wordpiece_cache(self):
+        vocab = {token: i for i, token in enumerate(["[UNK]", "want", "##want", "##ed", "un", "runn", "##ing"])}
+        tokenizer = WordpieceTokenizer(vocab=vocab, unk_token="[UNK]")
+        for _ in range(2):
+            self.assertListEqual(
+                tokenizer.tokenize("unwanted running unwantedX"), ["un", "##want", "##ed", "runn", "##ing", "[UNK]"]
+            )
+        self.assertEqual(tokenizer.cache.stats()["hits"], 3)
+
+        tokenizer = WordpieceTokenizer(vocab=vocab, unk_token="[UNK]", cache_size=0)
+        self.assertListEqual(tokenizer.tokenize("unwanted"), ["un", "##want", "##ed"])
+        self.assertEqual(len(tokenizer.cache), 0)
+
+
+class SpecialTokensCacheTest(unittest.TestCase):
+    def test_lower_case_matches_regex(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        special_tokens = tokenizer.unique_no_split_tokens + tokenizer.all_special_tokens
+        pattern = r"(" + r"|".join(re.escape(token) for token in special_tokens) + r")|" + r"(.+?)"
+        for text in ["Hello [CLS] WORLD[SEP]", "[MASK]ΟΔΟΣ ΣΑΣ\nNew Line", "[UNK][PAD]ÀÉÎ [unk]", ""]:
+            expected = re.sub(pattern, lambda m: m.groups()[0] or m.groups()[1].lower(), text)
+            self.assertEqual(tokenizer._lower_non_special_tokens(text), expected)
+
+    def test_invalidated_by_add_tokens(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        self.assertListEqual(tokenizer.tokenize("[CLS] hello"), tokenizer.tokenize("[CLS] hello"))
+        self.assertNotIn("[NEW_TOKEN]", tokenizer.tokenize("[NEW_TOKEN] hello"))
+
+        tokenizer.add_special_tokens({"additional_special_tokens": ["[NEW_TOKEN]"]})
+        self.assertEqual(tokenizer.tokenize("[NEW_TOKEN] HELLO")[0], "[NEW_TOKEN]")
+        self.assertIn("[NEW_TOKEN]", tokenizer._get_special_tokens_cache()["no_split_token"])
+
+    def test_invalidated_by_special_token_setters(self):
+        tokenizer = BertTokenizer.from_pretrained("__internal_testing__/tiny-random-bert")
+        tokenizer.add_tokens(["<eot>"], special_tokens=True)
+        tokenizer.tokenize("hello <eot>")
+        self.assertNotIn("<eot>", tokenizer._get_special_tokens_cache()["all_special_tokens_extended"])
+
+        tokenizer.eos_token = AddedToken("<eot>", lstrip=True)
+        self.assertIsNone(tokenizer._special_tokens_cache)
+        self.assertIn("<eot>", tokenizer._get_special_tokens_cache()["all_special_tokens_extended"])
+
+    @slow
+    def test_cache_stats_consistent(self):
+        tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+        corpus = build_corpus(tokenizer)
+
+        results, stats = {}, {}
+        for cache_size in [0, None]:
+            tokenizer.wordpiece_tokenizer.cache = LRUCache(cache_size)
+            results[cache_size] = [tokenizer.tokenize(text) for text in corpus]
+            stats[cache_size] = tokenizer.wordpiece_tokenizer.cache.stats()
+        self.assertEqual(results[0], results[None])
+        self.assertEqual(stats[0]["hits"], 0)
+        self.assertEqual(stats[0]["size"], 0)
+        # the words repeated in the corpus are split once
+        self.assertGreater(stats[None]["hits"], stats[None]["size"])
+        self.assertEqual(stats[None]["hits"] + stats[None]["misses"], stats[0]["misses"])
+
+    @slow
+    def test_benchmark(self):
+        tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+        corpus = build_corpus(tokenizer)
+
+        results = {}
+        for cache_size in [0, None]:
+            tokenizer.wordpiece_tokenizer.cache = LRUCache(cache_size)
+            start_time = time.time()
+            results[cache_size] = [tokenizer.tokenize(text) for text in corpus]
+            elapsed = time.time() - start_time
+            num_tokens = sum(len(tokens) for tokens in results[cache_size])
+            print(f"tokenize with cache_size={cache_size}: {num_tokens / elapsed:.0f} tokens/s")
+        self.assertEqual(results[0], results[None])
@@ -0,0 +1,98 @@
+# Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import paddle
+from parameterized import parameterized
+from safetensors import safe_open
+from safetensors.numpy import load_file
+
+from paddlenlp.utils.safetensors import (
+    fast_load_file,
+    fast_safe_writer,
+    fast_save_file,
+    fast_save_files,
+)
+
+
+class FastSaveFileTest(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.numpy_state_dict = {
+            "weight": rng.randn(33, 17).astype("float32"),
+            "ids": np.arange(7, dtype="int64"),
+            "scalar": np.array(3.0, dtype="float16"),
+            "empty": np.zeros([0, 4], dtype="float32"),
+            "transposed": rng.randn(6, 4).astype("float64").T,
+        }
+
+    @parameterized.expand([(16,), (1024 * 1024,)])
+    def test_numpy(self, chunk_size):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "model.safetensors")
+            fast_save_file(self.numpy_state_dict, path, metadata={"format": "np"}, chunk_size=chunk_size)
+            with safe_open(path, framework="np") as f:
+                self.assertDictEqual(f.metadata(), {"format": "np"})
+            for state_dict in [load_file(path), fast_load_file(path)]:
+                self.assertListEqual(list(state_dict.keys()), list(self.numpy_state_dict.keys()))
+                for key, value in self.numpy_state_dict.items():
+                    self.assertEqual(state_dict[key].dtype, value.dtype)
+                    np.testing.assert_array_equal(state_dict[key], value)
+
+    def test_paddle(self):
+        state_dict = {
+            "float32": paddle.randn([31, 5], dtype="float32"),
+            "bfloat16": paddle.randn([3, 7]).astype("bfloat16"),
+            "bool": paddle.to_tensor([True, False, True]),
+        }
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "model.safetensors")
+            fast_save_file(state_dict, path, chunk_size=24)
+            loaded_state_dict = load_file(path)
+            for key, value in state_dict.items():
+                np.testing.assert_array_equal(loaded_state_dict[key], value.numpy())
+
+    def test_save_files(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            paths = [os.path.join(tempdir, f"model-{i}.safetensors") for i in range(5)]
+            fast_save_files([(self.numpy_state_dict, path, None) for path in paths], num_workers=3)
+            for path in paths:
+                state_dict = load_file(path)
+                for key, value in self.numpy_state_dict.items():
+                    np.testing.assert_array_equal(state_dict[key], value)
+
+    def test_safe_writer(self):
+        tensor_infos = {key: (value.dtype, value.shape) for key, value in self.numpy_state_dict.items()}
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "model.safetensors")
+            with fast_safe_writer(path, tensor_infos, metadata={"format": "np"}) as writer:
+                for key, value in self.numpy_state_dict.items():
+                    # write the tensors one row at a time
+                    rows = [value] if value.ndim == 0 or len(value) == 0 else value
+                    for row in rows:
+                        writer.write(key, row)
+            state_dict = load_file(path)
+            for key, value in self.numpy_state_dict.items():
+                np.testing.assert_array_equal(state_dict[key], value)
+
+            with self.assertRaises(ValueError):
+                with fast_safe_writer(path, tensor_infos) as writer:
+                    writer.write("ids", self.numpy_state_dict["ids"])
+            with self.assertRaises(ValueError):
+                with fast_safe_writer(path, tensor_infos) as writer:
+                    writer.write("weight", self.numpy_state_dict["weight"][:3])